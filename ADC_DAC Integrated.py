@@ -1,8 +1,7 @@
 import sys
 import time
-import math
+import argparse
 import threading
-from collections import deque
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
@@ -10,44 +9,85 @@ from PyQt5.QtWidgets import (
     QCheckBox
 )
 from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtGui import QFontDatabase
 import pyqtgraph as pg
 import numpy as np  
 
+from acquisition import AcquisitionConfig, LoopbackEngine, WaveConfig
+from analysis import FrequencyTracker
+from board import load_expanderpi
+from decimation import LTTB, MINMAX, NONE, decimate_for_view
+from metrics import MetricsExporter, MetricsRegistry
+import profiling
+from process_engine import ProcessEngine
+from recorder import CaptureWriter, capture_prefix
+from render import CurveRenderer, RefreshPacer
+from ring_buffer import ScrollBuffer
+from sweep import BodeSweep, SweepConfig, log_frequencies
+
 class ADCDACMonitor(QMainWindow):
-    def __init__(self):
+    def __init__(self, simulate=None, separate_process=False, metrics_file=None,
+                 metrics_port=None):
         super().__init__()
         self.setWindowTitle("ADC/DAC Monitor")
         self.setGeometry(100, 100, 1200, 1000)
         
         
-        from ExpanderPi import DAC, ADC
-        self.dac = DAC(gainFactor=2)
-        self.adc = ADC()
-        
-        self.dac_rate = 500   
-        self.adc_rate = 500  
-        self.running = False
-        
+        if separate_process:
+            # 板卡由采集子进程打开
+            self.dac = self.adc = None
+        else:
+            ADC, DAC = load_expanderpi(simulate)
+            self.dac = DAC(gainFactor=2)
+            self.adc = ADC()
         
         self.dac_diff_mode = False  
         
         
+        self.plot_data = None
+        self._refreshing = False
+        self.maxlen = 1000
+        # 引擎缓冲容纳两次刷新之间的新样本；显示缓冲保留可调的历史窗口
+        self.buffer_len = 1 << 16
         self.setup_ui()
 
         
-        self.maxlen = 1000
-        self.global_block_t    = deque(maxlen=self.maxlen)
-        self.global_block_1    = deque(maxlen=self.maxlen)  
-        self.global_block_2    = deque(maxlen=self.maxlen)
-        self.global_block_diff = deque(maxlen=self.maxlen)
-        self.data_lock = threading.Lock()
-        self.acquisition_thread = None
-  
-        self.ui_update_counter = 0
+        if separate_process:
+            self.engine = ProcessEngine('loopback', self.current_config(),
+                                        maxlen=self.buffer_len, simulate=simulate)
+        else:
+            self.engine = LoopbackEngine(self.adc, self.dac, self.current_config(),
+                                         maxlen=self.buffer_len)
+        self.connect_config_signals()
+
+        # DAC/ADC 节拍、SPI 读写、锁等待和界面刷新耗时
+        self.metrics = MetricsRegistry()
+        self.plot_hist = self.metrics.histogram('ui_update_plot_seconds',
+                                                'duration of one plot refresh')
+        self.metrics_exporter = None
+        if metrics_file is not None or metrics_port is not None:
+            self.metrics_exporter = MetricsExporter(self.metrics, path=metrics_file,
+                                                    port=metrics_port).start()
+        # 逐拍计时有开销：只在诊断面板打开或启用导出时挂上
+        self.update_timing()
+        self.diag_group.toggled.connect(self.update_timing)
+
+        # 流式测频：每次刷新只处理游标之后的新样本
+        self.freq_tracker = FrequencyTracker(3, segment_len=self.maxlen)
+        self.display = ScrollBuffer(self.buffer_len, 3)
+        self.read_cursor = 0
+
+        self.sweep = BodeSweep(self.engine)
+        self.sweep_thread = None
+        self.bode_window = None
+
+        self.pacer = RefreshPacer(500)
+        self.metrics.gauge('ui_refresh_interval_ms', lambda: self.pacer.interval,
+                           'plot refresh interval after load adaptation')
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_plot)
-        self.timer.start(500)
+        self.timer.start(self.pacer.target)
         
     def setup_ui(self):
         central_widget = QWidget()
@@ -169,24 +209,129 @@ class ADCDACMonitor(QMainWindow):
         self.dac_rate_spin = QSpinBox()
         self.dac_rate_spin.setRange(1, 100000)
         self.dac_rate_spin.setValue(500)
-        self.dac_rate_spin.valueChanged.connect(lambda x: setattr(self, 'dac_rate', x))
         rate_layout.addWidget(self.dac_rate_spin, 0, 1)
         
         rate_layout.addWidget(QLabel("ADC Sampling Rate (Hz):"), 1, 0)
         self.adc_rate_spin = QSpinBox()
         self.adc_rate_spin.setRange(1, 100000)
         self.adc_rate_spin.setValue(500)
-        self.adc_rate_spin.valueChanged.connect(lambda x: setattr(self, 'adc_rate', x))
         rate_layout.addWidget(self.adc_rate_spin, 1, 1)
         
         self.start_button = QPushButton("Start")
         self.start_button.clicked.connect(self.toggle_running)
         rate_layout.addWidget(self.start_button, 2, 0, 1, 2)
         
+        rate_layout.addWidget(QLabel("Display decimation:"), 3, 0)
+        self.decimation_combo = QComboBox()
+        self.decimation_combo.addItem('Min/Max', MINMAX)
+        self.decimation_combo.addItem('LTTB', LTTB)
+        self.decimation_combo.addItem('Off', NONE)
+        self.decimation_combo.currentIndexChanged.connect(self.refresh_curves)
+        rate_layout.addWidget(self.decimation_combo, 3, 1)
+
+        rate_layout.addWidget(QLabel("Actual ADC / DAC Rate:"), 4, 0)
+        self.actual_rate_label = QLabel("0.0 / 0.0 Hz")
+        rate_layout.addWidget(self.actual_rate_label, 4, 1)
+
+        rate_layout.addWidget(QLabel("History window (samples):"), 5, 0)
+        self.window_spin = QSpinBox()
+        self.window_spin.setRange(10, self.buffer_len)
+        self.window_spin.setValue(self.maxlen)
+        self.window_spin.valueChanged.connect(self.update_display)
+        rate_layout.addWidget(self.window_spin, 5, 1)
+        
         rate_group.setLayout(rate_layout)
         control_panel.addWidget(rate_group)
         
+        record_group = QGroupBox("Recording")
+        record_layout = QGridLayout()
+
+        record_layout.addWidget(QLabel("Chunk (samples):"), 0, 0)
+        self.chunk_rows_spin = QSpinBox()
+        self.chunk_rows_spin.setRange(256, 1000000)
+        self.chunk_rows_spin.setValue(4096)
+        record_layout.addWidget(self.chunk_rows_spin, 0, 1)
+
+        record_layout.addWidget(QLabel("Rotate file at (MB):"), 1, 0)
+        self.rotate_mb_spin = QSpinBox()
+        self.rotate_mb_spin.setRange(1, 4096)
+        self.rotate_mb_spin.setValue(256)
+        record_layout.addWidget(self.rotate_mb_spin, 1, 1)
+
+        self.record_button = QPushButton("Record")
+        self.record_button.clicked.connect(self.toggle_recording)
+        record_layout.addWidget(self.record_button, 2, 0, 1, 2)
+
+        self.record_status = QLabel("Not recording")
+        record_layout.addWidget(self.record_status, 3, 0, 1, 2)
+
+        record_group.setLayout(record_layout)
+        control_panel.addWidget(record_group)
+
+        sweep_group = QGroupBox("Bode Sweep (DAC1 -> circuit)")
+        sweep_layout = QGridLayout()
+
+        sweep_layout.addWidget(QLabel("Start / Stop (Hz):"), 0, 0)
+        self.sweep_start = QDoubleSpinBox()
+        self.sweep_start.setRange(0.1, 50000)
+        self.sweep_start.setValue(1.0)
+        self.sweep_stop = QDoubleSpinBox()
+        self.sweep_stop.setRange(0.1, 50000)
+        self.sweep_stop.setValue(1000.0)
+        sweep_layout.addWidget(self.sweep_start, 0, 1)
+        sweep_layout.addWidget(self.sweep_stop, 0, 2)
+
+        sweep_layout.addWidget(QLabel("Points / Batch:"), 1, 0)
+        self.sweep_points = QSpinBox()
+        self.sweep_points.setRange(2, 1000)
+        self.sweep_points.setValue(30)
+        self.sweep_batch = QSpinBox()
+        self.sweep_batch.setRange(1, 16)
+        sweep_layout.addWidget(self.sweep_points, 1, 1)
+        sweep_layout.addWidget(self.sweep_batch, 1, 2)
+
+        sweep_layout.addWidget(QLabel("Settle (ms / cycles):"), 2, 0)
+        self.sweep_settle_ms = QSpinBox()
+        self.sweep_settle_ms.setRange(0, 10000)
+        self.sweep_settle_ms.setValue(50)
+        self.sweep_settle_cycles = QSpinBox()
+        self.sweep_settle_cycles.setRange(0, 1000)
+        self.sweep_settle_cycles.setValue(5)
+        sweep_layout.addWidget(self.sweep_settle_ms, 2, 1)
+        sweep_layout.addWidget(self.sweep_settle_cycles, 2, 2)
+
+        sweep_layout.addWidget(QLabel("Measure (cycles):"), 3, 0)
+        self.sweep_cycles = QSpinBox()
+        self.sweep_cycles.setRange(1, 1000)
+        self.sweep_cycles.setValue(10)
+        sweep_layout.addWidget(self.sweep_cycles, 3, 1)
+
+        self.sweep_button = QPushButton("Run Sweep")
+        self.sweep_button.clicked.connect(self.toggle_sweep)
+        sweep_layout.addWidget(self.sweep_button, 4, 0)
+        self.sweep_status = QLabel("Idle")
+        sweep_layout.addWidget(self.sweep_status, 4, 1, 1, 2)
+
+        sweep_group.setLayout(sweep_layout)
+        control_panel.addWidget(sweep_group)
+
         main_layout.addLayout(control_panel)
+
+        diag_group = QGroupBox("Diagnostics (µs)")
+        diag_layout = QGridLayout()
+        self.diag_label = QLabel("")
+        self.diag_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        diag_layout.addWidget(self.diag_label, 0, 0, 1, 2)
+        self.diag_reset_button = QPushButton("Reset Statistics")
+        self.diag_reset_button.clicked.connect(lambda: self.metrics.reset())
+        diag_layout.addWidget(self.diag_reset_button, 1, 0)
+        diag_group.setLayout(diag_layout)
+        diag_group.setCheckable(True)
+        diag_group.setChecked(False)
+        diag_group.toggled.connect(self.diag_label.setVisible)
+        self.diag_label.setVisible(False)
+        self.diag_group = diag_group
+        main_layout.addWidget(diag_group)
         
         
         plot_layout = QVBoxLayout()
@@ -235,6 +380,33 @@ class ADCDACMonitor(QMainWindow):
             self.freq_label_diff_fft.setVisible(False)
 
 
+    def current_config(self):
+        """从控件生成不可变的配置快照"""
+        return AcquisitionConfig(
+            channel1=self.adc_channel1.value(),
+            channel2=self.adc_channel2.value(),
+            differential=self.adc_mode.currentIndex() == 1,
+            adc_rate=self.adc_rate_spin.value(),
+            dac_rate=self.dac_rate_spin.value(),
+            wave1=WaveConfig(self.wave_type1.currentText(), self.freq1.value(),
+                             self.amp1.value(), self.offset1.value()),
+            wave2=WaveConfig(self.wave_type2.currentText(), self.freq2.value(),
+                             self.amp2.value(), self.offset2.value()),
+            dac_diff_mode=self.dac_diff_mode,
+        )
+
+    def connect_config_signals(self):
+        for spin in (self.adc_channel1, self.adc_channel2, self.adc_rate_spin,
+                     self.dac_rate_spin, self.freq1, self.amp1, self.offset1,
+                     self.freq2, self.amp2, self.offset2):
+            spin.valueChanged.connect(self.on_config_changed)
+        for combo in (self.adc_mode, self.wave_type1, self.wave_type2):
+            combo.currentIndexChanged.connect(self.on_config_changed)
+        self.dac_diff_checkbox.stateChanged.connect(self.on_config_changed)
+
+    def on_config_changed(self, *args):
+        self.engine.reconfigure(self.current_config())
+
     def on_dac_diff_mode_changed(self, state):
         self.dac_diff_mode = (state == Qt.Checked)
        
@@ -245,18 +417,51 @@ class ADCDACMonitor(QMainWindow):
         self.offset2.setEnabled(enable_ch2)
 
     def setup_plots_sync(self):
-        
-        self.plot_widget1.sigRangeChanged.connect(
-            lambda: self.sync_range(self.plot_widget1, [self.plot_widget2, self.plot_widget_diff]))
-        self.plot_widget2.sigRangeChanged.connect(
-            lambda: self.sync_range(self.plot_widget2, [self.plot_widget1, self.plot_widget_diff]))
-        self.plot_widget_diff.sigRangeChanged.connect(
-            lambda: self.sync_range(self.plot_widget_diff, [self.plot_widget1, self.plot_widget2]))
-
-    def sync_range(self, source, targets):
-        x_range = source.viewRange()[0]
-        for t in targets:
-            t.setXRange(*x_range, padding=0)
+        """同步三个图的 X 轴缩放/平移
+
+        联动交给 pyqtgraph 的 setXLink（不会互相回调再触发 sigRangeChanged）；
+        缩放/平移后的重新抽取合并到下一轮事件循环，连续的范围变化只重绘一次。
+        """
+        self.plots = ((self.plot_widget1, CurveRenderer(self.curve1, 'y')),
+                      (self.plot_widget2, CurveRenderer(self.curve2, 'g')),
+                      (self.plot_widget_diff, CurveRenderer(self.curve_diff, 'r')))
+        for widget in (self.plot_widget2, self.plot_widget_diff):
+            widget.setXLink(self.plot_widget1)
+        self.range_timer = QTimer()
+        self.range_timer.setSingleShot(True)
+        self.range_timer.timeout.connect(self.refresh_curves)
+        self.plot_widget1.sigXRangeChanged.connect(lambda *args: self.range_timer.start(0))
+
+    def visible_plots(self):
+        """(通道下标, 图, 曲线) ，跳过隐藏的图"""
+        return [(i, widget, renderer) for i, (widget, renderer) in enumerate(self.plots)
+                if not widget.isHidden()]
+
+    def follow_live(self):
+        """实时窗口：X 范围直接设为数据的时间跨度（联动的图随之更新），
+        不必每次刷新都在三个图上重新打开自动范围"""
+        data_t = self.plot_data[0]
+        if len(data_t) > 1 and data_t[-1] > data_t[0]:
+            self.plot_widget1.setXRange(data_t[0], data_t[-1], padding=0)
+
+    def refresh_curves(self):
+        """按各图当前可见 X 范围和像素宽度抽取后更新曲线"""
+        if self.plot_data is None or self._refreshing:
+            return
+        self._refreshing = True
+        try:
+            data_t = self.plot_data[0]
+            method = self.decimation_combo.currentData()
+            vb1 = self.plot_widget1.getViewBox()
+            x_range = None if vb1.autoRangeEnabled()[0] else vb1.viewRange()[0]
+            for i, widget, renderer in self.visible_plots():
+                x, y = decimate_for_view(data_t, self.plot_data[i + 1], x_range,
+                                         widget.getViewBox().width(), method)
+                renderer.set_data(x, y)
+        finally:
+            self._refreshing = False
+            # 曲线已按当前范围更新，取消排队中的重绘
+            self.range_timer.stop()
 
     def on_mode_change(self, index):
        
@@ -268,172 +473,215 @@ class ADCDACMonitor(QMainWindow):
             self.plot_widget_diff.setVisible(True)
             self.adc_value_diff.setVisible(True)
             self.freq_label_diff_fft.setVisible(True)
+            # 隐藏期间没有更新过，显示时补一次范围和曲线
+            self.plot_widget_diff.setXRange(*self.plot_widget1.viewRange()[0], padding=0)
+            self.refresh_curves()
 
     def toggle_running(self):
         
-        if not self.running:
-            self.running = True
+        if not self.engine.running:
+            self.engine.reconfigure(self.current_config())
+            self.freq_tracker.reset()
+            self.display.clear()
+            self.read_cursor = 0
+            self.engine.start()
             self.start_button.setText("Stop")
-            with self.data_lock:
-                self.global_block_t.clear()
-                self.global_block_1.clear()
-                self.global_block_2.clear()
-                self.global_block_diff.clear()
-            self.acquisition_thread = threading.Thread(
-                target=self.acquisition_loop, daemon=True
-            )
-            self.acquisition_thread.start()
         else:
-            self.running = False
+            self.engine.stop()
             self.start_button.setText("Start")
 
-    def acquisition_loop(self):
-        
-        sample_index = 0
-        while self.running:
-            t0 = time.perf_counter()
-            t = sample_index / float(self.dac_rate)
-            sample_index += 1
-
-          
-            real_val1 = self.generate_real_wave(
-                self.wave_type1.currentText(),
-                self.freq1.value(),
-                self.amp1.value(),
-                self.offset1.value(),
-                t
-            )
-            code_val1 = max(0, min(4.096, real_val1))
-            self.dac.set_dac_voltage(1, code_val1)
-
-            
-            if self.dac_diff_mode:
-                
-                offset1 = self.offset1.value()
-                mirror_val2 = 2 * offset1 - real_val1
-                code_val2 = max(0, min(4.096, mirror_val2))
-            else:
-                real_val2 = self.generate_real_wave(
-                    self.wave_type2.currentText(),
-                    self.freq2.value(),
-                    self.amp2.value(),
-                    self.offset2.value(),
-                    t
-                )
-                code_val2 = max(0, min(4.096, real_val2))
-            self.dac.set_dac_voltage(2, code_val2)
-             
-            ch1 = self.adc_channel1.value()
-            ch2 = self.adc_channel2.value()
-            code_v1 = self.adc.read_adc_voltage(ch1, 0)
-            code_v2 = self.adc.read_adc_voltage(ch2, 0)
-            real_v1 = code_v1 - 1.5
-            real_v2 = code_v2 - 1.5
-            diff_v = real_v1 - real_v2 if self.adc_mode.currentIndex() == 1 else 0.0
-
-           
-            with self.data_lock:
-                self.global_block_t.append(t)
-                self.global_block_1.append(real_v1)
-                self.global_block_2.append(real_v2)
-                self.global_block_diff.append(diff_v)
-            
-            
-            elapsed = time.perf_counter() - t0
-            period = 1.0 / self.dac_rate
-            to_sleep = period - elapsed
-            if to_sleep > 0:
-                time.sleep(to_sleep)
-
-    def generate_real_wave(self, wave_type, freq, amplitude, offset, t):
-        
-        if wave_type == 'Sine Wave':
-            w = amplitude * math.sin(2 * math.pi * freq * t)
-        elif wave_type == 'Square Wave':
-            w = amplitude * (1 if math.sin(2 * math.pi * freq * t) >= 0 else -1)
-        elif wave_type == 'Triangle Wave':
-            f_mod = (t * freq) % 1.0
-            w = (4 * f_mod - 1) if f_mod < 0.5 else (3 - 4 * f_mod)
-            w *= amplitude
-        else:  # Sawtooth Wave
-            f_mod = (t * freq) % 1.0
-            w = (2 * f_mod - 1) * amplitude
-        return w + offset
-
-    def measure_frequency_fft(self, data_t, data_y):
-        
-        n = len(data_y)
-        if n < 4:
-            return 0.0
-        duration = data_t[-1] - data_t[0]
-        if duration <= 0:
-            return 0.0
-        fs_est = (n - 1) / duration
-        y_centered = data_y - np.mean(data_y)
-        window = np.hanning(n)
-        Y = np.fft.rfft(y_centered * window)
-        freqs = np.fft.rfftfreq(n, d=1.0/fs_est)
-        mag = np.abs(Y)
-        return freqs[np.argmax(mag)]
-
     def update_plot(self):
-        
-        self.ui_update_counter += 1
-        with self.data_lock:
-            
-            local_t = self.global_block_t
-            local_1 = self.global_block_1
-            local_2 = self.global_block_2
-            local_diff = self.global_block_diff
-            self.global_block_t = deque(maxlen=self.maxlen)
-            self.global_block_1 = deque(maxlen=self.maxlen)
-            self.global_block_2 = deque(maxlen=self.maxlen)
-            self.global_block_diff = deque(maxlen=self.maxlen)
-
-        if not local_t:
+        t0 = time.perf_counter()
+        self.refresh_plot()
+        duration = time.perf_counter() - t0
+        self.plot_hist.observe(duration)
+        # 绘图耗时超出预算时拉长刷新间隔，负载下降后恢复
+        interval = self.pacer.update(duration)
+        if interval != self.timer.interval():
+            self.timer.setInterval(interval)
+        if self.diag_group.isChecked():
+            self.diag_label.setText(self.metrics.summary())
+
+    def refresh_plot(self):
+        self.update_record_status()
+        self.update_sweep()
+        # 只取游标之后的新样本，追加到持久的显示缓冲
+        new_rows, self.read_cursor, lost = self.engine.read_since(self.read_cursor)
+        self.display.extend(new_rows)
+        if not self.update_display():
             return
 
-        data_t    = np.array(local_t, dtype=float)
-        data1     = np.array(local_1, dtype=float)
-        data2     = np.array(local_2, dtype=float)
-        data_diff = np.array(local_diff, dtype=float)
-
-        
-        self.curve1.setData(x=data_t, y=data1)
-        self.curve2.setData(x=data_t, y=data2)
-        self.curve_diff.setData(x=data_t, y=data_diff)
-
-        
-        if len(data1) > 0:
-            self.adc_value1.setText(f"ADC1: {data1[-1]:.3f} V")
-            self.adc_value2.setText(f"ADC2: {data2[-1]:.3f} V")
-            self.adc_value_diff.setText(f"Differential: {data_diff[-1]:.3f} V")
+        data_t, data1, data2, data_diff = self.plot_data
+        self.adc_value1.setText(f"ADC1: {data1[-1]:.3f} V")
+        self.adc_value2.setText(f"ADC2: {data2[-1]:.3f} V")
+        self.adc_value_diff.setText(f"Differential: {data_diff[-1]:.3f} V")
 
        
-        if self.ui_update_counter % 2 == 0:
-            freq1_fft = self.measure_frequency_fft(data_t, data1)
-            freq2_fft = self.measure_frequency_fft(data_t, data2)
-            freq_diff_fft = self.measure_frequency_fft(data_t, data_diff) if self.adc_mode.currentIndex() == 1 else 0.0
+        differential = self.adc_mode.currentIndex() == 1
+        self.freq_tracker.feed(new_rows, lost, (0, 1, 2) if differential else (0, 1))
+        freq1_fft = self.freq_tracker.frequency(0)
+        freq2_fft = self.freq_tracker.frequency(1)
+        freq_diff_fft = self.freq_tracker.frequency(2) if differential else 0.0
+
+        self.freq_label1_fft.setText(f"Freq1 (FFT): {freq1_fft:.2f} Hz")
+        self.freq_label2_fft.setText(f"Freq2 (FFT): {freq2_fft:.2f} Hz")
+        self.freq_label_diff_fft.setText(f"Freq Diff (FFT): {freq_diff_fft:.2f} Hz")
+
+        self.actual_rate_label.setText(
+            f"{self.engine.actual_rate:.1f} / {self.engine.dac_actual_rate:.1f} Hz")
+
+    def update_display(self, *args):
+        """按历史窗口长度取显示缓冲的连续视图并重绘；没有数据时返回 False"""
+        if not len(self.display):
+            return False
+        view = self.display.view(self.window_spin.value())
+        self.plot_data = tuple(view.T)
+        self.follow_live()
+        self.refresh_curves()
+        return True
+
+    def toggle_recording(self):
+        """开始/停止把每个样本流式写入 captures/ 目录"""
+        if self.engine.recorder is None:
+            writer = CaptureWriter(capture_prefix(), self.engine.COLUMNS,
+                                   chunk_rows=self.chunk_rows_spin.value(),
+                                   rotate_bytes=self.rotate_mb_spin.value() * 1024 * 1024)
+            self.engine.start_recording(writer)
+            self.record_button.setText("Stop Recording")
+        else:
+            writer = self.engine.stop_recording()
+            self.record_button.setText("Record")
+            self.record_status.setText(f"Saved {writer.prefix}.json")
 
-            self.freq_label1_fft.setText(f"Freq1 (FFT): {freq1_fft:.2f} Hz")
-            self.freq_label2_fft.setText(f"Freq2 (FFT): {freq2_fft:.2f} Hz")
-            self.freq_label_diff_fft.setText(f"Freq Diff (FFT): {freq_diff_fft:.2f} Hz")
-        
-       
-        self.plot_widget1.enableAutoRange(axis=pg.ViewBox.XAxis, enable=True)
-        self.plot_widget2.enableAutoRange(axis=pg.ViewBox.XAxis, enable=True)
-        self.plot_widget_diff.enableAutoRange(axis=pg.ViewBox.XAxis, enable=True)
+    def update_record_status(self):
+        writer = self.engine.recorder
+        if writer is None:
+            return
+        stats = writer.stats()
+        self.record_status.setText(
+            f"{stats['bytes_written'] / 1e6:.1f} MB, "
+            f"{stats['throughput_bytes_per_s'] / 1e3:.0f} kB/s, "
+            f"queue {stats['queue_depth']}, dropped {stats['dropped_rows']}")
+
+    def current_sweep_config(self):
+        """ADC 通道 1 测电路输入、通道 2 测电路输出；幅度和偏置沿用 DAC 通道 1 的设置"""
+        return SweepConfig(
+            freqs=log_frequencies(self.sweep_start.value(), self.sweep_stop.value(),
+                                  self.sweep_points.value()),
+            amplitude=self.amp1.value(),
+            offset=self.offset1.value(),
+            in_channel=self.adc_channel1.value(),
+            out_channel=self.adc_channel2.value(),
+            adc_rate=self.adc_rate_spin.value(),
+            dac_rate=self.dac_rate_spin.value(),
+            settle_time=self.sweep_settle_ms.value() / 1000.0,
+            settle_cycles=self.sweep_settle_cycles.value(),
+            measure_cycles=self.sweep_cycles.value(),
+            batch_size=self.sweep_batch.value(),
+        )
+
+    def toggle_sweep(self):
+        if self.sweep_thread is not None:
+            self.sweep.cancel()
+            return
+        if self.bode_window is None:
+            self.setup_bode_window()
+        self.bode_window.show()
+        cfg = self.current_sweep_config()
+        self.set_stimulus_controls_enabled(False)
+        self.sweep_thread = threading.Thread(target=self.sweep.run, args=(cfg,), daemon=True)
+        self.sweep_thread.start()
+        self.sweep_button.setText("Cancel Sweep")
+        self.start_button.setText("Stop")
+
+    def setup_bode_window(self):
+        self.bode_window = pg.GraphicsLayoutWidget(title="Bode Plot")
+        self.bode_window.resize(800, 600)
+        self.gain_plot = self.bode_window.addPlot(row=0, col=0)
+        self.gain_plot.setLabel('left', "Gain (dB)")
+        self.gain_plot.setLogMode(x=True, y=False)
+        self.gain_plot.showGrid(x=True, y=True)
+        self.phase_plot = self.bode_window.addPlot(row=1, col=0)
+        self.phase_plot.setLabel('left', "Phase (deg)")
+        self.phase_plot.setLabel('bottom', "Frequency (Hz)")
+        self.phase_plot.setLogMode(x=True, y=False)
+        self.phase_plot.showGrid(x=True, y=True)
+        self.phase_plot.setXLink(self.gain_plot)
+        self.gain_curve = self.gain_plot.plot(pen='y', symbol='o', symbolSize=5,
+                                              symbolBrush='y')
+        self.phase_curve = self.phase_plot.plot(pen='c', symbol='o', symbolSize=5,
+                                                symbolBrush='c')
+
+    def update_sweep(self):
+        if self.sweep_thread is None:
+            return
+        points = sorted(self.sweep.results, key=lambda p: p.freq)
+        if points:
+            freqs = np.array([p.freq for p in points])
+            self.gain_curve.setData(x=freqs, y=np.array([p.gain_db for p in points]))
+            self.phase_curve.setData(x=freqs, y=np.array([p.phase for p in points]))
+        done, total = self.sweep.progress
+        if self.sweep_thread.is_alive():
+            self.sweep_status.setText(f"{done} / {total} points")
+        else:
+            self.sweep_thread = None
+            self.set_stimulus_controls_enabled(True)
+            self.sweep_button.setText("Run Sweep")
+            self.sweep_status.setText(f"Done: {done} / {total} points")
+
+    def set_stimulus_controls_enabled(self, enabled):
+        """扫描期间由扫描线程独占 reconfigure，锁住会改动激励、速率和通道的控件
+
+        扫描结束时恢复的是开始前的配置，期间的改动会被丢弃，所以干脆不让改。
+        """
+        for widget in (self.adc_channel1, self.adc_channel2, self.adc_rate_spin,
+                       self.dac_rate_spin, self.adc_mode, self.wave_type1, self.freq1,
+                       self.amp1, self.offset1, self.dac_diff_checkbox, self.start_button):
+            widget.setEnabled(enabled)
+        enable_ch2 = enabled and not self.dac_diff_mode
+        for widget in (self.wave_type2, self.freq2, self.amp2, self.offset2):
+            widget.setEnabled(enable_ch2)
+
+    def update_timing(self, *args):
+        if self.diag_group.isChecked() or self.metrics_exporter is not None:
+            self.engine.instrument(self.metrics)
+        else:
+            self.engine.uninstrument()
 
     def closeEvent(self, event):
     
-        self.running = False
-        time.sleep(0.5)
+        if self.sweep_thread is not None:
+            self.sweep.cancel()
+            self.sweep_thread.join()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        self.engine.stop()
+        self.engine.stop_recording()
+        if isinstance(self.engine, ProcessEngine):
+            self.engine.shutdown()
         event.accept()
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="ADC/DAC Monitor")
+    parser.add_argument('--sim', action='store_true',
+                        help='使用仿真板卡（也可设置 EXPANDERPI_SIM=1）')
+    parser.add_argument('--process', action='store_true',
+                        help='在独立进程中运行 DAC 输出和采样')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='定期把计时统计以 Prometheus 文本格式写入文件')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='在 127.0.0.1:PORT 上提供 Prometheus 抓取')
+    profiling.add_arguments(parser)
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     pg.setConfigOptions(antialias=True)
-    window = ADCDACMonitor()
+    window = ADCDACMonitor(simulate=args.sim or None, separate_process=args.process,
+                           metrics_file=args.metrics_file, metrics_port=args.metrics_port)
+    profile = profiling.setup(window.metrics, args,
+                              extra=((ADCDACMonitor, 'refresh_plot', 'ui_refresh_plot'),))
+    if profile is not None:
+        app.aboutToQuit.connect(profile.finish)
     window.show()
     sys.exit(app.exec_())
 
@@ -1,46 +1,100 @@
 import sys
 import time
-import threading
-from collections import deque
+import argparse
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
-    QPushButton, QComboBox, QLabel, QSpinBox, QGridLayout
+    QPushButton, QComboBox, QLabel, QSpinBox, QDoubleSpinBox, QGridLayout,
+    QCheckBox
 )
 from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QFontDatabase
 import pyqtgraph as pg
 import numpy as np
 
+from acquisition import AcquisitionConfig, AcquisitionEngine
+from analysis import FrequencyTracker
+from board import load_expanderpi
+from decimation import LTTB, MINMAX, NONE, decimate_for_view
+from history import TieredHistory
+from metrics import MetricsExporter, MetricsRegistry
+import profiling
+from process_engine import ProcessEngine
+from recorder import CaptureWriter, capture_prefix
+from render import CurveRenderer, RefreshPacer
+from replay import CaptureReader, ReplayEngine
+from stream import DEFAULT_PORT, RemoteEngine, StreamServer
+from trigger import AUTO, EITHER, FALLING, NORMAL, RISING, SINGLE, TriggerConfig, TriggerEngine
+
 class OscilloscopeMonitor(QMainWindow):
-    def __init__(self):
+    def __init__(self, simulate=None, replay=None, speed=1.0, separate_process=False,
+                 serve=None, connect=None, metrics_file=None, metrics_port=None):
         super().__init__()
         self.setWindowTitle("ADC Monitor (UI显示=电压 -1.5V)")
         self.setGeometry(100, 100, 1200, 1000)
         
-        from ExpanderPi import ADC
-        self.adc = ADC()
-        
-        self.adc_rate = 500
-        self.running = False
-        self.first_timestamp = None  
-        
-        self.sample_count = 0
-        self.last_sample_time = None
-        self.actual_rate = 0.0
-
-        self.setup_ui()
+        self.plot_data = None
+        self._refreshing = False
         self.maxlen = 300
-        self.global_block_t = deque(maxlen=self.maxlen)   
-        self.global_block_1 = deque(maxlen=self.maxlen)  
-        self.global_block_2 = deque(maxlen=self.maxlen)  
-        self.global_block_diff = deque(maxlen=self.maxlen)
-
-        self.data_lock = threading.Lock()
-        self.acquisition_thread = None
+        # 引擎缓冲只需容纳两次刷新之间的样本，长时间数据由 self.history 保存
+        self.buffer_len = 1 << 16
+        self.setup_ui()
+        if connect is not None:
+            # 查看远程板卡的样本，本机不打开板卡
+            self.adc = None
+            self.engine = RemoteEngine(*connect, maxlen=self.buffer_len)
+        elif replay is None and separate_process:
+            # 采集在子进程里运行，界面进程不打开板卡
+            self.adc = None
+            self.engine = ProcessEngine('acquisition', self.current_config(),
+                                        maxlen=self.buffer_len, simulate=simulate)
+        elif replay is None:
+            ADC, _ = load_expanderpi(simulate)
+            self.adc = ADC()
+            self.engine = AcquisitionEngine(self.adc, self.current_config(),
+                                            maxlen=self.buffer_len)
+        else:
+            # 回放记录文件，不需要连接板卡
+            self.adc = None
+            self.engine = ReplayEngine(CaptureReader(replay), maxlen=self.buffer_len,
+                                       speed=speed)
+            self.setup_replay_ui()
+        self.connect_config_signals()
+
+        # 采样节拍、SPI、锁等待和界面刷新耗时；可导出为 Prometheus 文本
+        self.metrics = MetricsRegistry()
+        self.plot_hist = self.metrics.histogram('ui_update_plot_seconds',
+                                                'duration of one plot refresh')
+        self.metrics_exporter = None
+        if metrics_file is not None or metrics_port is not None:
+            self.metrics_exporter = MetricsExporter(self.metrics, path=metrics_file,
+                                                    port=metrics_port).start()
+        # 逐拍计时有开销：只在诊断面板打开或启用导出时挂上
+        self.update_timing()
+        self.diag_group.toggled.connect(self.update_timing)
+
+        # 把本窗口的样本发布给远程查看端
+        self.stream_server = None
+        if serve is not None:
+            self.stream_server = StreamServer(self.engine, host=serve[0], port=serve[1])
+            self.stream_server.start()
+
+        # 流式测频：每次只处理上次刷新之后的新样本
+        self.freq_tracker = FrequencyTracker(3, segment_len=self.maxlen)
+        self.read_cursor = 0
+        # 原始样本 + 逐级 min/max/mean 抽取层，缩放到数小时也不用保存全部样本
+        self.history = TieredHistory(3)
+        self.trigger = TriggerEngine(self.current_trigger_config())
+        self.connect_trigger_signals()
+
+        self.frame = np.empty((0, len(self.engine.COLUMNS)))
+        self.pacer = RefreshPacer(1000)
+        self.metrics.gauge('ui_refresh_interval_ms', lambda: self.pacer.interval,
+                           'plot refresh interval after load adaptation')
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_plot)
-        self.timer.start(1000)
+        self.timer.start(self.pacer.target)
 
     def setup_ui(self):
         """构建界面"""
@@ -49,6 +103,7 @@ class OscilloscopeMonitor(QMainWindow):
         main_layout = QVBoxLayout(central_widget)
 
         control_panel = QHBoxLayout()
+        self.control_panel = control_panel
         
         adc_group = QGroupBox("ADC Settings")
         adc_layout = QGridLayout()
@@ -97,9 +152,6 @@ class OscilloscopeMonitor(QMainWindow):
         self.adc_rate_spin = QSpinBox()
         self.adc_rate_spin.setRange(1, 100000)
         self.adc_rate_spin.setValue(500)
-        self.adc_rate_spin.valueChanged.connect(
-            lambda x: setattr(self, 'adc_rate', x)
-        )
         rate_layout.addWidget(self.adc_rate_spin, 0, 1)
         
         rate_layout.addWidget(QLabel("Actual Sampling Rate:"), 1, 0)
@@ -110,10 +162,133 @@ class OscilloscopeMonitor(QMainWindow):
         self.start_button.clicked.connect(self.toggle_running)
         rate_layout.addWidget(self.start_button, 2, 0, 1, 2)
         
+        rate_layout.addWidget(QLabel("Display decimation:"), 3, 0)
+        self.decimation_combo = QComboBox()
+        self.decimation_combo.addItem('Min/Max', MINMAX)
+        self.decimation_combo.addItem('LTTB', LTTB)
+        self.decimation_combo.addItem('Off', NONE)
+        self.decimation_combo.currentIndexChanged.connect(self.refresh_curves)
+        rate_layout.addWidget(self.decimation_combo, 3, 1)
+
+        rate_layout.addWidget(QLabel("View:"), 4, 0)
+        self.view_combo = QComboBox()
+        self.view_combo.addItems(['Live window', 'History'])
+        self.view_combo.currentIndexChanged.connect(self.on_view_change)
+        rate_layout.addWidget(self.view_combo, 4, 1)
+
+        rate_layout.addWidget(QLabel("Live window (samples):"), 5, 0)
+        self.window_spin = QSpinBox()
+        self.window_spin.setRange(10, self.buffer_len)
+        self.window_spin.setValue(self.maxlen)
+        rate_layout.addWidget(self.window_spin, 5, 1)
+
+        self.burst_check = QCheckBox("Burst read (block SPI + vectorized conversion)")
+        rate_layout.addWidget(self.burst_check, 6, 0, 1, 2)
+        
         rate_group.setLayout(rate_layout)
         control_panel.addWidget(rate_group)
         
+        trigger_group = QGroupBox("Trigger")
+        trigger_layout = QGridLayout()
+
+        trigger_layout.addWidget(QLabel("Mode:"), 0, 0)
+        self.trigger_mode = QComboBox()
+        self.trigger_mode.addItem('Off (scroll)', None)
+        self.trigger_mode.addItem('Auto', AUTO)
+        self.trigger_mode.addItem('Normal', NORMAL)
+        self.trigger_mode.addItem('Single', SINGLE)
+        trigger_layout.addWidget(self.trigger_mode, 0, 1)
+
+        trigger_layout.addWidget(QLabel("Source:"), 1, 0)
+        self.trigger_source = QComboBox()
+        self.trigger_source.addItems(['ADC1', 'ADC2', 'Differential'])
+        trigger_layout.addWidget(self.trigger_source, 1, 1)
+
+        trigger_layout.addWidget(QLabel("Slope:"), 2, 0)
+        self.trigger_slope = QComboBox()
+        self.trigger_slope.addItem('Rising', RISING)
+        self.trigger_slope.addItem('Falling', FALLING)
+        self.trigger_slope.addItem('Either', EITHER)
+        trigger_layout.addWidget(self.trigger_slope, 2, 1)
+
+        trigger_layout.addWidget(QLabel("Level (V):"), 3, 0)
+        self.trigger_level = QDoubleSpinBox()
+        self.trigger_level.setRange(-4.0, 4.0)
+        self.trigger_level.setDecimals(3)
+        self.trigger_level.setSingleStep(0.05)
+        trigger_layout.addWidget(self.trigger_level, 3, 1)
+
+        trigger_layout.addWidget(QLabel("Hysteresis (V):"), 4, 0)
+        self.trigger_hysteresis = QDoubleSpinBox()
+        self.trigger_hysteresis.setRange(0.0, 2.0)
+        self.trigger_hysteresis.setDecimals(3)
+        self.trigger_hysteresis.setSingleStep(0.01)
+        self.trigger_hysteresis.setValue(0.05)
+        trigger_layout.addWidget(self.trigger_hysteresis, 4, 1)
+
+        trigger_layout.addWidget(QLabel("Holdoff (ms):"), 5, 0)
+        self.trigger_holdoff = QDoubleSpinBox()
+        self.trigger_holdoff.setRange(0.0, 10000.0)
+        trigger_layout.addWidget(self.trigger_holdoff, 5, 1)
+
+        trigger_layout.addWidget(QLabel("Pre-trigger (%):"), 6, 0)
+        self.trigger_pre = QSpinBox()
+        self.trigger_pre.setRange(0, 100)
+        self.trigger_pre.setValue(50)
+        trigger_layout.addWidget(self.trigger_pre, 6, 1)
+
+        self.arm_button = QPushButton("Arm")
+        self.arm_button.clicked.connect(self.on_arm)
+        trigger_layout.addWidget(self.arm_button, 7, 0)
+        self.trigger_status = QLabel("Scrolling")
+        trigger_layout.addWidget(self.trigger_status, 7, 1)
+
+        trigger_group.setLayout(trigger_layout)
+        control_panel.addWidget(trigger_group)
+
+        record_group = QGroupBox("Recording")
+        record_layout = QGridLayout()
+
+        record_layout.addWidget(QLabel("Chunk (samples):"), 0, 0)
+        self.chunk_rows_spin = QSpinBox()
+        self.chunk_rows_spin.setRange(256, 1000000)
+        self.chunk_rows_spin.setValue(4096)
+        record_layout.addWidget(self.chunk_rows_spin, 0, 1)
+
+        record_layout.addWidget(QLabel("Rotate file at (MB):"), 1, 0)
+        self.rotate_mb_spin = QSpinBox()
+        self.rotate_mb_spin.setRange(1, 4096)
+        self.rotate_mb_spin.setValue(256)
+        record_layout.addWidget(self.rotate_mb_spin, 1, 1)
+
+        self.record_button = QPushButton("Record")
+        self.record_button.clicked.connect(self.toggle_recording)
+        record_layout.addWidget(self.record_button, 2, 0, 1, 2)
+
+        self.record_status = QLabel("Not recording")
+        record_layout.addWidget(self.record_status, 3, 0, 1, 2)
+
+        record_group.setLayout(record_layout)
+        control_panel.addWidget(record_group)
+
         main_layout.addLayout(control_panel)
+
+        diag_group = QGroupBox("Diagnostics (µs)")
+        diag_layout = QGridLayout()
+        self.diag_label = QLabel("")
+        self.diag_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        diag_layout.addWidget(self.diag_label, 0, 0, 1, 2)
+        self.diag_reset_button = QPushButton("Reset Statistics")
+        self.diag_reset_button.clicked.connect(lambda: self.metrics.reset())
+        diag_layout.addWidget(self.diag_reset_button, 1, 0)
+        diag_group.setLayout(diag_layout)
+        diag_group.setCheckable(True)
+        diag_group.setChecked(False)
+        diag_group.toggled.connect(self.diag_label.setVisible)
+        self.diag_label.setVisible(False)
+        self.diag_group = diag_group
+        main_layout.addWidget(diag_group)
+
         plot_layout = QVBoxLayout()
 
         self.plot_widget1 = pg.PlotWidget()
@@ -157,22 +332,167 @@ class OscilloscopeMonitor(QMainWindow):
             self.adc_value_diff.setVisible(False)
             self.freq_label_diff_fft.setVisible(False)
 
-    def setup_plots_sync(self):
-        """同步三个图的 X 轴缩放/平移"""
-        self.plot_widget1.sigRangeChanged.connect(
-            lambda: self.sync_range(self.plot_widget1, [self.plot_widget2, self.plot_widget_diff])
+    def setup_replay_ui(self):
+        reader = self.engine.reader
+        t0, t1 = reader.time_range()
+
+        replay_group = QGroupBox("Replay")
+        replay_layout = QGridLayout()
+
+        replay_layout.addWidget(QLabel(f"Capture: {t0:.3f} ~ {t1:.3f} s, {len(reader)} samples"),
+                                0, 0, 1, 2)
+
+        replay_layout.addWidget(QLabel("Seek (s):"), 1, 0)
+        self.seek_spin = QDoubleSpinBox()
+        self.seek_spin.setDecimals(3)
+        self.seek_spin.setRange(t0, t1)
+        self.seek_spin.setKeyboardTracking(False)
+        self.seek_spin.valueChanged.connect(self.on_seek)
+        replay_layout.addWidget(self.seek_spin, 1, 1)
+
+        replay_layout.addWidget(QLabel("Speed (x):"), 2, 0)
+        self.speed_spin = QDoubleSpinBox()
+        self.speed_spin.setRange(0.01, 1000)
+        self.speed_spin.setValue(self.engine.speed or 1.0)
+        self.speed_spin.valueChanged.connect(self.on_speed_change)
+        replay_layout.addWidget(self.speed_spin, 2, 1)
+
+        replay_group.setLayout(replay_layout)
+        self.control_panel.addWidget(replay_group)
+
+    def on_seek(self, t):
+        self.engine.seek(t)
+        self.freq_tracker.reset()
+        self.history.clear()
+        self.trigger.reset()
+        self.read_cursor = 0
+
+    def on_speed_change(self, speed):
+        self.engine.set_speed(speed)
+
+    def current_config(self):
+        """从控件生成不可变的配置快照"""
+        return AcquisitionConfig(
+            channel1=self.adc_channel1.value(),
+            channel2=self.adc_channel2.value(),
+            differential=self.adc_mode.currentIndex() == 1,
+            adc_rate=self.adc_rate_spin.value(),
+            burst=self.burst_check.isChecked(),
         )
-        self.plot_widget2.sigRangeChanged.connect(
-            lambda: self.sync_range(self.plot_widget2, [self.plot_widget1, self.plot_widget_diff])
-        )
-        self.plot_widget_diff.sigRangeChanged.connect(
-            lambda: self.sync_range(self.plot_widget_diff, [self.plot_widget1, self.plot_widget2])
+
+    def connect_config_signals(self):
+        self.adc_channel1.valueChanged.connect(self.on_config_changed)
+        self.adc_channel2.valueChanged.connect(self.on_config_changed)
+        self.adc_mode.currentIndexChanged.connect(self.on_config_changed)
+        self.adc_rate_spin.valueChanged.connect(self.on_config_changed)
+        self.burst_check.stateChanged.connect(self.on_config_changed)
+
+    def on_config_changed(self, *args):
+        self.engine.reconfigure(self.current_config())
+
+    def current_trigger_config(self):
+        """一帧的长度为实时窗口长度，按预触发百分比切分"""
+        window = self.window_spin.value()
+        pre = window * self.trigger_pre.value() // 100
+        return TriggerConfig(
+            source=self.trigger_source.currentIndex(),
+            slope=self.trigger_slope.currentData(),
+            level=self.trigger_level.value(),
+            hysteresis=self.trigger_hysteresis.value(),
+            holdoff=self.trigger_holdoff.value() / 1000.0,
+            mode=self.trigger_mode.currentData() or AUTO,
+            pre_samples=pre,
+            post_samples=window - pre,
         )
 
-    def sync_range(self, source, targets):
-        x_range = source.viewRange()[0]
-        for t in targets:
-            t.setXRange(*x_range, padding=0)
+    def connect_trigger_signals(self):
+        self.trigger_mode.currentIndexChanged.connect(self.on_trigger_mode_changed)
+        for combo in (self.trigger_source, self.trigger_slope):
+            combo.currentIndexChanged.connect(self.on_trigger_changed)
+        for spin in (self.trigger_level, self.trigger_hysteresis, self.trigger_holdoff,
+                     self.trigger_pre, self.window_spin):
+            spin.valueChanged.connect(self.on_trigger_changed)
+
+    def on_trigger_changed(self, *args):
+        self.trigger.configure(self.current_trigger_config())
+
+    def on_trigger_mode_changed(self, *args):
+        """Off 模式下不喂触发器：切换模式时丢掉旧的尾部和穿越状态，从新数据重新开始"""
+        self.trigger.configure(self.current_trigger_config())
+        self.trigger.reset()
+
+    def on_arm(self):
+        self.trigger.arm()
+        self.trigger_status.setText("Armed")
+
+    def setup_plots_sync(self):
+        """同步三个图的 X 轴缩放/平移
+
+        联动交给 pyqtgraph 的 setXLink（不会互相回调再触发 sigRangeChanged）；
+        缩放/平移后的重新抽取合并到下一轮事件循环，连续的范围变化只重绘一次。
+        """
+        self.plots = ((self.plot_widget1, CurveRenderer(self.curve1, 'y')),
+                      (self.plot_widget2, CurveRenderer(self.curve2, 'g')),
+                      (self.plot_widget_diff, CurveRenderer(self.curve_diff, 'r')))
+        for widget in (self.plot_widget2, self.plot_widget_diff):
+            widget.setXLink(self.plot_widget1)
+        self.range_timer = QTimer()
+        self.range_timer.setSingleShot(True)
+        self.range_timer.timeout.connect(self.refresh_curves)
+        self.plot_widget1.sigXRangeChanged.connect(lambda *args: self.range_timer.start(0))
+
+    def visible_plots(self):
+        """(通道下标, 图, 曲线) ，跳过隐藏的图"""
+        return [(i, widget, renderer) for i, (widget, renderer) in enumerate(self.plots)
+                if not widget.isHidden()]
+
+    def follow_live(self):
+        """实时窗口：X 范围直接设为数据的时间跨度（联动的图随之更新），
+        不必每次刷新都在三个图上重新打开自动范围"""
+        data_t = self.plot_data[0]
+        if len(data_t) > 1 and data_t[-1] > data_t[0]:
+            self.plot_widget1.setXRange(data_t[0], data_t[-1], padding=0)
+
+    def on_view_change(self, index):
+        self.plot_widget1.enableAutoRange(axis=pg.ViewBox.XAxis, enable=True)
+        self.refresh_curves()
+
+    def refresh_curves(self):
+        """按各图当前可见 X 范围和像素宽度抽取后更新曲线"""
+        if self.plot_data is None or self._refreshing:
+            return
+        self._refreshing = True
+        try:
+            if self.view_combo.currentIndex() == 1:
+                self.refresh_history_curves()
+                return
+            data_t = self.plot_data[0]
+            method = self.decimation_combo.currentData()
+            vb1 = self.plot_widget1.getViewBox()
+            x_range = None if vb1.autoRangeEnabled()[0] else vb1.viewRange()[0]
+            for i, widget, renderer in self.visible_plots():
+                x, y = decimate_for_view(data_t, self.plot_data[i + 1], x_range,
+                                         widget.getViewBox().width(), method)
+                renderer.set_data(x, y)
+        finally:
+            self._refreshing = False
+            # 曲线已按当前范围更新，取消排队中的重绘
+            self.range_timer.stop()
+
+    def refresh_history_curves(self):
+        """从分层历史中取覆盖可见范围、点数不超过像素宽度两倍的最细一层"""
+        time_range = self.history.time_range()
+        if time_range is None:
+            return
+        vb1 = self.plot_widget1.getViewBox()
+        t0, t1 = time_range if vb1.autoRangeEnabled()[0] else vb1.viewRange()[0]
+        for channel, widget, renderer in self.visible_plots():
+            width_px = max(int(widget.getViewBox().width()), 1)
+            x, y, _ = self.history.query(channel, t0, t1, 2 * width_px)
+            if x.size > 2 * width_px:
+                x, y = decimate_for_view(x, y, (t0, t1), width_px,
+                                         self.decimation_combo.currentData())
+            renderer.set_data(x, y)
 
     def on_mode_change(self, index):
         """单端 / 差分模式下，决定是否隐藏第三图"""
@@ -184,107 +504,73 @@ class OscilloscopeMonitor(QMainWindow):
             self.plot_widget_diff.setVisible(True)
             self.adc_value_diff.setVisible(True)
             self.freq_label_diff_fft.setVisible(True)
+            # 隐藏期间没有更新过，显示时补一次范围和曲线
+            self.plot_widget_diff.setXRange(*self.plot_widget1.viewRange()[0], padding=0)
+            self.refresh_curves()
 
     def toggle_running(self):
         """启动/停止采集线程"""
-        if not self.running:
-            self.running = True
+        if not self.engine.running:
+            self.engine.reconfigure(self.current_config())
+            self.freq_tracker.reset()
+            self.history.clear()
+            self.trigger.reset()
+            self.read_cursor = 0
+            self.engine.start()
             self.start_button.setText("Stop")
-            self.first_timestamp = None  
-            
-            self.sample_count = 0
-            self.last_sample_time = None
-            self.actual_rate = 0.0
-            
-            with self.data_lock:
-                self.global_block_t.clear()
-                self.global_block_1.clear()
-                self.global_block_2.clear()
-                self.global_block_diff.clear()
-
-            self.acquisition_thread = threading.Thread(
-                target=self.acquisition_loop, daemon=True
-            )
-            self.acquisition_thread.start()
         else:
-            self.running = False
+            self.engine.stop()
             self.start_button.setText("Start")
 
-    def acquisition_loop(self):
-        
-        next_sample_time = time.perf_counter()
-        
-        while self.running:
-            now = time.perf_counter()
-         
-            if now < next_sample_time:
-                time.sleep(next_sample_time - now)
-
-          
-            real_t = time.perf_counter()
-
-        
-            if self.first_timestamp is None:
-                self.first_timestamp = real_t
-                self.last_sample_time = real_t
-            else:
-                self.last_sample_time = real_t
-            
-          
-            normalized_t = real_t - self.first_timestamp
-            
-          
-            self.sample_count += 1
-            
-            if normalized_t > 0:
-                self.actual_rate = self.sample_count / normalized_t
-
-            ch1 = self.adc_channel1.value()
-            ch2 = self.adc_channel2.value()
-
-            code_v1 = self.adc.read_adc_voltage(ch1, 0)  # 0~4.096
-            code_v2 = self.adc.read_adc_voltage(ch2, 0)
-
-            real_v1 = code_v1 - 1.5
-            real_v2 = code_v2 - 1.5
-
-            if self.adc_mode.currentIndex() == 1:  
-                diff_v = real_v1 - real_v2
-            else:
-                diff_v = 0.0
-
-            with self.data_lock:
-                self.global_block_t.append(normalized_t)
-                self.global_block_1.append(real_v1)
-                self.global_block_2.append(real_v2)
-                self.global_block_diff.append(diff_v)
-
-            next_sample_time += 1.0 / self.adc_rate
-
     def update_plot(self):
-        with self.data_lock:
-            if not self.global_block_t:
-                return
-            data_t    = np.array(self.global_block_t) 
-            data1     = np.array(self.global_block_1)
-            data2     = np.array(self.global_block_2)
-            data_diff = np.array(self.global_block_diff)
-
-        self.curve1.setData(x=data_t, y=data1)
-        self.curve2.setData(x=data_t, y=data2)
-        self.curve_diff.setData(x=data_t, y=data_diff)
+        t0 = time.perf_counter()
+        self.refresh_plot()
+        duration = time.perf_counter() - t0
+        self.plot_hist.observe(duration)
+        # 绘图耗时超出预算时拉长刷新间隔，负载下降后恢复
+        interval = self.pacer.update(duration)
+        if interval != self.timer.interval():
+            self.timer.setInterval(interval)
+        if self.diag_group.isChecked():
+            self.diag_label.setText(self.metrics.summary())
+
+    def refresh_plot(self):
+        self.update_record_status()
+        if not self.engine.running and self.start_button.text() == "Stop":
+            # 回放到达文件末尾
+            self.start_button.setText("Start")
+        window = self.window_spin.value()
+        if len(self.frame) < window:
+            self.frame = np.empty((window, len(self.engine.COLUMNS)))
+        # 显示数组预先分配，每次刷新原地覆盖
+        snapshot = self.engine.snapshot(window, out=self.frame)
+        if snapshot is None:
+            return
+        data_t, data1, data2, data_diff = snapshot
+        new_rows, self.read_cursor, lost = self.engine.read_since(self.read_cursor)
+        self.history.extend(new_rows)
+
+        if self.trigger_mode.currentData() is None:
+            self.trigger_status.setText("Scrolling")
+            self.plot_data = snapshot
+        else:
+            self.update_trigger_frame(new_rows)
+        # 实时窗口跟随最新数据；历史视图保留用户的缩放，再按可见范围抽取后绘制
+        if self.view_combo.currentIndex() == 0 and self.plot_data is not None:
+            self.follow_live()
+        self.refresh_curves()
 
         if len(data1) > 0:
             self.adc_value1.setText(f"ADC1: {data1[-1]:.3f} V")
             self.adc_value2.setText(f"ADC2: {data2[-1]:.3f} V")
             self.adc_value_diff.setText(f"Differential: {data_diff[-1]:.3f} V")
 
-        freq1_fft = self.measure_frequency_fft(data_t, data1)
-        freq2_fft = self.measure_frequency_fft(data_t, data2)
-        freq_d_fft = 0.0
+        differential = self.adc_mode.currentIndex() == 1
+        self.freq_tracker.feed(new_rows, lost, (0, 1, 2) if differential else (0, 1))
 
-        if self.adc_mode.currentIndex() == 1:
-            freq_d_fft = self.measure_frequency_fft(data_t, data_diff)
+        freq1_fft = self.freq_tracker.frequency(0)
+        freq2_fft = self.freq_tracker.frequency(1)
+        freq_d_fft = self.freq_tracker.frequency(2) if differential else 0.0
 
         # 更新频率显示 (FFT)
         self.freq_label1_fft.setText(f"Freq1 (FFT): {freq1_fft:.2f} Hz")
@@ -292,48 +578,102 @@ class OscilloscopeMonitor(QMainWindow):
         self.freq_label_diff_fft.setText(f"Freq Diff (FFT): {freq_d_fft:.2f} Hz")
         
         # =============== 更新实际采样率 ===============
-        self.actual_rate_label.setText(f"{self.actual_rate:.2f} Hz")
-
-        # 自动范围 X 轴
-        self.plot_widget1.enableAutoRange(axis=pg.ViewBox.XAxis, enable=True)
-        self.plot_widget2.enableAutoRange(axis=pg.ViewBox.XAxis, enable=True)
-        self.plot_widget_diff.enableAutoRange(axis=pg.ViewBox.XAxis, enable=True)
-
-    def measure_frequency_fft(self, data_t, data_y):
-       
-        n = len(data_y)
-        if n < 4:
-            return 0.0
-
-        t_min = data_t[0]  
-        t_max = data_t[-1]
-        duration = t_max - t_min
-        if duration <= 0:
-            return 0.0
-
-        fs_est = (n - 1) / duration
-        
-        y_centered = data_y - np.mean(data_y)
-        window = np.hanning(n)
-        y_win = y_centered * window
-        
-        Y = np.fft.rfft(y_win)
-        freqs = np.fft.rfftfreq(n, d=1.0/fs_est)
-        mag = np.abs(Y)
-        
-        idx_max = np.argmax(mag)
-        peak_freq = freqs[idx_max]
-        return peak_freq
+        self.actual_rate_label.setText(
+            f"{self.engine.actual_rate:.2f} Hz (missed {self.engine.scheduler.missed})")
+
+    def update_trigger_frame(self, new_rows):
+        """触发模式下只显示以触发点为 t=0 对齐的一帧"""
+        frame = self.trigger.feed(new_rows)
+        if frame is not None:
+            rows = frame.rows
+            self.plot_data = (rows[:, 0] - frame.t_trigger, rows[:, 1], rows[:, 2], rows[:, 3])
+        if self.trigger.stopped:
+            self.trigger_status.setText("Stopped")
+        elif frame is None:
+            self.trigger_status.setText("Waiting")
+        else:
+            self.trigger_status.setText("Triggered" if frame.triggered else "Auto")
+
+    def toggle_recording(self):
+        """开始/停止把每个样本流式写入 captures/ 目录"""
+        if self.engine.recorder is None:
+            writer = CaptureWriter(capture_prefix(), self.engine.COLUMNS,
+                                   chunk_rows=self.chunk_rows_spin.value(),
+                                   rotate_bytes=self.rotate_mb_spin.value() * 1024 * 1024)
+            self.engine.start_recording(writer)
+            self.record_button.setText("Stop Recording")
+        else:
+            writer = self.engine.stop_recording()
+            self.record_button.setText("Record")
+            self.record_status.setText(f"Saved {writer.prefix}.json")
+
+    def update_record_status(self):
+        writer = self.engine.recorder
+        if writer is None:
+            return
+        stats = writer.stats()
+        self.record_status.setText(
+            f"{stats['bytes_written'] / 1e6:.1f} MB, "
+            f"{stats['throughput_bytes_per_s'] / 1e3:.0f} kB/s, "
+            f"queue {stats['queue_depth']}, dropped {stats['dropped_rows']}")
+
+    def update_timing(self, *args):
+        if self.diag_group.isChecked() or self.metrics_exporter is not None:
+            self.engine.instrument(self.metrics)
+        else:
+            self.engine.uninstrument()
 
     def closeEvent(self, event):
-        self.running = False
-        time.sleep(0.5)  
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        if self.stream_server is not None:
+            self.stream_server.stop()
+        self.engine.stop()
+        self.engine.stop_recording()
+        if isinstance(self.engine, ProcessEngine):
+            self.engine.shutdown()
         event.accept()
 
+def parse_address(text, default_host):
+    """'HOST:PORT'、'HOST' 或 'PORT' -> (host, port)"""
+    host, _, port = text.rpartition(':')
+    if not host and not port.isdigit():
+        host, port = port, ''
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="ADC Monitor")
+    parser.add_argument('--sim', action='store_true',
+                        help='使用仿真板卡（也可设置 EXPANDERPI_SIM=1）')
+    parser.add_argument('--replay', metavar='CAPTURE',
+                        help='回放记录文件（<prefix>.json 或 .cap）')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放速度倍数')
+    parser.add_argument('--process', action='store_true',
+                        help='在独立进程中采集（共享内存环形缓冲）')
+    parser.add_argument('--serve', metavar='[HOST:]PORT', nargs='?', const=str(DEFAULT_PORT),
+                        help='通过 TCP 向远程查看端发布样本（默认仅本机 127.0.0.1）')
+    parser.add_argument('--connect', metavar='HOST[:PORT]',
+                        help='查看远程 --serve 发布的样本')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='定期把计时统计以 Prometheus 文本格式写入文件')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='在 127.0.0.1:PORT 上提供 Prometheus 抓取')
+    profiling.add_arguments(parser)
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     pg.setConfigOptions(antialias=True)
-    window = OscilloscopeMonitor()
+    window = OscilloscopeMonitor(simulate=args.sim or None, replay=args.replay,
+                                 speed=args.speed, separate_process=args.process,
+                                 serve=args.serve and parse_address(args.serve, '127.0.0.1'),
+                                 connect=args.connect and parse_address(args.connect,
+                                                                        '127.0.0.1'),
+                                 metrics_file=args.metrics_file,
+                                 metrics_port=args.metrics_port)
+    profile = profiling.setup(window.metrics, args,
+                              extra=((OscilloscopeMonitor, 'refresh_plot', 'ui_refresh_plot'),))
+    if profile is not None:
+        app.aboutToQuit.connect(profile.finish)
     window.show()
     sys.exit(app.exec_())
 
@@ -0,0 +1,216 @@
+import sys
+import argparse
+
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
+    QPushButton, QComboBox, QLabel, QSpinBox, QGridLayout, QCheckBox
+)
+from PyQt5.QtCore import QTimer
+import pyqtgraph as pg
+
+from acquisition import ADC_CHANNELS, ScanChannel, ScanConfig, ScanEngine
+from analysis import FrequencyTracker
+from board import load_expanderpi
+from decimation import LTTB, MINMAX, NONE, decimate_for_view
+from render import CurveRenderer
+
+COLORS = ['y', 'g', 'c', 'm', 'r', 'w', (255, 128, 0), (128, 128, 255)]
+
+
+class ScanMonitor(QMainWindow):
+    """8 通道扫描监视：每个启用的通道一张图、一组读数和测频"""
+
+    def __init__(self, simulate=None):
+        super().__init__()
+        self.setWindowTitle("ADC Scan Monitor (UI显示=电压 -1.5V)")
+        self.setGeometry(100, 100, 1200, 1000)
+
+        self.maxlen = 300
+        self.buffer_len = 1 << 16
+        self.setup_ui()
+
+        ADC, _ = load_expanderpi(simulate)
+        self.adc = ADC()
+        self.engine = ScanEngine(self.adc, self.current_config(), maxlen=self.buffer_len)
+        self.connect_config_signals()
+
+        self.freq_tracker = FrequencyTracker(ADC_CHANNELS, segment_len=self.maxlen)
+        self.read_cursor = 0
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.update_plot)
+        self.timer.start(1000)
+
+    def setup_ui(self):
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+
+        control_panel = QHBoxLayout()
+
+        scan_group = QGroupBox("Scan List")
+        scan_layout = QGridLayout()
+        scan_layout.addWidget(QLabel("Channel"), 0, 0)
+        scan_layout.addWidget(QLabel("Divisor"), 0, 1)
+        scan_layout.addWidget(QLabel("Value"), 0, 2)
+        scan_layout.addWidget(QLabel("Freq (FFT)"), 0, 3)
+
+        self.enable_boxes = []
+        self.divisor_spins = []
+        self.value_labels = []
+        self.freq_labels = []
+        for i in range(ADC_CHANNELS):
+            box = QCheckBox(f"CH{i + 1}")
+            box.setChecked(i in (6, 7))
+            divisor = QSpinBox()
+            divisor.setRange(1, 1000)
+            value = QLabel("0.000 V")
+            freq = QLabel("0.0 Hz")
+            scan_layout.addWidget(box, i + 1, 0)
+            scan_layout.addWidget(divisor, i + 1, 1)
+            scan_layout.addWidget(value, i + 1, 2)
+            scan_layout.addWidget(freq, i + 1, 3)
+            self.enable_boxes.append(box)
+            self.divisor_spins.append(divisor)
+            self.value_labels.append(value)
+            self.freq_labels.append(freq)
+
+        scan_group.setLayout(scan_layout)
+        control_panel.addWidget(scan_group)
+
+        rate_group = QGroupBox("Sampling Rate Control")
+        rate_layout = QGridLayout()
+
+        rate_layout.addWidget(QLabel("Scan Rate (Hz):"), 0, 0)
+        self.adc_rate_spin = QSpinBox()
+        self.adc_rate_spin.setRange(1, 100000)
+        self.adc_rate_spin.setValue(500)
+        rate_layout.addWidget(self.adc_rate_spin, 0, 1)
+
+        rate_layout.addWidget(QLabel("Actual Scan Rate:"), 1, 0)
+        self.actual_rate_label = QLabel("0.0 Hz")
+        rate_layout.addWidget(self.actual_rate_label, 1, 1)
+
+        self.start_button = QPushButton("Start")
+        self.start_button.clicked.connect(self.toggle_running)
+        rate_layout.addWidget(self.start_button, 2, 0, 1, 2)
+
+        rate_layout.addWidget(QLabel("Display decimation:"), 3, 0)
+        self.decimation_combo = QComboBox()
+        self.decimation_combo.addItem('Min/Max', MINMAX)
+        self.decimation_combo.addItem('LTTB', LTTB)
+        self.decimation_combo.addItem('Off', NONE)
+        rate_layout.addWidget(self.decimation_combo, 3, 1)
+
+        rate_layout.addWidget(QLabel("Window (scans):"), 4, 0)
+        self.window_spin = QSpinBox()
+        self.window_spin.setRange(10, self.buffer_len)
+        self.window_spin.setValue(self.maxlen)
+        rate_layout.addWidget(self.window_spin, 4, 1)
+
+        rate_group.setLayout(rate_layout)
+        control_panel.addWidget(rate_group)
+
+        main_layout.addLayout(control_panel)
+        plot_layout = QVBoxLayout()
+
+        self.plot_widgets = []
+        self.curves = []
+        for i in range(ADC_CHANNELS):
+            widget = pg.PlotWidget()
+            widget.setBackground('k')
+            widget.setLabel('left', f"CH{i + 1} (V)")
+            widget.showGrid(x=True, y=True)
+            widget.setYRange(-1.5, 2.6)
+            if self.plot_widgets:
+                widget.setXLink(self.plot_widgets[0])
+            curve = CurveRenderer(widget.plot(), COLORS[i])
+            plot_layout.addWidget(widget)
+            self.plot_widgets.append(widget)
+            self.curves.append(curve)
+        self.plot_widgets[-1].setLabel('bottom', "Time (s)")
+
+        main_layout.addLayout(plot_layout)
+        self.update_visibility()
+
+    def enabled_channels(self):
+        """启用通道的下标（0 起）"""
+        return [i for i, box in enumerate(self.enable_boxes) if box.isChecked()]
+
+    def current_config(self):
+        scan = tuple(ScanChannel(i + 1, self.divisor_spins[i].value())
+                     for i in self.enabled_channels())
+        return ScanConfig(scan=scan, adc_rate=self.adc_rate_spin.value())
+
+    def connect_config_signals(self):
+        for box in self.enable_boxes:
+            box.stateChanged.connect(self.on_config_changed)
+        for spin in self.divisor_spins:
+            spin.valueChanged.connect(self.on_config_changed)
+        self.adc_rate_spin.valueChanged.connect(self.on_config_changed)
+
+    def on_config_changed(self, *args):
+        self.engine.reconfigure(self.current_config())
+        self.update_visibility()
+
+    def update_visibility(self):
+        enabled = self.enabled_channels()
+        for i in range(ADC_CHANNELS):
+            visible = i in enabled
+            self.plot_widgets[i].setVisible(visible)
+            self.value_labels[i].setEnabled(visible)
+            self.freq_labels[i].setEnabled(visible)
+
+    def toggle_running(self):
+        if not self.engine.running:
+            self.engine.reconfigure(self.current_config())
+            self.freq_tracker.reset()
+            self.read_cursor = 0
+            self.engine.start()
+            self.start_button.setText("Stop")
+        else:
+            self.engine.stop()
+            self.start_button.setText("Start")
+
+    def update_plot(self):
+        snapshot = self.engine.snapshot(self.window_spin.value())
+        if snapshot is None:
+            return
+        data_t = snapshot[0]
+        enabled = self.enabled_channels()
+        method = self.decimation_combo.currentData()
+        for i in enabled:
+            data_y = snapshot[i + 1]
+            vb = self.plot_widgets[i].getViewBox()
+            x, y = decimate_for_view(data_t, data_y, None, vb.width(), method)
+            self.curves[i].set_data(x, y)
+            self.value_labels[i].setText(f"{data_y[-1]:.3f} V")
+
+        new_rows, self.read_cursor, lost = self.engine.read_since(self.read_cursor)
+        self.freq_tracker.feed(new_rows, lost, enabled)
+        for i in enabled:
+            self.freq_labels[i].setText(f"{self.freq_tracker.frequency(i):.2f} Hz")
+
+        self.actual_rate_label.setText(
+            f"{self.engine.actual_rate:.2f} Hz (missed {self.engine.scheduler.missed})")
+
+    def closeEvent(self, event):
+        self.engine.stop()
+        event.accept()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADC Scan Monitor")
+    parser.add_argument('--sim', action='store_true',
+                        help='使用仿真板卡（也可设置 EXPANDERPI_SIM=1）')
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    pg.setConfigOptions(antialias=True)
+    window = ScanMonitor(simulate=args.sim or None)
+    window.show()
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,27 @@
+import os
 import sys
+import argparse
 import time
-import math
-import numpy as np
 import threading
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QGroupBox, QGridLayout, QLabel, QDoubleSpinBox,
-    QSpinBox, QPushButton, QComboBox, QCheckBox
+    QSpinBox, QPushButton, QComboBox, QCheckBox, QFileDialog
 )
 from PyQt5.QtCore import Qt, QTimer
-from ExpanderPi import DAC
+from PyQt5.QtGui import QFontDatabase
+
+from arbitrary import WaveformPlayer, remove_sidecar, sidecar_path
+from board import load_expanderpi
+from metrics import (MetricsExporter, MetricsRegistry, instrument_scheduler,
+                     uninstrument_scheduler)
+import profiling
+from scheduler import DeadlineScheduler
+from waveforms import DDSOscillator, dac_pair
 
 
 class WaveformGenerator(QMainWindow):
-    def __init__(self):
+    def __init__(self, simulate=None, metrics_file=None, metrics_port=None):
         super().__init__()
         self.initUI()
         
@@ -27,7 +35,43 @@ class WaveformGenerator(QMainWindow):
         self.sample_start_time = time.time()
         self.actual_sample_rate = 0
         
+        self.osc1 = DDSOscillator(self.wave_type1.currentText(), self.freq1.value(),
+                                  self.amp1.value(), self.offset1.value(),
+                                  self.params['sample_rate'])
+        self.osc2 = DDSOscillator(self.wave_type2.currentText(), self.freq2.value(),
+                                  self.amp2.value(), self.offset2.value(),
+                                  self.params['sample_rate'])
+        # 任意波形回放器，载入文件后才有
+        self.players = {1: None, 2: None}
+        # 后台载入线程：通道 -> (线程, 路径, 进度/结果字典)
+        self.loaders = {}
+        # 限幅缓存目录；None 表示放在源文件旁边（不可写时放临时目录）
+        self.cache_dir = None
+        # 各通道当前文件及其缓存目录：(路径, cache_dir)
+        self.caches = {1: None, 2: None}
+        self.load_timer = QTimer()
+        self.load_timer.timeout.connect(self.poll_loaders)
+        self.update_cache_label()
+        # 输出线程只读这个字典，不去读界面控件
+        self.arbitrary = {1: False, 2: False}
+        self.connect_wave_signals()
+        
+        _, DAC = load_expanderpi(simulate)
         self.dac = DAC(gainFactor=2)
+        # 绝对截止时间调度，实际速率不随单次误差漂移
+        self.scheduler = DeadlineScheduler(self.params['sample_rate'])
+        self.metrics = MetricsRegistry()
+        # 为 None 时输出循环不计时；见 update_timing
+        self.write_hist = None
+        self.metrics.gauge('dac_actual_rate_hz', lambda: self.actual_sample_rate,
+                           'measured DAC update rate')
+        self.metrics_exporter = None
+        if metrics_file is not None or metrics_port is not None:
+            self.metrics_exporter = MetricsExporter(self.metrics, path=metrics_file,
+                                                    port=metrics_port).start()
+        # 逐样本计时有开销：只在诊断面板打开或启用导出时挂上
+        self.update_timing()
+        self.diag_checkbox.toggled.connect(self.update_timing)
         self.wave_thread = threading.Thread(target=self.update_wave)
         self.wave_thread.daemon = True  
         
@@ -51,7 +95,9 @@ class WaveformGenerator(QMainWindow):
         self.wave_type1.addItems([
             'Sine', 
             'Square',
-            'Triangle'
+            'Triangle',
+            'Sawtooth',
+            'Arbitrary'
         ])
         
         self.freq1 = QDoubleSpinBox()
@@ -74,6 +120,16 @@ class WaveformGenerator(QMainWindow):
         group1_layout.addWidget(self.amp1,                2, 1)
         group1_layout.addWidget(QLabel('OFFSET (V):'),     3, 0)
         group1_layout.addWidget(self.offset1,             3, 1)
+
+        self.load1 = QPushButton('Load...')
+        self.load1.clicked.connect(lambda: self.load_arbitrary(1))
+        self.loop1 = QCheckBox('Loop')
+        self.loop1.setChecked(True)
+        self.loop1.stateChanged.connect(lambda state: self.on_loop_changed(1))
+        self.file1_label = QLabel('No file')
+        group1_layout.addWidget(self.load1,               4, 0)
+        group1_layout.addWidget(self.loop1,               4, 1)
+        group1_layout.addWidget(self.file1_label,         5, 0, 1, 2)
         
         group1.setLayout(group1_layout)
         layout.addWidget(group1)
@@ -86,7 +142,9 @@ class WaveformGenerator(QMainWindow):
         self.wave_type2.addItems([
             'Sine', 
             'Square',
-            'Triangle'
+            'Triangle',
+            'Sawtooth',
+            'Arbitrary'
         ])
         
         self.wave_type2.setCurrentText('Square')
@@ -111,6 +169,16 @@ class WaveformGenerator(QMainWindow):
         group2_layout.addWidget(self.amp2,                2, 1)
         group2_layout.addWidget(QLabel('OFFSET (V):'),     3, 0)
         group2_layout.addWidget(self.offset2,             3, 1)
+
+        self.load2 = QPushButton('Load...')
+        self.load2.clicked.connect(lambda: self.load_arbitrary(2))
+        self.loop2 = QCheckBox('Loop')
+        self.loop2.setChecked(True)
+        self.loop2.stateChanged.connect(lambda state: self.on_loop_changed(2))
+        self.file2_label = QLabel('No file')
+        group2_layout.addWidget(self.load2,               4, 0)
+        group2_layout.addWidget(self.loop2,               4, 1)
+        group2_layout.addWidget(self.file2_label,         5, 0, 1, 2)
         
         group2.setLayout(group2_layout)
         layout.addWidget(group2)
@@ -121,6 +189,21 @@ class WaveformGenerator(QMainWindow):
         layout.addWidget(self.diff_checkbox)
         
         
+        cache_group = QGroupBox('Arbitrary Waveform Cache')
+        cache_layout = QGridLayout()
+        self.cache_label = QLabel()
+        self.cache_label.setWordWrap(True)
+        self.cache_dir_button = QPushButton('Cache Folder...')
+        self.cache_dir_button.clicked.connect(self.choose_cache_dir)
+        self.cache_remove_button = QPushButton('Remove Caches')
+        self.cache_remove_button.clicked.connect(self.remove_caches)
+        cache_layout.addWidget(self.cache_label,          0, 0, 1, 2)
+        cache_layout.addWidget(self.cache_dir_button,     1, 0)
+        cache_layout.addWidget(self.cache_remove_button,  1, 1)
+        cache_group.setLayout(cache_layout)
+        layout.addWidget(cache_group)
+        
+        
         sample_group = QGroupBox('Sampling Rate')
         sample_layout = QGridLayout()
         
@@ -136,6 +219,14 @@ class WaveformGenerator(QMainWindow):
         sample_layout.addWidget(QLabel('Target rate (Hz):'), 0, 0)
         sample_layout.addWidget(self.sample_rate,        0, 1)
         sample_layout.addWidget(self.actual_rate_label,  1, 0, 1, 2)
+
+        self.diag_checkbox = QCheckBox('Show timing diagnostics (µs)')
+        self.diag_label = QLabel('')
+        self.diag_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.diag_label.setVisible(False)
+        self.diag_checkbox.toggled.connect(self.diag_label.setVisible)
+        sample_layout.addWidget(self.diag_checkbox,      2, 0, 1, 2)
+        sample_layout.addWidget(self.diag_label,         3, 0, 1, 2)
         
         sample_group.setLayout(sample_layout)
         layout.addWidget(sample_group)
@@ -155,9 +246,150 @@ class WaveformGenerator(QMainWindow):
         self.freq2.setEnabled(enabled)
         self.amp2.setEnabled(enabled)
         self.offset2.setEnabled(enabled)
-        
+        self.load2.setEnabled(enabled)
+        self.loop2.setEnabled(enabled)
+        
+    def connect_wave_signals(self):
+        for widget in (self.freq1, self.amp1, self.offset1):
+            widget.valueChanged.connect(self.on_wave1_changed)
+        self.wave_type1.currentIndexChanged.connect(self.on_wave1_changed)
+        for widget in (self.freq2, self.amp2, self.offset2):
+            widget.valueChanged.connect(self.on_wave2_changed)
+        self.wave_type2.currentIndexChanged.connect(self.on_wave2_changed)
+
+    def load_arbitrary(self, channel):
+        """在后台线程载入并限幅，界面定时器轮询进度；大文件不会卡住窗口"""
+        if channel in self.loaders:
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, f'Load waveform for channel {channel}', '',
+            'Waveforms (*.npy *.f32 *.f64 *.u16);;All files (*)')
+        if not path:
+            return
+        loop_box = self.loop1 if channel == 1 else self.loop2
+        # 控件只在界面线程读取
+        loop = loop_box.isChecked()
+        cache_dir = self.cache_dir
+        state = {'done': 0, 'total': 0, 'player': None, 'error': None,
+                 'cache_dir': cache_dir}
+
+        def progress(done, total):
+            state['done'], state['total'] = done, total
+
+        def work():
+            try:
+                state['player'] = WaveformPlayer.from_file(
+                    path, loop=loop, cache_dir=cache_dir, progress=progress)
+            except (OSError, ValueError) as e:
+                state['error'] = e
+
+        thread = threading.Thread(target=work, daemon=True)
+        self.loaders[channel] = (thread, path, state)
+        (self.load1 if channel == 1 else self.load2).setEnabled(False)
+        self.cache_dir_button.setEnabled(False)
+        self.cache_remove_button.setEnabled(False)
+        label = self.file1_label if channel == 1 else self.file2_label
+        label.setText(f'{os.path.basename(path)}: loading...')
+        thread.start()
+        self.load_timer.start(100)
+
+    def poll_loaders(self):
+        for channel, (thread, path, state) in list(self.loaders.items()):
+            label = self.file1_label if channel == 1 else self.file2_label
+            name = os.path.basename(path)
+            if thread.is_alive():
+                if state['total']:
+                    label.setText(f"{name}: clamping "
+                                  f"{100.0 * state['done'] / state['total']:.0f}%")
+                continue
+            del self.loaders[channel]
+            load_button = self.load1 if channel == 1 else self.load2
+            load_button.setEnabled(channel == 1 or not self.params['diff_mode'])
+            if state['error'] is not None:
+                label.setText(f"Load failed: {state['error']}")
+                continue
+            self.finish_load(channel, path, state['player'], state['cache_dir'])
+        if not self.loaders:
+            self.load_timer.stop()
+            self.cache_dir_button.setEnabled(True)
+            self.cache_remove_button.setEnabled(True)
+
+    def finish_load(self, channel, path, player, cache_dir):
+        self.players[channel] = player
+        self.caches[channel] = (path, cache_dir)
+        label = self.file1_label if channel == 1 else self.file2_label
+        label.setText(f'{os.path.basename(path)}  ({len(player)} samples)')
+        self.update_cache_label()
+        combo = self.wave_type1 if channel == 1 else self.wave_type2
+        if combo.currentText() == 'Arbitrary':
+            self.arbitrary[channel] = True
+        else:
+            combo.setCurrentText('Arbitrary')
+
+    def update_cache_label(self):
+        if self.cache_dir is None:
+            where = 'next to the source file (temp dir if read-only)'
+        else:
+            where = f'in {self.cache_dir}'
+        caches = [sidecar_path(path, cache_dir=cache_dir)
+                  for path, cache_dir in filter(None, self.caches.values())]
+        size = sum(os.path.getsize(c) for c in caches if os.path.exists(c))
+        self.cache_label.setText(
+            f'Loading clamps each file into a float32 copy (4 bytes/sample) stored '
+            f'{where}. Cached: {size / 1e6:.1f} MB')
+
+    def choose_cache_dir(self):
+        directory = QFileDialog.getExistingDirectory(self, 'Waveform cache folder')
+        if directory:
+            self.cache_dir = directory
+            self.update_cache_label()
+
+    def remove_caches(self):
+        """删除已载入文件的限幅缓存；正在回放的数据仍然有效，下次载入时重新生成"""
+        for path, cache_dir in filter(None, self.caches.values()):
+            remove_sidecar(path, cache_dir=cache_dir)
+        self.update_cache_label()
+
+    def on_loop_changed(self, channel):
+        player = self.players[channel]
+        if player is not None:
+            loop_box = self.loop1 if channel == 1 else self.loop2
+            player.loop = loop_box.isChecked()
+            player.reset()
+
+    def source(self, channel):
+        """返回通道当前的样本源和它是否已经限幅过"""
+        player = self.players[channel]
+        if self.arbitrary[channel] and player is not None:
+            return player, True
+        return (self.osc1 if channel == 1 else self.osc2), False
+
+    def on_wave1_changed(self, *args):
+        was_arbitrary = self.arbitrary[1]
+        self.arbitrary[1] = self.wave_type1.currentText() == 'Arbitrary'
+        if self.arbitrary[1]:
+            # 切换到任意波形时从头播放
+            if not was_arbitrary and self.players[1] is not None:
+                self.players[1].reset()
+            return
+        self.osc1.configure(self.wave_type1.currentText(), self.freq1.value(),
+                            self.amp1.value(), self.offset1.value())
+
+    def on_wave2_changed(self, *args):
+        was_arbitrary = self.arbitrary[2]
+        self.arbitrary[2] = self.wave_type2.currentText() == 'Arbitrary'
+        if self.arbitrary[2]:
+            # 切换到任意波形时从头播放
+            if not was_arbitrary and self.players[2] is not None:
+                self.players[2].reset()
+            return
+        self.osc2.configure(self.wave_type2.currentText(), self.freq2.value(),
+                            self.amp2.value(), self.offset2.value())
+
     def update_sample_rate(self):
         self.params['sample_rate'] = self.sample_rate.value()
+        self.osc1.set_frequency(self.osc1.freq, self.params['sample_rate'])
+        self.osc2.set_frequency(self.osc2.freq, self.params['sample_rate'])
         
     def update_actual_rate_display(self):
         
@@ -166,85 +398,80 @@ class WaveformGenerator(QMainWindow):
             elapsed = current_time - self.sample_start_time
             if elapsed > 0:
                 self.actual_sample_rate = self.sample_count / elapsed
-                self.actual_rate_label.setText(f'Actual rate: {self.actual_sample_rate:.1f} Hz')
+                self.actual_rate_label.setText(
+                    f'Actual rate: {self.actual_sample_rate:.1f} Hz  '
+                    f'(missed deadlines: {self.scheduler.missed})')
                 
                
                 self.sample_count = 0
                 self.sample_start_time = current_time
+        if self.diag_checkbox.isChecked():
+            self.diag_label.setText(self.metrics.summary())
         
-    def generate_value(self, wave_type_str, freq, amplitude, offset, t):
-        
-        wave_type = wave_type_str.split(' ')[0]  
-        
-        if wave_type == 'Sine':
-            val = amplitude * math.sin(2 * math.pi * freq * t) + offset
-        elif wave_type == 'Square':
-           
-            val = amplitude * np.sign(math.sin(2 * math.pi * freq * t)) + offset
-        elif wave_type == 'Triangle':
-            
-            t_norm = (t * freq) % 1.0
-            if t_norm < 0.5:
-                val = offset + amplitude * (4 * t_norm - 1)
-            else:
-                val = offset + amplitude * (3 - 4 * t_norm)
-        else:  
-            val = amplitude * math.sin(2 * math.pi * freq * t) + offset
-        
-        return val
-    
+    def next_block(self):
+        """预先生成约 20 ms 的两路输出（含差分镜像和限幅）
+
+        任意波形在载入时已经限幅，这里直接切片输出，不再逐块限幅。
+        """
+        n = max(1, self.params['sample_rate'] // 50)
+        diff_mode = self.params['diff_mode']
+        source1, clamped1 = self.source(1)
+        source2, clamped2 = self.source(2)
+        values1 = source1.next_block(n)
+        values2 = None if diff_mode else source2.next_block(n)
+        block1, block2 = dac_pair(values1, values2, source1.offset, diff_mode,
+                                  clamped=(clamped1, clamped2))
+        return block1.tolist(), block2.tolist()
+
     def update_wave(self):
         
+        set_dac_voltage = self.dac.set_dac_voltage
+        scheduler = self.scheduler
+        perf_counter = time.perf_counter
+        block1 = block2 = []
+        pos = 0
+        skipped = 0
         while True:
             if not self.params['running']:
                 time.sleep(0.1)
+                block1 = block2 = []
+                pos = 0
+                skipped = 0
                 continue
             
-            sample_period = 1.0 / self.params['sample_rate']
-            next_sample_time = time.time() + sample_period
-            
-         
-            t = time.time()
-            
-            value1 = self.generate_value(
-                self.wave_type1.currentText(),
-                self.freq1.value(),
-                self.amp1.value(),
-                self.offset1.value(),
-                t
-            )
-           
-            value1 = max(0, min(4.096, value1))
-            
-           
-            if self.params['diff_mode']:
-                
-                offset1 = self.offset1.value()
-                
-                mirrored_value2 = 2 * offset1 - value1
-                value2 = max(0, min(4.096, mirrored_value2))
-            else:
-               
-                value2 = self.generate_value(
-                    self.wave_type2.currentText(),
-                    self.freq2.value(),
-                    self.amp2.value(),
-                    self.offset2.value(),
-                    t
-                )
-                value2 = max(0, min(4.096, value2))
-            
-           
-            self.dac.set_dac_voltage(1, value1)
-            self.dac.set_dac_voltage(2, value2)
-            
+            # 波形计算全部在 next_block 中向量化完成，这里只把数据推给 DAC
+            if scheduler.rate != self.params['sample_rate']:
+                scheduler.set_rate(self.params['sample_rate'])
+            scheduler.wait()
 
+            # 跳过的节拍也推进波形，输出频率不受错过截止时间影响
+            pos += max(0, scheduler.skipped - skipped)
+            skipped = scheduler.skipped
+            while pos >= len(block1):
+                pos -= len(block1)
+                block1, block2 = self.next_block()
+
+            write_hist = self.write_hist
+            if write_hist is None:
+                set_dac_voltage(1, block1[pos])
+                set_dac_voltage(2, block2[pos])
+            else:
+                t0 = perf_counter()
+                set_dac_voltage(1, block1[pos])
+                set_dac_voltage(2, block2[pos])
+                write_hist.observe(perf_counter() - t0)
+            pos += 1
             self.sample_count += 1
-            
-            sleep_time = next_sample_time - time.time()
-            if sleep_time > 0:
-                time.sleep(sleep_time)
     
+    def update_timing(self, *args):
+        if self.diag_checkbox.isChecked() or self.metrics_exporter is not None:
+            instrument_scheduler(self.metrics, self.scheduler, 'dac')
+            self.write_hist = self.metrics.histogram('dac_spi_write_seconds',
+                                                     'time spent writing both DAC channels')
+        else:
+            uninstrument_scheduler(self.scheduler)
+            self.write_hist = None
+
     def toggle_output(self):
 
         if not self.params['running']:
@@ -253,6 +480,7 @@ class WaveformGenerator(QMainWindow):
             
             self.sample_count = 0
             self.sample_start_time = time.time()
+            self.scheduler.reset()
             
             if not self.wave_thread.is_alive():
                 self.wave_thread.start()
@@ -265,13 +493,30 @@ class WaveformGenerator(QMainWindow):
     def closeEvent(self, event):
 
         self.params['running'] = False
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
         time.sleep(0.2)  
         event.accept()
 
 
 def main():
-    app = QApplication(sys.argv)
-    window = WaveformGenerator()
+    parser = argparse.ArgumentParser(description='Signal Generator')
+    parser.add_argument('--sim', action='store_true',
+                        help='使用仿真板卡（也可设置 EXPANDERPI_SIM=1）')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='定期把计时统计以 Prometheus 文本格式写入文件')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='在 127.0.0.1:PORT 上提供 Prometheus 抓取')
+    profiling.add_arguments(parser)
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = WaveformGenerator(simulate=args.sim or None, metrics_file=args.metrics_file,
+                               metrics_port=args.metrics_port)
+    profile = profiling.setup(window.metrics, args,
+                              extra=((WaveformGenerator, 'next_block', 'generator_next_block'),))
+    if profile is not None:
+        app.aboutToQuit.connect(profile.finish)
     window.show()
     sys.exit(app.exec_())
 
@@ -0,0 +1,444 @@
+import time
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from burst import BurstReader
+from metrics import instrument_scheduler, time_call, uninstrument_scheduler
+from ring_buffer import RingBuffer
+from scheduler import DeadlineScheduler
+from waveforms import DDSOscillator, dac_pair
+
+# UI 显示电压 = ADC 读数 - 1.5V
+ADC_SHIFT = 1.5
+ADC_CHANNELS = 8
+# 突发模式下每秒的块数；每块按 adc_rate 连续读取 adc_rate / BURST_BLOCK_RATE 个样本
+BURST_BLOCK_RATE = 100
+# 启动时测量单次 ADC 读取耗时所用的读取次数
+SKEW_READS = 16
+
+WaveConfig = namedtuple('WaveConfig', ['wave_type', 'freq', 'amplitude', 'offset'])
+
+AcquisitionConfig = namedtuple(
+    'AcquisitionConfig',
+    ['channel1', 'channel2', 'differential', 'adc_rate',
+     'dac_rate', 'wave1', 'wave2', 'dac_diff_mode', 'burst'],
+    defaults=(500, None, None, False, False)
+)
+
+# 扫描表中的一项：ADC 输入 1~8，每 divisor 个节拍读一次
+ScanChannel = namedtuple('ScanChannel', ['channel', 'divisor'], defaults=(1,))
+ScanConfig = namedtuple('ScanConfig', ['scan', 'adc_rate'])
+
+
+class AcquisitionEngine:
+    """ADC 采样引擎（不依赖 Qt）
+
+    配置是不可变的 AcquisitionConfig 快照，采样线程每个周期只读取一次
+    self.config；界面修改控件时调用 reconfigure() 整体替换快照。
+    """
+
+    COLUMNS = ('t', 'adc1', 'adc2', 'diff')
+
+    def __init__(self, adc, config, maxlen=300):
+        self.adc = adc
+        self.config = config
+        self.maxlen = maxlen
+        self.running = False
+
+        self.first_timestamp = None
+        self.sample_count = 0
+        self.actual_rate = 0.0
+        # 同一行里通道 2 比通道 1 晚读的时间（一次 SPI 读取），start() 时实测
+        self.channel_skew = 0.0
+
+        # 每行 (t, v1, v2, diff)
+        self.buffer = RingBuffer(maxlen, 3)
+        self.data_lock = threading.Lock()
+        self.acquisition_thread = None
+        self.scheduler = DeadlineScheduler(self.loop_rate(config))
+        self.recorder = None
+        self.burst_reader = None
+        # 突发模式的采样网格：起点（绝对时间）、速率和起点以来已读的样本数
+        self.burst_origin = None
+        self.burst_rate = None
+        self.burst_index = 0
+        # instrument() 之后才计时；为 None 时采样路径不调用 perf_counter
+        self.spi_read_hist = None
+        self.lock_wait_hist = None
+
+    def instrument(self, registry, prefix='adc'):
+        """把调度、SPI 读取和缓冲锁等待的耗时登记到 metrics.MetricsRegistry"""
+        instrument_scheduler(registry, self.scheduler, prefix)
+        self.spi_read_hist = registry.histogram(f'{prefix}_spi_read_seconds',
+                                                'time spent in ADC reads per tick')
+        self.lock_wait_hist = registry.histogram(f'{prefix}_lock_wait_seconds',
+                                                 'time waiting for the buffer lock')
+        registry.gauge(f'{prefix}_actual_rate_hz', lambda: self.actual_rate,
+                       'measured sample rate')
+        registry.gauge(f'{prefix}_samples_total', lambda: self.sample_count)
+        return self
+
+    def uninstrument(self):
+        """停止计时；已登记的直方图和 gauge 保留在 registry 里"""
+        uninstrument_scheduler(self.scheduler)
+        self.spi_read_hist = None
+        self.lock_wait_hist = None
+
+    def lock_buffer(self):
+        """获取 data_lock，需要时记录等待时间；调用方负责释放"""
+        hist = self.lock_wait_hist
+        if hist is None:
+            self.data_lock.acquire()
+            return
+        t0 = time.perf_counter()
+        self.data_lock.acquire()
+        hist.observe(time.perf_counter() - t0)
+
+    def reconfigure(self, config=None, **changes):
+        """原子地替换配置快照（引用赋值在 GIL 下是原子的）"""
+        if config is None:
+            config = self.config._replace(**changes)
+        self.config = config
+
+    def loop_rate(self, cfg):
+        if cfg.burst:
+            return min(cfg.adc_rate, BURST_BLOCK_RATE)
+        return cfg.adc_rate
+
+    def clear(self):
+        with self.data_lock:
+            self.buffer.clear()
+
+    def start(self):
+        if self.running:
+            return
+        self.first_timestamp = None
+        self.sample_count = 0
+        self.actual_rate = 0.0
+        self.burst_origin = None
+        self.clear()
+        self.scheduler.reset()
+        if self.adc is not None:
+            self.channel_skew = self.measure_channel_skew()
+
+        self.running = True
+        self.acquisition_thread = threading.Thread(
+            target=self.acquisition_loop, daemon=True
+        )
+        self.acquisition_thread.start()
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        if self.acquisition_thread is not None:
+            self.acquisition_thread.join(timeout)
+            self.acquisition_thread = None
+        if self.burst_reader is not None:
+            self.burst_reader.close()
+            self.burst_reader = None
+
+    def measure_channel_skew(self, reads=SKEW_READS):
+        """单次 ADC 读取的平均耗时（秒）
+
+        两路是先后读取的，通道 2 的实际采样时刻比该行时间戳晚这么多；
+        需要两路相位的地方（扫频）据此补偿。只能在采样线程启动前调用。
+        """
+        read = self.adc.read_adc_voltage
+        channel = self.config.channel1
+        t0 = time.perf_counter()
+        for _ in range(reads):
+            read(channel, 0)
+        return (time.perf_counter() - t0) / reads
+
+    def read_sample(self, cfg):
+        real_v1 = self.adc.read_adc_voltage(cfg.channel1, 0) - ADC_SHIFT
+        real_v2 = self.adc.read_adc_voltage(cfg.channel2, 0) - ADC_SHIFT
+        diff_v = real_v1 - real_v2 if cfg.differential else 0.0
+        return real_v1, real_v2, diff_v
+
+    def store(self, t, *values):
+        self.lock_buffer()
+        try:
+            self.buffer.append(t, *values)
+        finally:
+            self.data_lock.release()
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.append_row(t, *values)
+
+    def store_block(self, block):
+        self.lock_buffer()
+        try:
+            self.buffer.extend(block)
+        finally:
+            self.data_lock.release()
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.append_block(block)
+
+    def read_burst(self, cfg, deadline):
+        """突发模式：一次读取一整块，样本落在 起点 + k / adc_rate 的网格上
+
+        每块读取网格上截止到下一个节拍之前的全部样本，块与块首尾相接；
+        adc_rate 不是节拍速率的整数倍时各块样本数不同。跳过的节拍在下一块
+        里补读，时间戳仍按网格计算。
+        """
+        reader = self.burst_reader
+        if reader is None or reader.channels != (cfg.channel1, cfg.channel2):
+            if reader is not None:
+                reader.close()
+            reader = self.burst_reader = BurstReader(self.adc, (cfg.channel1, cfg.channel2))
+        if self.first_timestamp is None:
+            self.first_timestamp = deadline
+        rate = float(cfg.adc_rate)
+        period = self.scheduler.period
+        if self.burst_origin is None or self.burst_rate != (rate, period):
+            # 启动或改变速率时以当前截止时间为新网格的起点
+            self.burst_origin = deadline
+            self.burst_rate = (rate, period)
+            self.burst_index = 0
+        first = self.burst_index
+        due = int(round((deadline + period - self.burst_origin) * rate))
+        n = due - first
+        if n <= 0:
+            return
+        self.burst_index = due
+        start = self.burst_origin + first / rate
+
+        read_hist = self.spi_read_hist
+        if read_hist is None:
+            codes = reader.read(n, 1.0 / rate, start)
+        else:
+            codes = time_call(read_hist, reader.read, n, 1.0 / rate, start)
+        block = np.empty((n, 4))
+        block[:, 0] = np.arange(first, due) / rate + (self.burst_origin - self.first_timestamp)
+        reader.to_volts(codes, ADC_SHIFT, out=block[:, 1:3])
+        if cfg.differential:
+            np.subtract(block[:, 1], block[:, 2], out=block[:, 3])
+        else:
+            block[:, 3] = 0.0
+        self.store_block(block)
+
+        self.sample_count += n
+        elapsed = time.perf_counter() - self.first_timestamp
+        if elapsed > 0:
+            self.actual_rate = self.sample_count / elapsed
+
+    def start_recording(self, writer):
+        """writer 为 recorder.CaptureWriter；之后每个样本都会写入它"""
+        self.stop_recording()
+        self.recorder = writer.start()
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+        return recorder
+
+    def acquisition_loop(self):
+        scheduler = self.scheduler
+        while self.running:
+            cfg = self.config
+            rate = self.loop_rate(cfg)
+            if rate != scheduler.rate:
+                scheduler.set_rate(rate)
+            deadline = scheduler.wait()
+            if cfg.burst:
+                self.read_burst(cfg, deadline)
+                continue
+
+            real_t = time.perf_counter()
+            if self.first_timestamp is None:
+                self.first_timestamp = real_t
+            normalized_t = real_t - self.first_timestamp
+
+            self.sample_count += 1
+            if normalized_t > 0:
+                self.actual_rate = self.sample_count / normalized_t
+
+            read_hist = self.spi_read_hist
+            if read_hist is None:
+                real_v1, real_v2, diff_v = self.read_sample(cfg)
+            else:
+                real_v1, real_v2, diff_v = time_call(read_hist, self.read_sample, cfg)
+            self.store(normalized_t, real_v1, real_v2, diff_v)
+
+    def snapshot(self, n=None, out=None):
+        """返回最近 n 个样本的各列数组 (t, v1, v2, diff)；无数据时返回 None
+
+        out 为调用方预分配的 (至少 n, 列数) 数组，返回的各列是它的视图。
+        """
+        with self.data_lock:
+            if not len(self.buffer):
+                return None
+            block = self.buffer.snapshot(n, out)
+        return tuple(block.T)
+
+    def read_since(self, cursor):
+        """返回 (新样本块, 新游标, 丢失样本数)，见 RingBuffer.read_since"""
+        with self.data_lock:
+            return self.buffer.read_since(cursor)
+
+
+class LoopbackEngine(AcquisitionEngine):
+    """DAC 输出 + ADC 采样的联合引擎（对应 ADC_DAC Integrated）
+
+    DAC 输出和 ADC 采样是两个独立调度的线程：DAC 按 dac_rate 输出，
+    ADC 沿用 AcquisitionEngine 的采样循环按 adc_rate 读取并记录真实的
+    perf_counter 时间戳，两者的速率互不约束。
+    """
+
+    def __init__(self, adc, dac, config, maxlen=1000):
+        self.osc1 = DDSOscillator(*config.wave1, sample_rate=config.dac_rate)
+        self.osc2 = DDSOscillator(*config.wave2, sample_rate=config.dac_rate)
+        super().__init__(adc, config, maxlen=maxlen)
+        self.dac = dac
+        # 两个调度线程共用 GIL，忙等时互相让出
+        self.scheduler.spin_yield = True
+        self.dac_scheduler = DeadlineScheduler(config.dac_rate, spin_yield=True)
+        self.dac_thread = None
+        self.dac_sample_count = 0
+        self.dac_actual_rate = 0.0
+        self.spi_write_hist = None
+        # 可选的通道 1 激励 f(n) -> n 个电压值，设置后替代 osc1（扫频、任意波形用）
+        self.stimulus = None
+
+    def instrument(self, registry, prefix='adc', dac_prefix='dac'):
+        super().instrument(registry, prefix)
+        instrument_scheduler(registry, self.dac_scheduler, dac_prefix)
+        self.spi_write_hist = registry.histogram(f'{dac_prefix}_spi_write_seconds',
+                                                 'time spent writing both DAC channels')
+        registry.gauge(f'{dac_prefix}_actual_rate_hz', lambda: self.dac_actual_rate,
+                       'measured DAC update rate')
+        return self
+
+    def uninstrument(self):
+        super().uninstrument()
+        uninstrument_scheduler(self.dac_scheduler)
+        self.spi_write_hist = None
+
+    def reconfigure(self, config=None, **changes):
+        super().reconfigure(config, **changes)
+        cfg = self.config
+        # 只改参数不改相位，频率切换时波形连续
+        self.osc1.configure(*cfg.wave1, sample_rate=cfg.dac_rate)
+        self.osc2.configure(*cfg.wave2, sample_rate=cfg.dac_rate)
+
+    def start(self):
+        if self.running:
+            return
+        self.dac_sample_count = 0
+        self.dac_actual_rate = 0.0
+        self.dac_scheduler.reset()
+        super().start()
+        self.dac_thread = threading.Thread(target=self.dac_loop, daemon=True)
+        self.dac_thread.start()
+
+    def stop(self, timeout=1.0):
+        super().stop(timeout)
+        if self.dac_thread is not None:
+            self.dac_thread.join(timeout)
+            self.dac_thread = None
+
+    def next_dac_block(self, cfg):
+        """生成约 10 ms 的两路 DAC 数据，逐样本循环里只剩查列表和写 DAC"""
+        n = max(1, int(cfg.dac_rate) // 100)
+        stimulus = self.stimulus
+        values1 = stimulus(n) if stimulus is not None else self.osc1.next_block(n)
+        values2 = None if cfg.dac_diff_mode else self.osc2.next_block(n)
+        block1, block2 = dac_pair(values1, values2, self.osc1.offset, cfg.dac_diff_mode)
+        return block1.tolist(), block2.tolist()
+
+    def dac_loop(self):
+        self.osc1.reset()
+        self.osc2.reset()
+        block1 = block2 = []
+        pos = 0
+        set_dac_voltage = self.dac.set_dac_voltage
+        scheduler = self.dac_scheduler
+        skipped = 0
+        start_t = None
+        while self.running:
+            cfg = self.config
+            if cfg.dac_rate != scheduler.rate:
+                scheduler.set_rate(cfg.dac_rate)
+            scheduler.wait()
+            if start_t is None:
+                start_t = time.perf_counter()
+
+            # 跳过的节拍也推进波形，输出频率不受错过截止时间影响
+            pos += scheduler.skipped - skipped
+            skipped = scheduler.skipped
+            while pos >= len(block1):
+                pos -= len(block1)
+                block1, block2 = self.next_dac_block(cfg)
+            write_hist = self.spi_write_hist
+            if write_hist is None:
+                set_dac_voltage(1, block1[pos])
+                set_dac_voltage(2, block2[pos])
+            else:
+                t0 = time.perf_counter()
+                set_dac_voltage(1, block1[pos])
+                set_dac_voltage(2, block2[pos])
+                write_hist.observe(time.perf_counter() - t0)
+            pos += 1
+
+            self.dac_sample_count += 1
+            elapsed = time.perf_counter() - start_t
+            if elapsed > 0:
+                self.dac_actual_rate = self.dac_sample_count / elapsed
+
+
+class ScanEngine(AcquisitionEngine):
+    """多通道扫描引擎
+
+    每个节拍按扫描表把到期的通道依次读一遍，写入 (t, ch1, ..., ch8)
+    一行；未启用或本节拍未到期的通道保持上一次的读数（未启用的为 0），
+    所以缓冲始终是等间隔的整行，测频和绘图可以直接按列使用。
+    """
+
+    COLUMNS = ('t',) + tuple(f'ch{i}' for i in range(1, ADC_CHANNELS + 1))
+
+    def __init__(self, adc, config, maxlen=300):
+        super().__init__(adc, config, maxlen=maxlen)
+        self.buffer = RingBuffer(maxlen, ADC_CHANNELS)
+
+    def loop_rate(self, cfg):
+        return cfg.adc_rate
+
+    def acquisition_loop(self):
+        scheduler = self.scheduler
+        read = self.adc.read_adc_voltage
+        values = [0.0] * ADC_CHANNELS
+        tick = 0
+        scan = None
+        while self.running:
+            cfg = self.config
+            if cfg.adc_rate != scheduler.rate:
+                scheduler.set_rate(cfg.adc_rate)
+            if cfg.scan is not scan:
+                scan = cfg.scan
+                values = [0.0] * ADC_CHANNELS
+                entries = [(item.channel - 1, item.channel, max(1, int(item.divisor)))
+                           for item in scan]
+            scheduler.wait()
+
+            real_t = time.perf_counter()
+            if self.first_timestamp is None:
+                self.first_timestamp = real_t
+            normalized_t = real_t - self.first_timestamp
+
+            self.sample_count += 1
+            if normalized_t > 0:
+                self.actual_rate = self.sample_count / normalized_t
+
+            read_hist = self.spi_read_hist
+            spi_t0 = time.perf_counter() if read_hist is not None else None
+            for index, channel, divisor in entries:
+                if tick % divisor == 0:
+                    values[index] = read(channel, 0) - ADC_SHIFT
+            if spi_t0 is not None:
+                read_hist.observe(time.perf_counter() - spi_t0)
+            tick += 1
+            self.store(normalized_t, *values)
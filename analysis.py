@@ -0,0 +1,140 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def hanning_window(n):
+    """按长度缓存的汉宁窗（只读）"""
+    window = np.hanning(n)
+    window.setflags(write=False)
+    return window
+
+
+def interpolate_peak(mag, k):
+    """对数幅度抛物线插值，返回峰值的小数 bin 位置"""
+    if k <= 0 or k >= len(mag) - 1:
+        return float(k)
+    a, b, c = np.log(mag[k - 1:k + 2] + 1e-30)
+    denom = a - 2 * b + c
+    if denom == 0:
+        return float(k)
+    return k + 0.5 * (a - c) / denom
+
+
+def measure_frequency_fft(data_t, data_y, interpolate=False):
+    """加汉宁窗 FFT 取幅度峰值对应的频率"""
+    n = len(data_y)
+    if n < 4:
+        return 0.0
+    duration = data_t[-1] - data_t[0]
+    if duration <= 0:
+        return 0.0
+    fs_est = (n - 1) / duration
+    y_centered = data_y - np.mean(data_y)
+    mag = np.abs(np.fft.rfft(y_centered * hanning_window(n)))
+    k = int(np.argmax(mag))
+    if interpolate:
+        return interpolate_peak(mag, k) * fs_est / n
+    return k * fs_est / n
+
+
+class FrequencyEstimator:
+    """流式测频：重叠分段 FFT + 指数平均功率谱
+
+    新样本到达时只对新凑满的段做一次 FFT 并并入平均谱，不再每次
+    对整个缓冲区重算；峰值用抛物线插值细化到 bin 以下。
+    """
+
+    def __init__(self, segment_len=1024, overlap=0.5, averaging=0.5, interpolate=True,
+                 fs_tolerance=0.05):
+        self.segment_len = int(segment_len)
+        self.fs_tolerance = fs_tolerance
+        self.hop = max(1, int(self.segment_len * (1.0 - overlap)))
+        self.averaging = averaging
+        self.interpolate = interpolate
+        self.pending = np.zeros(self.segment_len)
+        self.reset()
+
+    def reset(self):
+        self.fill = 0
+        self.power = None
+        self.fs = None
+        self.segments = 0
+
+    def restart_segment(self):
+        """数据出现间断（缓冲溢出）时丢弃未凑满的段"""
+        self.fill = 0
+
+    def feed(self, samples, fs):
+        if fs <= 0:
+            return
+        if self.fs is not None and abs(fs - self.fs) > self.fs_tolerance * self.fs:
+            # 采样率变了，旧谱的频率轴失效
+            self.reset()
+        self.fs = fs
+
+        samples = np.asarray(samples, dtype=float)
+        pos = 0
+        while pos < len(samples):
+            take = min(self.segment_len - self.fill, len(samples) - pos)
+            self.pending[self.fill:self.fill + take] = samples[pos:pos + take]
+            self.fill += take
+            pos += take
+            if self.fill == self.segment_len:
+                self._process_segment()
+                keep = self.segment_len - self.hop
+                self.pending[:keep] = self.pending[self.hop:]
+                self.fill = keep
+
+    def _process_segment(self):
+        seg = self.pending - self.pending.mean()
+        power = np.abs(np.fft.rfft(seg * hanning_window(self.segment_len))) ** 2
+        if self.power is None:
+            self.power = power
+        else:
+            self.power *= self.averaging
+            self.power += (1.0 - self.averaging) * power
+        self.segments += 1
+
+    def frequency(self):
+        if self.power is None:
+            return 0.0
+        k = int(np.argmax(self.power[1:])) + 1
+        if self.interpolate:
+            # 功率谱取对数后与幅度谱插值结果相同
+            k = interpolate_peak(self.power, k)
+        return k * self.fs / self.segment_len
+
+
+class FrequencyTracker:
+    """对 (t, ch1, ..., chN) 样本块的各通道做流式测频"""
+
+    def __init__(self, n_channels, segment_len=1024, **kwargs):
+        self.estimators = [FrequencyEstimator(segment_len, **kwargs)
+                           for _ in range(n_channels)]
+        self.fs = 0.0
+
+    def reset(self):
+        for est in self.estimators:
+            est.reset()
+        self.fs = 0.0
+
+    def feed(self, rows, lost=0, channels=None):
+        """rows 为新到的样本块；lost 为上次读取后被覆盖的样本数
+
+        channels 给出本次需要更新的通道下标，其余通道视为数据中断。
+        """
+        n = len(rows)
+        if n >= 2 and rows[-1, 0] > rows[0, 0]:
+            self.fs = (n - 1) / (rows[-1, 0] - rows[0, 0])
+        if channels is None:
+            channels = range(len(self.estimators))
+        for i, est in enumerate(self.estimators):
+            if lost or i not in channels:
+                est.restart_segment()
+            if i in channels and n and self.fs > 0:
+                est.feed(rows[:, i + 1], self.fs)
+
+    def frequency(self, i):
+        return self.estimators[i].frequency()
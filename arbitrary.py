@@ -0,0 +1,174 @@
+"""任意波形回放
+
+支持的文件：
+  .npy              一维数组，单位 V
+  .f32 / .f64       原始 float32 / float64 小端序列，单位 V
+  .u16              原始 uint16 小端序列，按 12 位 DAC 码值解释 (0~4095)
+其它扩展名需要显式给出 fmt。
+
+文件通过 np.memmap 访问，不会整体读入内存。载入时按块换算并限幅到
+DAC_MIN ~ DAC_MAX，结果写入缓存文件 (float32 memmap)，回放时直接切片
+输出，逐样本不再限幅。缓存默认放在源文件旁边 (<文件>.clamped.f32)，
+源目录不可写时放到临时目录，也可以用 cache_dir 指定目录；后两种情况
+文件名带上源文件绝对路径和格式的哈希，不同目录下的同名文件互不覆盖。
+每个缓存旁边有一个 .json 记录源文件路径、大小、修改时间和格式，
+全部一致时才复用缓存。
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from waveforms import DAC_MAX, DAC_MIN
+
+FORMATS = {
+    '.f32': np.dtype('<f4'),
+    '.f64': np.dtype('<f8'),
+    '.u16': np.dtype('<u2'),
+}
+DAC_CODES = 4096
+CLAMP_CHUNK = 1 << 20
+SIDECAR_SUFFIX = '.clamped.f32'
+
+# 缓存是 float32，上限取不超过 DAC_MAX 的最大 float32，避免舍入后越界
+F32_MAX = np.float32(DAC_MAX)
+if float(F32_MAX) > DAC_MAX:
+    F32_MAX = np.nextafter(F32_MAX, np.float32(0))
+
+
+def open_source(path, fmt=None):
+    """返回源文件的只读 memmap（一维）"""
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.npy':
+            data = np.load(path, mmap_mode='r')
+        elif ext in FORMATS:
+            data = np.memmap(path, dtype=FORMATS[ext], mode='r')
+        else:
+            raise ValueError(f'unknown waveform format: {path} (pass fmt)')
+    else:
+        data = np.memmap(path, dtype=np.dtype(fmt), mode='r')
+    if data.ndim != 1:
+        raise ValueError(f'waveform must be one-dimensional, got shape {data.shape}')
+    if len(data) == 0:
+        raise ValueError(f'empty waveform: {path}')
+    return data
+
+
+def sidecar_path(path, fmt=None, cache_dir=None):
+    if cache_dir is None:
+        candidate = path + SIDECAR_SUFFIX
+        if os.access(os.path.dirname(os.path.abspath(candidate)), os.W_OK):
+            return candidate
+        # 源文件所在目录不可写时放到临时目录
+        cache_dir = tempfile.gettempdir()
+    key = hashlib.sha1(f'{os.path.abspath(path)}\0{fmt}'.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{os.path.basename(path)}-{key}{SIDECAR_SUFFIX}')
+
+
+def source_info(path, fmt):
+    st = os.stat(path)
+    return {'source': os.path.abspath(path), 'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns, 'fmt': None if fmt is None else str(np.dtype(fmt))}
+
+
+def cache_valid(cache, info, n):
+    try:
+        with open(cache + '.json') as f:
+            recorded = json.load(f)
+        return recorded == info and os.path.getsize(cache) == 4 * n
+    except (OSError, ValueError):
+        return False
+
+
+def remove_sidecar(path, fmt=None, cache_dir=None):
+    """删除 path 的限幅缓存及其记录；返回删除的缓存路径（没有时为 None）"""
+    cache = sidecar_path(path, fmt, cache_dir)
+    removed = None
+    for name in (cache, cache + '.json'):
+        try:
+            os.remove(name)
+            removed = cache
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def load_waveform(path, fmt=None, cache_dir=None, progress=None):
+    """返回限幅后的 float32 memmap；uint16 码值换算为电压
+
+    progress(已处理样本数, 总样本数) 在每块限幅后调用，复用缓存时不调用。
+    """
+    source = open_source(path, fmt)
+    cache = sidecar_path(path, fmt, cache_dir)
+    info = source_info(path, fmt)
+    if cache_valid(cache, info, len(source)):
+        return np.memmap(cache, dtype='<f4', mode='r')
+
+    # 先删掉旧记录：写到一半被打断的缓存不会被当成有效
+    try:
+        os.remove(cache + '.json')
+    except FileNotFoundError:
+        pass
+    is_codes = source.dtype.kind in 'ui'
+    clamped = np.memmap(cache, dtype='<f4', mode='w+', shape=(len(source),))
+    for start in range(0, len(source), CLAMP_CHUNK):
+        chunk = np.array(source[start:start + CLAMP_CHUNK], dtype=np.float64)
+        if is_codes:
+            chunk *= DAC_MAX / DAC_CODES
+        np.clip(chunk, DAC_MIN, float(F32_MAX), out=chunk)
+        clamped[start:start + len(chunk)] = chunk
+        if progress is not None:
+            progress(start + len(chunk), len(source))
+    clamped.flush()
+    del clamped
+    with open(cache + '.json', 'w') as f:
+        json.dump(info, f)
+    return np.memmap(cache, dtype='<f4', mode='r')
+
+
+class WaveformPlayer:
+    """按 DAC 采样率逐块输出已限幅的样本；接口与 DDSOscillator.next_block 相同
+
+    loop=False 时播放一遍后保持最后一个样本，finished 置为 True。
+    """
+
+    def __init__(self, samples, loop=True, path=None):
+        self.samples = samples
+        self.loop = loop
+        self.path = path
+        self.position = 0
+        self.finished = False
+        # 差分模式的镜像中心：取（前一段）样本的平均值
+        self.offset = float(np.mean(samples[:min(len(samples), CLAMP_CHUNK)]))
+
+    @classmethod
+    def from_file(cls, path, fmt=None, loop=True, cache_dir=None, progress=None):
+        return cls(load_waveform(path, fmt, cache_dir, progress), loop=loop, path=path)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def reset(self):
+        self.position = 0
+        self.finished = False
+
+    def next_block(self, n):
+        samples = self.samples
+        size = len(samples)
+        out = np.empty(n)
+        filled = 0
+        while filled < n:
+            if self.position >= size:
+                if not self.loop:
+                    self.finished = True
+                    out[filled:] = samples[size - 1]
+                    return out
+                self.position = 0
+            take = min(n - filled, size - self.position)
+            out[filled:filled + take] = samples[self.position:self.position + take]
+            self.position += take
+            filled += take
+        return out
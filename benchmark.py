@@ -0,0 +1,254 @@
+"""热路径基准测试（仿真板卡，无需 Qt）
+
+测量采集循环、DAC 波形生成和绘图更新的数据部分，结果以 JSON 输出：
+
+    python benchmark.py --duration 2 --output bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+
+from acquisition import AcquisitionConfig, AcquisitionEngine, LoopbackEngine, WaveConfig
+from analysis import FrequencyTracker, measure_frequency_fft
+from metrics import MetricsRegistry
+from ring_buffer import RingBuffer
+from simulator import ADC, DAC, SimBoard
+from waveforms import DDSOscillator, dac_pair
+
+PLOT_SIZES = (300, 1000, 100000, 1000000)
+
+
+class TimedLock:
+    """记录每次持有时长的锁，用来替换引擎的 data_lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hold_times = []
+        self._acquired_at = 0.0
+
+    def acquire(self):
+        self._lock.acquire()
+        self._acquired_at = time.perf_counter()
+
+    def release(self):
+        self.hold_times.append(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def summarize(values, scale=1e6):
+    """均值/百分位（默认换算为微秒）"""
+    if len(values) == 0:
+        return None
+    values = np.asarray(values, dtype=float) * scale
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'mean': float(values.mean()),
+        'p50': float(p50),
+        'p90': float(p90),
+        'p99': float(p99),
+        'max': float(values.max()),
+        'std': float(values.std()),
+    }
+
+
+def time_call(func, repeat):
+    durations = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - t0)
+    return summarize(durations)
+
+
+def make_board(latency):
+    return SimBoard(loopback={7: 1, 8: 2}, latency=latency)
+
+
+def recent(hist):
+    return hist.recent[:min(hist.count, hist.window)]
+
+
+def bench_acquisition(rate, duration, latency, burst=False):
+    adc = ADC(board=make_board(latency))
+    maxlen = int(rate * duration * 1.5) + 16
+    engine = AcquisitionEngine(adc, AcquisitionConfig(7, 8, True, rate, burst=burst),
+                               maxlen=maxlen)
+    if burst:
+        # 突发模式的时间戳是按网格算出来的，间隔统计没有意义；改为记录
+        # 节拍唤醒的实测间隔/迟到量和每块 SPI 读取耗时
+        registry = MetricsRegistry()
+        engine.instrument(registry)
+    lock = engine.data_lock = TimedLock()
+
+    t0 = time.perf_counter()
+    engine.start()
+    time.sleep(duration)
+    engine.stop()
+    elapsed = time.perf_counter() - t0
+
+    t = engine.snapshot()[0]
+    result = {
+        'target_rate': rate,
+        'burst': burst,
+        'achieved_rate': engine.actual_rate,
+        'wall_clock_rate': engine.sample_count / elapsed,
+        'samples': int(len(t)),
+    }
+    if burst:
+        scheduler = engine.scheduler
+        intervals = recent(scheduler.interval_hist)
+        result.update({
+            'tick_interval_us': summarize(intervals),
+            'jitter_us': float(np.std(intervals) * 1e6) if len(intervals) else None,
+            'wake_lateness_us': summarize(recent(scheduler.lateness_hist)),
+            'block_read_us': summarize(recent(engine.spi_read_hist)),
+        })
+    else:
+        intervals = np.diff(t)
+        result.update({
+            'interval_us': summarize(intervals),
+            'jitter_us': float(np.std(intervals) * 1e6) if len(intervals) else None,
+        })
+    result.update({
+        'lock_hold_us': summarize(lock.hold_times),
+        'scheduler': engine.scheduler.stats(),
+    })
+    return result
+
+
+def bench_loopback(rate, duration, latency):
+    board = make_board(latency)
+    config = AcquisitionConfig(7, 8, True, rate, rate,
+                               WaveConfig('Sine Wave', 10.0, 1.0, 2.0),
+                               WaveConfig('Square Wave', 20.0, 1.0, 2.0), False)
+    engine = LoopbackEngine(ADC(board=board), DAC(gainFactor=2, board=board), config,
+                            maxlen=int(rate * duration * 1.5) + 16)
+    lock = engine.data_lock = TimedLock()
+
+    t0 = time.perf_counter()
+    engine.start()
+    time.sleep(duration)
+    engine.stop()
+    elapsed = time.perf_counter() - t0
+    return {
+        'target_rate': rate,
+        'achieved_rate': engine.sample_count / elapsed,
+        'samples': engine.sample_count,
+        'dac_achieved_rate': engine.dac_actual_rate,
+        'lock_hold_us': summarize(lock.hold_times),
+        'scheduler': engine.scheduler.stats(),
+        'dac_scheduler': engine.dac_scheduler.stats(),
+    }
+
+
+def bench_generation(repeat):
+    osc = DDSOscillator('Sine', 100.0, 1.0, 2.0, 10000)
+    n = 100000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        osc.next_value()
+    per_value = (time.perf_counter() - t0) / n
+
+    # 与 LoopbackEngine / 信号发生器相同的整块路径：两路 next_block + dac_pair
+    osc2 = DDSOscillator('Square', 50.0, 1.0, 2.0, 10000)
+    blocks = {}
+    for size in (100, 1000, 10000):
+        blocks[str(size)] = time_call(
+            lambda: dac_pair(osc.next_block(size), osc2.next_block(size), osc.offset),
+            repeat)
+    return {
+        'dds_next_value_us': per_value * 1e6,
+        'dds_max_rate': 1.0 / per_value,
+        'dac_block_us': blocks,
+    }
+
+
+def bench_plot_update(sizes, repeat):
+    """update_plot 的非 Qt 部分：加锁取快照 + 三路 FFT 测频"""
+    results = []
+    for size in sizes:
+        buf = RingBuffer(size, 3)
+        t = np.arange(size) / 10000.0
+        y = np.sin(2 * np.pi * 50 * t)
+        buf.extend(np.column_stack((t, y, -y, 2 * y)))
+        lock = TimedLock()
+
+        def snapshot():
+            with lock:
+                return buf.snapshot()
+
+        def update_plot_data():
+            data = snapshot()
+            for i in (1, 2, 3):
+                measure_frequency_fft(data[:, 0], data[:, i])
+
+        block = snapshot()
+        # 流式测频每次只处理一个刷新周期的新样本（这里取 1/10 缓冲）
+        tracker = FrequencyTracker(3, segment_len=min(size, 4096))
+        new_rows = block[-max(2, size // 10):]
+
+        results.append({
+            'samples': size,
+            'snapshot_us': time_call(snapshot, repeat),
+            'measure_frequency_fft_us': time_call(
+                lambda: measure_frequency_fft(block[:, 0], block[:, 1]), repeat),
+            'update_plot_data_us': time_call(update_plot_data, repeat),
+            'frequency_tracker_feed_us': time_call(lambda: tracker.feed(new_rows), repeat),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=1.0,
+                        help='每个采集测试运行的秒数')
+    parser.add_argument('--rates', type=int, nargs='+', default=[500, 5000, 20000],
+                        help='目标采样率列表 (Hz)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(PLOT_SIZES),
+                        help='绘图缓冲长度列表')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency-us', type=float, default=0.0,
+                        help='仿真的单次 SPI 调用耗时 (微秒)')
+    parser.add_argument('--output', help='写入 JSON 文件（默认输出到 stdout）')
+    args = parser.parse_args(argv)
+
+    latency = args.latency_us * 1e-6
+    results = {
+        'meta': {
+            'timestamp': time.time(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'spi_latency_us': args.latency_us,
+        },
+        'acquisition': [bench_acquisition(r, args.duration, latency) for r in args.rates],
+        'acquisition_burst': [bench_acquisition(r, args.duration, latency, burst=True)
+                              for r in args.rates],
+        'loopback': [bench_loopback(r, args.duration, latency) for r in args.rates],
+        'generation': bench_generation(args.repeat),
+        'plot_update': bench_plot_update(args.sizes, args.repeat),
+    }
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
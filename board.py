@@ -0,0 +1,19 @@
+import os
+
+SIM_ENV = 'EXPANDERPI_SIM'
+
+
+def use_simulator(simulate=None):
+    """simulate 为 None 时由环境变量 EXPANDERPI_SIM=1 决定"""
+    if simulate is not None:
+        return bool(simulate)
+    return os.environ.get(SIM_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def load_expanderpi(simulate=None):
+    """返回 (ADC, DAC) 类：真实板卡或 simulator 中的仿真实现"""
+    if use_simulator(simulate):
+        from simulator import ADC, DAC
+    else:
+        from ExpanderPi import ADC, DAC
+    return ADC, DAC
@@ -0,0 +1,125 @@
+"""ADC 突发读取
+
+一次调用读取 n 轮 (每轮若干通道) 的原始码值到预分配的整数数组，
+读完后再向量化地换算成电压，逐样本循环里不再有换算、减偏移、加锁和
+写缓冲。真实板卡上直接使用一直打开的 spidev 设备和预先算好的 MCP3208
+命令字；MCP3208 每次转换都需要片选翻转，所以每次转换仍是一次 xfer2，
+但省掉了 ExpanderPi 库逐次的参数检查和浮点换算。
+
+走哪条路径由 spi 参数决定：None 时 simulator.ADC 以外的 ADC 都按真实
+板卡处理；也可以显式传 True / False。不走 spidev（或 spidev 不可用）时
+退回到逐次 read_adc_raw。实际使用的路径记在 path 属性里并写入日志。
+"""
+import logging
+import time
+
+import numpy as np
+
+import simulator
+
+log = logging.getLogger(__name__)
+
+ADC_BITS = 12
+DEFAULT_REFVOLTAGE = 4.096
+
+
+def mcp3208_command(channel, mode=0):
+    """channel 为 1~8；mode 0 单端、1 差分"""
+    ch = channel - 1
+    start = 6 if mode == 0 else 4
+    return [start + (ch >> 2), (ch & 3) << 6, 0]
+
+
+class BurstReader:
+    def __init__(self, adc, channels, mode=0, max_scans=4096, spi_bus=0, spi_device=0,
+                 max_speed_hz=1000000, spi=None):
+        self.adc = adc
+        self.channels = tuple(channels)
+        self.mode = mode
+        self.refvoltage = getattr(adc, 'refvoltage', DEFAULT_REFVOLTAGE)
+        self.codes = np.zeros((max_scans, len(self.channels)), dtype=np.int32)
+        if spi is None:
+            spi = not isinstance(adc, simulator.ADC)
+        self.spi = self.open_spi(spi_bus, spi_device, max_speed_hz) if spi else None
+        if self.spi is not None:
+            self.commands = [mcp3208_command(ch, mode) for ch in self.channels]
+            self.raw = np.zeros((max_scans, len(self.channels), 3), dtype=np.uint8)
+            self.path = f'spidev{spi_bus}.{spi_device}'
+        else:
+            if spi:
+                log.warning('spidev not available, falling back to read_adc_raw')
+            self.path = 'read_adc_raw'
+        log.info('burst reads via %s for %s channels %s',
+                 self.path, type(adc).__name__, self.channels)
+
+    @staticmethod
+    def open_spi(bus, device, max_speed_hz):
+        try:
+            import spidev
+        except ImportError:
+            return None
+        spi = spidev.SpiDev()
+        spi.open(bus, device)
+        spi.max_speed_hz = max_speed_hz
+        return spi
+
+    def close(self):
+        if self.spi is not None:
+            self.spi.close()
+            self.spi = None
+
+    def ensure_capacity(self, n):
+        if n > len(self.codes):
+            self.codes = np.zeros((n, len(self.channels)), dtype=np.int32)
+            if self.spi is not None:
+                self.raw = np.zeros((n, len(self.channels), 3), dtype=np.uint8)
+
+    def read(self, n, interval=0.0, start=None):
+        """读取 n 轮原始码值，返回 (n, 通道数) 的 int32 视图
+
+        interval > 0 时第 k 轮在 start + k * interval 开始（忙等对齐），
+        落后时不等待直接读取。返回的数组在下次调用前有效。
+        """
+        self.ensure_capacity(n)
+        if start is None:
+            start = time.perf_counter()
+        perf_counter = time.perf_counter
+        if self.spi is not None:
+            xfer2 = self.spi.xfer2
+            commands = self.commands
+            raw = self.raw
+            for k in range(n):
+                if interval:
+                    deadline = start + k * interval
+                    while perf_counter() < deadline:
+                        pass
+                for j, cmd in enumerate(commands):
+                    raw[k, j] = xfer2(cmd)
+            block = raw[:n]
+            codes = self.codes[:n]
+            np.bitwise_and(block[:, :, 1], 0x0F, out=codes)
+            codes <<= 8
+            codes |= block[:, :, 2]
+            return codes
+
+        read_raw = self.adc.read_adc_raw
+        mode = self.mode
+        channels = self.channels
+        codes = self.codes
+        for k in range(n):
+            if interval:
+                deadline = start + k * interval
+                while perf_counter() < deadline:
+                    pass
+            row = codes[k]
+            for j, ch in enumerate(channels):
+                row[j] = read_raw(ch, mode)
+        return codes[:n]
+
+    def to_volts(self, codes, shift=0.0, out=None):
+        """码值 -> 电压，再减去 shift（向量化）"""
+        scale = self.refvoltage / (1 << ADC_BITS)
+        out = np.multiply(codes, scale, out=out)
+        if shift:
+            out -= shift
+        return out
@@ -0,0 +1,300 @@
+"""命令行入口：不打开窗口、不导入 Qt / pyqtgraph 地运行采集和输出
+
+    python cli.py capture --sim --duration 5 -o -              # CSV 输出到 stdout
+    python cli.py capture --rate 2000 --samples 10000 -o run.csv
+    python cli.py capture --burst --duration 60 -o captures/job  # replay.py 可读的记录
+    python cli.py generate --wave1 Sine 100 1 2 --duration 30
+    python cli.py generate --file1 chirp.npy --once --rate 20000
+    python cli.py loopback --sim --wave1 Square 20 1 2 -o -
+    python cli.py gui scope --sim                              # 需要时才加载图形界面
+
+-o 取值：'-' 为 stdout 上的 CSV；以 .csv 结尾为 CSV 文件；其它视为
+recorder.CaptureWriter 的文件前缀。结束时把运行统计以一行 JSON 写到
+stderr。--duration 0 表示一直运行到 Ctrl-C（或 --samples 达到）。
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import time
+
+import numpy as np
+
+from acquisition import AcquisitionConfig, AcquisitionEngine, LoopbackEngine, WaveConfig
+from board import load_expanderpi
+from recorder import CaptureWriter
+
+POLL_INTERVAL = 0.1
+
+GUI_SCRIPTS = {
+    'scope': 'ADC_Oscilloscope.py',
+    'scanner': 'ADC_Scanner.py',
+    'integrated': 'ADC_DAC Integrated.py',
+    'generator': 'DAC_Singal Generator.py',
+}
+
+
+def wave_config(values):
+    wave_type, freq, amplitude, offset = values
+    return WaveConfig(wave_type, float(freq), float(amplitude), float(offset))
+
+
+class CsvSink:
+    """按游标把引擎的新样本写成 CSV"""
+
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.rows = 0
+        self.broken = False
+        self.write_text(','.join(columns) + '\n')
+
+    def write_text(self, text):
+        try:
+            self.stream.write(text)
+        except BrokenPipeError:
+            # 下游（如 head）提前退出：停止采集，照常输出统计
+            self.broken = True
+
+    def write(self, rows):
+        if len(rows) and not self.broken:
+            try:
+                np.savetxt(self.stream, rows, fmt='%.6f', delimiter=',')
+            except BrokenPipeError:
+                self.broken = True
+                return
+            self.rows += len(rows)
+
+    def close(self):
+        try:
+            self.stream.flush()
+        except BrokenPipeError:
+            self.broken = True
+        if self.stream is not sys.stdout:
+            self.stream.close()
+        elif self.broken:
+            # 避免解释器退出时再次 flush 已断开的 stdout
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+def run_engine(engine, args):
+    """运行引擎直到 duration / samples 条件满足或 Ctrl-C，返回统计字典"""
+    output = args.output
+    sink = writer = None
+    if output == '-':
+        sink = CsvSink(sys.stdout, engine.COLUMNS)
+    elif output.endswith('.csv'):
+        sink = CsvSink(open(output, 'w'), engine.COLUMNS)
+    else:
+        # 引擎在采集线程里直接写记录，--samples 由记录器截断，文件恰好 N 行
+        writer = CaptureWriter(output, engine.COLUMNS, max_rows=args.samples or None)
+        engine.start_recording(writer)
+
+    cursor = 0
+    lost_rows = 0
+    deadline = time.perf_counter() + args.duration if args.duration > 0 else None
+    engine.start()
+    try:
+        while engine.running:
+            time.sleep(POLL_INTERVAL)
+            if sink is not None:
+                rows, cursor, lost = engine.read_since(cursor)
+                lost_rows += lost
+                if args.samples and sink.rows + len(rows) >= args.samples:
+                    sink.write(rows[:args.samples - sink.rows])
+                    break
+                sink.write(rows)
+                if sink.broken:
+                    break
+            elif args.samples and engine.sample_count >= args.samples:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        if sink is not None:
+            rows, cursor, lost = engine.read_since(cursor)
+            lost_rows += lost
+            if args.samples:
+                rows = rows[:max(0, args.samples - sink.rows)]
+            sink.write(rows)
+            sink.close()
+        stats = {
+            'samples': engine.sample_count,
+            'actual_rate': engine.actual_rate,
+            'missed_deadlines': engine.scheduler.missed,
+            'lost_rows': lost_rows,
+        }
+        if writer is not None:
+            engine.stop_recording()
+            stats['capture'] = writer.prefix + '.json'
+            stats['capture_rows'] = writer.rows_written
+            stats['dropped_rows'] = writer.dropped_rows
+        if isinstance(engine, LoopbackEngine):
+            stats['dac_actual_rate'] = engine.dac_actual_rate
+    return stats
+
+
+def cmd_capture(args):
+    ADC, _ = load_expanderpi(args.sim or None)
+    config = AcquisitionConfig(args.channels[0], args.channels[1], args.differential,
+                               args.rate, burst=args.burst)
+    engine = AcquisitionEngine(ADC(), config, maxlen=args.buffer)
+    return run_engine(engine, args)
+
+
+def cmd_loopback(args):
+    ADC, DAC = load_expanderpi(args.sim or None)
+    config = AcquisitionConfig(args.channels[0], args.channels[1], args.differential,
+                               args.rate, args.dac_rate, wave_config(args.wave1),
+                               wave_config(args.wave2), args.diff)
+    engine = LoopbackEngine(ADC(), DAC(gainFactor=2), config, maxlen=args.buffer)
+    return run_engine(engine, args)
+
+
+def open_source(wave, path, once, rate):
+    from waveforms import DDSOscillator
+    if path is None:
+        return DDSOscillator(*wave_config(wave), sample_rate=rate), False
+    from arbitrary import WaveformPlayer
+    return WaveformPlayer.from_file(path, loop=not once), True
+
+
+def cmd_generate(args):
+    """与信号发生器窗口的输出线程相同：约 20 ms 一块预先生成，逐样本按截止时间写 DAC
+
+    跳过的节拍按调度器的 skipped 计数推进波形；--samples 精确到单个样本。
+    """
+    from scheduler import DeadlineScheduler
+    from waveforms import dac_pair
+
+    _, DAC = load_expanderpi(args.sim or None)
+    dac = DAC(gainFactor=2)
+    source1, clamped1 = open_source(args.wave1, args.file1, args.once, args.rate)
+    source2, clamped2 = open_source(args.wave2, args.file2, args.once, args.rate)
+    scheduler = DeadlineScheduler(args.rate)
+    set_dac_voltage = dac.set_dac_voltage
+    n = max(1, args.rate // 50)
+
+    def finished():
+        return getattr(source1, 'finished', False) and (
+            args.diff or getattr(source2, 'finished', True))
+
+    block1 = block2 = []
+    pos = 0
+    skipped = 0
+    count = 0
+    deadline = time.perf_counter() + args.duration if args.duration > 0 else None
+    start = time.perf_counter()
+    try:
+        while not (args.samples and count >= args.samples):
+            scheduler.wait()
+            # 跳过的节拍也推进波形，输出频率不受错过截止时间影响
+            pos += scheduler.skipped - skipped
+            skipped = scheduler.skipped
+            if pos >= len(block1):
+                if finished():
+                    break
+                while pos >= len(block1):
+                    pos -= len(block1)
+                    values1 = source1.next_block(n)
+                    values2 = None if args.diff else source2.next_block(n)
+                    block1, block2 = dac_pair(values1, values2, source1.offset, args.diff,
+                                              clamped=(clamped1, clamped2))
+                    block1, block2 = block1.tolist(), block2.tolist()
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+            set_dac_voltage(1, block1[pos])
+            set_dac_voltage(2, block2[pos])
+            pos += 1
+            count += 1
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    return {
+        'samples': count,
+        'actual_rate': count / elapsed if elapsed > 0 else 0.0,
+        'missed_deadlines': scheduler.missed,
+        'skipped_ticks': scheduler.skipped,
+    }
+
+
+def cmd_gui(args):
+    """只有这里才会导入 Qt：按原样运行对应的界面脚本"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), GUI_SCRIPTS[args.window])
+    sys.argv = [script] + args.gui_args
+    runpy.run_path(script, run_name='__main__')
+
+
+def add_output_arguments(parser):
+    parser.add_argument('--sim', action='store_true',
+                        help='使用仿真板卡（也可设置 EXPANDERPI_SIM=1）')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='运行秒数，0 表示直到 Ctrl-C')
+    parser.add_argument('--samples', type=int, default=0,
+                        help='达到该样本数后停止（0 表示不限）')
+
+
+def add_acquisition_arguments(parser):
+    parser.add_argument('--channels', type=int, nargs=2, default=[7, 8],
+                        metavar=('CH1', 'CH2'), help='ADC 输入 1~8')
+    parser.add_argument('--differential', action='store_true', help='计算 CH1 - CH2')
+    parser.add_argument('--rate', type=int, default=500, help='ADC 采样率 (Hz)')
+    parser.add_argument('--buffer', type=int, default=1 << 16,
+                        help='引擎环形缓冲行数（两次输出之间的样本都要放得下）')
+    parser.add_argument('-o', '--output', default='-',
+                        help="'-' 为 stdout CSV，*.csv 为 CSV 文件，其它为记录文件前缀")
+
+
+def add_wave_arguments(parser):
+    parser.add_argument('--wave1', nargs=4, default=['Sine', 100, 1, 2],
+                        metavar=('TYPE', 'FREQ', 'AMP', 'OFFSET'))
+    parser.add_argument('--wave2', nargs=4, default=['Square', 100, 1, 2],
+                        metavar=('TYPE', 'FREQ', 'AMP', 'OFFSET'))
+    parser.add_argument('--diff', action='store_true', help='DAC2 输出 DAC1 的差分镜像')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    capture = commands.add_parser('capture', help='ADC 采集')
+    add_output_arguments(capture)
+    add_acquisition_arguments(capture)
+    capture.add_argument('--burst', action='store_true', help='突发 SPI 读取')
+    capture.set_defaults(func=cmd_capture)
+
+    generate = commands.add_parser('generate', help='DAC 波形输出')
+    add_output_arguments(generate)
+    add_wave_arguments(generate)
+    generate.add_argument('--rate', type=int, default=10000, help='DAC 更新率 (Hz)')
+    generate.add_argument('--file1', help='通道 1 任意波形文件（.npy/.f32/.f64/.u16）')
+    generate.add_argument('--file2', help='通道 2 任意波形文件')
+    generate.add_argument('--once', action='store_true', help='任意波形只播放一遍')
+    generate.set_defaults(func=cmd_generate)
+
+    loopback = commands.add_parser('loopback', help='DAC 输出同时 ADC 采集')
+    add_output_arguments(loopback)
+    add_acquisition_arguments(loopback)
+    add_wave_arguments(loopback)
+    loopback.add_argument('--dac-rate', type=int, default=1000, help='DAC 更新率 (Hz)')
+    loopback.set_defaults(func=cmd_loopback)
+
+    gui = commands.add_parser('gui', help='启动图形界面（其余参数原样传给界面脚本）')
+    gui.add_argument('window', choices=sorted(GUI_SCRIPTS))
+    gui.add_argument('gui_args', nargs=argparse.REMAINDER)
+    gui.set_defaults(func=cmd_gui)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stats = args.func(args)
+    if stats is not None:
+        print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
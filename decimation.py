@@ -0,0 +1,77 @@
+"""绘图显示抽取
+
+把可见 X 范围内的数据压缩到每像素约两个点再交给 pyqtgraph：
+  - minmax: 每个像素列保留最小值和最大值，尖峰和毛刺不会丢失
+  - lttb:   Largest-Triangle-Three-Buckets，保留波形形状，点数更少
+"""
+import numpy as np
+
+MINMAX = 'minmax'
+LTTB = 'lttb'
+NONE = 'none'
+
+
+def visible_slice(x, x_min, x_max):
+    """x 单调递增；返回覆盖 [x_min, x_max] 的切片（两侧各多留一个点）"""
+    start = max(int(np.searchsorted(x, x_min, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, side='right')) + 1, len(x))
+    return slice(start, stop)
+
+
+def minmax_decimate(x, y, n_bins):
+    """每个 bin 输出最小值和最大值两个点（按时间先后排列）"""
+    n = len(y)
+    if n_bins <= 0 or n <= 2 * n_bins:
+        return x, y
+    bin_size = n // n_bins
+    m = bin_size * n_bins
+    blocks = y[:m].reshape(n_bins, bin_size)
+    amin = blocks.argmin(axis=1)
+    amax = blocks.argmax(axis=1)
+    base = np.arange(n_bins) * bin_size
+    idx = np.empty(2 * n_bins, dtype=np.intp)
+    idx[0::2] = base + np.minimum(amin, amax)
+    idx[1::2] = base + np.maximum(amin, amax)
+    if m < n:
+        tail = y[m:]
+        t_idx = m + np.array(sorted((int(tail.argmin()), int(tail.argmax()))))
+        idx = np.concatenate((idx, t_idx))
+    return x[idx], y[idx]
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets 降采样到 n_out 个点"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    idx = np.empty(n_out, dtype=np.intp)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一个桶的平均点
+        nlo = hi
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean() if nhi > nlo else x[-1]
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+def decimate_for_view(x, y, x_range=None, width_px=1000, method=MINMAX):
+    """截取可见范围并按像素宽度抽取"""
+    if x_range is not None and len(x):
+        sl = visible_slice(x, x_range[0], x_range[1])
+        x, y = x[sl], y[sl]
+    width_px = max(int(width_px), 1)
+    if method == MINMAX:
+        return minmax_decimate(x, y, width_px)
+    if method == LTTB:
+        return lttb(x, y, 2 * width_px)
+    return x, y
@@ -0,0 +1,135 @@
+"""多分辨率历史存储
+
+第 0 层保存最近的原始样本；第 k 层把第 k-1 层每 factor 行合并成一行
+(t, min..., max..., mean...)。每层都是固定容量的 RingBuffer，内存有上限，
+越粗的层覆盖的时间越长（factor=16、4 层、每层 10 万行时，500 Hz 下
+原始层约 3 分钟，最粗层约 150 天）。
+"""
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+
+class _Tier:
+    def __init__(self, capacity, n_channels, factor):
+        self.n_channels = n_channels
+        self.factor = factor
+        # 每行 (t, min * N, max * N, mean * N)
+        self.buffer = RingBuffer(capacity, 3 * n_channels)
+        self.pending = np.empty((factor, 1 + 3 * n_channels))
+        self.fill = 0
+
+    def feed(self, rows):
+        """rows 为上一层的 (t, min, max, mean) 行；返回本层新产生的行"""
+        if self.fill:
+            take = min(self.factor - self.fill, len(rows))
+            self.pending[self.fill:self.fill + take] = rows[:take]
+            self.fill += take
+            rows = rows[take:]
+            if self.fill < self.factor:
+                return rows[:0]
+            rows = np.concatenate((self.pending, rows))
+            self.fill = 0
+
+        groups = len(rows) // self.factor
+        used = groups * self.factor
+        leftover = rows[used:]
+        self.pending[:len(leftover)] = leftover
+        self.fill = len(leftover)
+        if groups == 0:
+            return rows[:0]
+
+        n = self.n_channels
+        blocks = rows[:used].reshape(groups, self.factor, -1)
+        out = np.empty((groups, 1 + 3 * n))
+        out[:, 0] = blocks[:, 0, 0]
+        out[:, 1:1 + n] = blocks[:, :, 1:1 + n].min(axis=1)
+        out[:, 1 + n:1 + 2 * n] = blocks[:, :, 1 + n:1 + 2 * n].max(axis=1)
+        out[:, 1 + 2 * n:] = blocks[:, :, 1 + 2 * n:].mean(axis=1)
+        self.buffer.extend(out)
+        return out
+
+
+class TieredHistory:
+    def __init__(self, n_channels, raw_capacity=100000, factor=16, levels=4,
+                 tier_capacity=100000):
+        self.n_channels = n_channels
+        self.raw = RingBuffer(raw_capacity, n_channels)
+        self.tiers = [_Tier(tier_capacity, n_channels, factor) for _ in range(levels)]
+
+    def clear(self):
+        self.raw.clear()
+        for tier in self.tiers:
+            tier.buffer.clear()
+            tier.fill = 0
+
+    def extend(self, rows):
+        """追加原始样本块 (t, ch1, ..., chN)"""
+        if len(rows) == 0:
+            return
+        self.raw.extend(rows)
+        values = rows[:, 1:]
+        # 原始样本的 min = max = mean
+        rows = np.hstack((rows[:, :1], values, values, values))
+        for tier in self.tiers:
+            rows = tier.feed(rows)
+            if len(rows) == 0:
+                break
+
+    def level_buffer(self, level):
+        return self.raw if level == 0 else self.tiers[level - 1].buffer
+
+    def span(self, level):
+        """该层保存的 (最早, 最新) 时间；空层返回 None"""
+        buf = self.level_buffer(level)
+        if not len(buf):
+            return None
+        parts = buf.latest()
+        return parts[0][0, 0], parts[-1][-1, 0]
+
+    def time_range(self):
+        spans = [self.span(level) for level in range(len(self.tiers) + 1)]
+        spans = [s for s in spans if s is not None]
+        if not spans:
+            return None
+        return min(s[0] for s in spans), max(s[1] for s in spans)
+
+    def choose_level(self, t0, t1, max_points):
+        """覆盖 t0 且点数不超过 max_points 的最细一层"""
+        levels = range(len(self.tiers) + 1)
+        for level in levels:
+            span = self.span(level)
+            if span is None:
+                continue
+            buf = self.level_buffer(level)
+            rows_per_second = len(buf) / max(span[1] - span[0], 1e-9)
+            points = (t1 - t0) * rows_per_second * (1 if level == 0 else 2)
+            if span[0] <= t0 and points <= max_points:
+                return level
+        # 都不满足时用覆盖时间最长的一层
+        for level in reversed(levels):
+            if self.span(level) is not None:
+                return level
+        return 0
+
+    def query(self, channel, t0, t1, max_points=2000):
+        """返回 (x, y, level)；粗层以 min/max 交替的包络形式给出"""
+        level = self.choose_level(t0, t1, max_points)
+        pieces = []
+        for part in self.level_buffer(level).latest():
+            t = part[:, 0]
+            start = max(int(np.searchsorted(t, t0)) - 1, 0)
+            stop = int(np.searchsorted(t, t1, side='right')) + 1
+            if stop > start:
+                pieces.append(part[start:stop])
+        if not pieces:
+            return np.empty(0), np.empty(0), level
+        data = np.concatenate(pieces)
+        if level == 0:
+            return data[:, 0], data[:, 1 + channel], level
+        n = self.n_channels
+        x = np.repeat(data[:, 0], 2)
+        y = np.empty(len(x))
+        y[0::2] = data[:, 1 + channel]
+        y[1::2] = data[:, 1 + n + channel]
+        return x, y, level
@@ -0,0 +1,226 @@
+"""计时与抖动统计
+
+Histogram 记录一类耗时（秒）：累计分桶计数供 Prometheus 导出，另保留
+最近 window 个原始值用来算抖动百分位。每个直方图只由一个线程写入，
+读端（界面、导出线程）读到的是近似一致的快照，不加锁。
+
+MetricsRegistry 汇总直方图和取值函数 (gauge)，render() 输出 Prometheus
+文本格式；MetricsExporter 定期把它写入本地文件，或在本机端口上提供
+HTTP 抓取。
+"""
+import bisect
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+# 1 µs ~ 1 s 按对数分桶
+DEFAULT_BOUNDS = tuple(float(b) for b in np.geomspace(1e-6, 1.0, 25))
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Histogram:
+    def __init__(self, name, help='', bounds=DEFAULT_BOUNDS, window=4096):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(bounds)
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = np.zeros(self.window)
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.recent[self.count % self.window] = value
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentiles(self, qs=PERCENTILES):
+        """最近 window 个值的百分位；没有数据时为 nan"""
+        n = min(self.count, self.window)
+        if n == 0:
+            return [math.nan] * len(qs)
+        return np.percentile(self.recent[:n], qs).tolist()
+
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+
+class MetricsRegistry:
+    def __init__(self, prefix='appendix'):
+        self.prefix = prefix
+        self.histograms = {}
+        self.gauges = {}
+
+    def histogram(self, name, help='', **kwargs):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(name, help, **kwargs)
+        return hist
+
+    def gauge(self, name, fn, help=''):
+        """fn() 在读取时求值；同名 gauge 以最后一次注册为准"""
+        self.gauges[name] = (fn, help)
+
+    def reset(self):
+        for hist in self.histograms.values():
+            hist.reset()
+
+    def gauge_values(self):
+        values = {}
+        for name, (fn, _) in list(self.gauges.items()):
+            try:
+                values[name] = float(fn())
+            except (AttributeError, TypeError, ValueError):
+                values[name] = math.nan
+        return values
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        for name, value in self.gauge_values().items():
+            full = f'{self.prefix}_{name}'
+            help = self.gauges[name][1]
+            if help:
+                lines.append(f'# HELP {full} {help}')
+            lines.append(f'# TYPE {full} gauge')
+            lines.append(f'{full} {value!r}')
+        for hist in list(self.histograms.values()):
+            full = f'{self.prefix}_{hist.name}'
+            if hist.help:
+                lines.append(f'# HELP {full} {hist.help}')
+            lines.append(f'# TYPE {full} histogram')
+            cumulative = 0
+            for bound, n in zip(hist.bounds, hist.buckets):
+                cumulative += n
+                lines.append(f'{full}_bucket{{le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{full}_bucket{{le="+Inf"}} {hist.count}')
+            lines.append(f'{full}_sum {hist.sum!r}')
+            lines.append(f'{full}_count {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """诊断面板用的等宽文本表，时间单位 µs"""
+        hists = list(self.histograms.values())
+        gauges = self.gauge_values()
+        width = max([28] + [len(h.name) + 1 for h in hists] + [len(g) + 1 for g in gauges])
+        header = f"{'':{width}}{'count':>9}{'mean':>9}{'p50':>9}{'p99':>9}{'p99.9':>9}{'max':>9}"
+        lines = [header]
+        for hist in hists:
+            p50, _, p99, p999 = hist.percentiles()
+            cols = [hist.mean(), p50, p99, p999, hist.max if hist.count else math.nan]
+            lines.append(f'{hist.name:{width}}{hist.count:>9}'
+                         + ''.join(f'{v * 1e6:>9.1f}' for v in cols))
+        for name, value in gauges.items():
+            lines.append(f'{name:{width}}{value:>9.6g}')
+        return '\n'.join(lines)
+
+
+class MetricsExporter:
+    """把 registry.render() 定期写到 path（先写临时文件再原子替换），
+    和/或在 (host, port) 上以 HTTP 提供抓取，两者可同时启用"""
+
+    def __init__(self, registry, path=None, port=None, host='127.0.0.1', interval=5.0):
+        self.registry = registry
+        self.path = path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.file_thread = None
+        self.http_server = None
+        self.http_thread = None
+
+    def start(self):
+        if self.path is not None:
+            self.stop_event.clear()
+            self.file_thread = threading.Thread(target=self.file_loop, daemon=True)
+            self.file_thread.start()
+        if self.port is not None:
+            # 只有启用 HTTP 导出时才导入，命令行入口的启动时间不受影响
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.http_server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.port = self.http_server.server_address[1]
+            self.http_thread = threading.Thread(target=self.http_server.serve_forever,
+                                                daemon=True)
+            self.http_thread.start()
+        return self
+
+    def write_file(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.registry.render())
+        os.replace(tmp, self.path)
+
+    def file_loop(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.write_file()
+            except OSError:
+                pass
+
+    def stop(self):
+        self.stop_event.set()
+        if self.file_thread is not None:
+            self.file_thread.join()
+            self.file_thread = None
+            try:
+                self.write_file()
+            except OSError:
+                pass
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.http_thread.join()
+            self.http_server = None
+
+
+def instrument_scheduler(registry, scheduler, prefix):
+    """给 DeadlineScheduler 挂上周期、迟到直方图和漏拍计数"""
+    scheduler.interval_hist = registry.histogram(
+        f'{prefix}_loop_interval_seconds', 'interval between consecutive ticks')
+    scheduler.lateness_hist = registry.histogram(
+        f'{prefix}_wake_lateness_seconds', 'wake-up time minus deadline')
+    registry.gauge(f'{prefix}_target_rate_hz', lambda: scheduler.rate, 'scheduler rate')
+    registry.gauge(f'{prefix}_missed_deadlines', lambda: scheduler.missed,
+                   'ticks that woke more than one period late')
+    registry.gauge(f'{prefix}_skipped_ticks', lambda: scheduler.skipped,
+                   'ticks dropped by the skip policy')
+
+
+def uninstrument_scheduler(scheduler):
+    """摘掉 instrument_scheduler 挂上的直方图，调度循环恢复为不计时"""
+    scheduler.interval_hist = None
+    scheduler.lateness_hist = None
+    scheduler.last_wake = None
+
+
+def time_call(hist, fn, *args):
+    """调用 fn(*args) 并把耗时记入 hist"""
+    t0 = time.perf_counter()
+    result = fn(*args)
+    hist.observe(time.perf_counter() - t0)
+    return result
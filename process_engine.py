@@ -0,0 +1,251 @@
+"""在独立进程中运行采集引擎
+
+采集（以及 LoopbackEngine 的 DAC 输出）在子进程里运行，不再和 Qt 事件
+循环争抢 GIL；样本写入 SharedRingBuffer，界面进程按游标无锁读取。
+控制命令经 multiprocessing.Queue 发送，运行状态由子进程定期写入一小块
+共享数组。ProcessEngine 对界面提供与 AcquisitionEngine 相同的接口。
+"""
+import multiprocessing
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import profiling
+from acquisition import AcquisitionEngine, LoopbackEngine
+from ring_buffer import SharedRingBuffer
+
+ENGINES = {
+    'acquisition': AcquisitionEngine,
+    'loopback': LoopbackEngine,
+}
+
+# 共享状态数组各项
+(STAT_RUNNING, STAT_RATE, STAT_SAMPLES, STAT_TICKS, STAT_MISSED, STAT_LATENESS,
+ STAT_DAC_RATE, STAT_SKEW) = range(8)
+N_STATS = 8
+
+COMMAND_POLL = 0.1
+
+
+def make_hardware(kind, simulate):
+    from board import load_expanderpi
+    ADC, DAC = load_expanderpi(simulate)
+    if kind == 'loopback':
+        return (ADC(), DAC(gainFactor=2))
+    return (ADC(),)
+
+
+def worker_main(kind, config, ring_name, stats_name, commands, simulate):
+    """子进程入口：建立引擎，把缓冲换成共享内存，然后处理命令直到 quit"""
+    ring = SharedRingBuffer.attach(ring_name)
+    stats_shm = shared_memory.SharedMemory(name=stats_name)
+    stats = np.ndarray((N_STATS,), dtype=np.float64, buffer=stats_shm.buf)
+    engine = ENGINES[kind](*make_hardware(kind, simulate), config, maxlen=ring.capacity)
+    engine.buffer = ring
+    parent = multiprocessing.parent_process()
+    # 子进程只支持采样剖析（环境变量），结果文件名加 -worker 后缀
+    _, sample, out = profiling.settings()
+    profile = profiling.TimedProfile(sample, out + '-worker') if sample else None
+    try:
+        while True:
+            try:
+                command, *args = commands.get(timeout=COMMAND_POLL)
+            except queue.Empty:
+                command = None
+                if parent is not None and not parent.is_alive():
+                    break
+            if command == 'quit':
+                break
+            elif command == 'config':
+                engine.reconfigure(args[0])
+            elif command == 'start':
+                engine.start()
+            elif command == 'stop':
+                engine.stop()
+            elif command == 'clear':
+                engine.clear()
+
+            scheduler = engine.scheduler
+            stats[:] = (engine.running, engine.actual_rate, engine.sample_count,
+                        scheduler.ticks, scheduler.missed, scheduler.max_lateness,
+                        getattr(engine, 'dac_actual_rate', 0.0), engine.channel_skew)
+    finally:
+        engine.stop()
+        if profile is not None:
+            profile.finish()
+        stats[STAT_RUNNING] = 0
+        del stats
+        stats_shm.close()
+        ring.close()
+
+
+class SchedulerStats:
+    """子进程调度器统计的只读视图（界面读取 engine.scheduler.missed 等）"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @property
+    def ticks(self):
+        return int(self.stats[STAT_TICKS])
+
+    @property
+    def missed(self):
+        return int(self.stats[STAT_MISSED])
+
+    @property
+    def max_lateness(self):
+        return float(self.stats[STAT_LATENESS])
+
+
+class ProcessEngine:
+    """界面进程一侧的代理
+
+    kind 为 'acquisition' 或 'loopback'。记录文件由界面进程的一个后台线程
+    从共享缓冲读取新样本后写入 CaptureWriter，子进程只管采样。
+    """
+
+    def __init__(self, kind, config, maxlen=1 << 16, simulate=None, n_channels=3):
+        self.kind = kind
+        self.config = config
+        self.maxlen = maxlen
+        self.COLUMNS = ENGINES[kind].COLUMNS
+        ctx = multiprocessing.get_context('spawn')
+        self.buffer = SharedRingBuffer(maxlen, n_channels)
+        self.stats_shm = shared_memory.SharedMemory(
+            create=True, size=8 * N_STATS)
+        self.stats = np.ndarray((N_STATS,), dtype=np.float64, buffer=self.stats_shm.buf)
+        self.stats[:] = 0.0
+        self.scheduler = SchedulerStats(self.stats)
+        self.commands = ctx.Queue()
+        self.process = ctx.Process(
+            target=worker_main,
+            args=(kind, config, self.buffer.name, self.stats_shm.name, self.commands,
+                  simulate),
+            daemon=True)
+        self.process.start()
+        self._running = False
+
+        self.recorder = None
+        self.record_thread = None
+        self.record_stop = threading.Event()
+
+    # ---- 与 AcquisitionEngine 相同的接口 ----
+
+    @property
+    def running(self):
+        # 子进程的状态每 COMMAND_POLL 秒才更新一次，以本地请求为准
+        return self._running
+
+    @property
+    def actual_rate(self):
+        return float(self.stats[STAT_RATE])
+
+    @property
+    def dac_actual_rate(self):
+        return float(self.stats[STAT_DAC_RATE])
+
+    @property
+    def sample_count(self):
+        return int(self.stats[STAT_SAMPLES])
+
+    @property
+    def channel_skew(self):
+        return float(self.stats[STAT_SKEW])
+
+    def instrument(self, registry, prefix='adc'):
+        """只能登记共享状态数组里的汇总量；逐拍直方图留在子进程里"""
+        stats = self.stats
+        registry.gauge(f'{prefix}_actual_rate_hz', lambda: stats[STAT_RATE],
+                       'measured sample rate')
+        registry.gauge(f'{prefix}_samples_total', lambda: stats[STAT_SAMPLES])
+        registry.gauge(f'{prefix}_missed_deadlines', lambda: stats[STAT_MISSED],
+                       'ticks that woke more than one period late')
+        registry.gauge(f'{prefix}_max_lateness_seconds', lambda: stats[STAT_LATENESS])
+        if self.kind == 'loopback':
+            registry.gauge('dac_actual_rate_hz', lambda: stats[STAT_DAC_RATE],
+                           'measured DAC update rate')
+        return self
+
+    def uninstrument(self):
+        """gauge 只在读取时求值，没有需要摘掉的计时"""
+
+    def reconfigure(self, config=None, **changes):
+        if config is None:
+            config = self.config._replace(**changes)
+        self.config = config
+        self.commands.put(('config', config))
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self.commands.put(('start',))
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        self.commands.put(('stop',))
+
+    def clear(self):
+        self.commands.put(('clear',))
+
+    def snapshot(self, n=None, out=None):
+        block = self.buffer.snapshot(n, out)
+        if not len(block):
+            return None
+        return tuple(block.T)
+
+    def read_since(self, cursor):
+        return self.buffer.read_since(cursor)
+
+    def start_recording(self, writer):
+        self.stop_recording()
+        self.recorder = writer.start()
+        self.record_stop.clear()
+        self.record_thread = threading.Thread(target=self.record_loop,
+                                              args=(self.recorder,), daemon=True)
+        self.record_thread.start()
+
+    def record_loop(self, writer):
+        cursor = self.buffer.total
+        stopping = False
+        while not stopping:
+            stopping = self.record_stop.wait(0.05)
+            rows, cursor, lost = self.buffer.read_since(cursor)
+            if lost:
+                writer.dropped_rows += lost
+            if len(rows):
+                writer.append_block(rows)
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            self.record_stop.set()
+            self.record_thread.join()
+            self.record_thread = None
+            recorder.close()
+        return recorder
+
+    # ---- 进程管理 ----
+
+    def shutdown(self, timeout=2.0):
+        """通知子进程退出并等待；超时才强制结束，最后释放共享内存"""
+        self.stop_recording()
+        if self.process is not None:
+            if self.process.is_alive():
+                self.commands.put(('quit',))
+                self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+            self.process = None
+            self.commands.close()
+            self.commands.join_thread()
+            self._running = False
+            self.scheduler = None
+            self.stats = None
+            self.stats_shm.close()
+            self.stats_shm.unlink()
+            self.buffer.close()
@@ -0,0 +1,209 @@
+"""可选的性能剖析钩子
+
+默认什么都不做：热点函数保持原样，逐样本循环里没有任何额外开销。
+启用方式（命令行参数优先于环境变量）：
+  --profile             / APPENDIX_PROFILE=1          给热点函数套上计时 span
+  --profile-sample SEC  / APPENDIX_PROFILE_SAMPLE=SEC 运行采样剖析器 SEC 秒
+  --profile-out PREFIX  / APPENDIX_PROFILE_OUT=PREFIX 采样结果的文件名前缀
+
+计时 span 是在启用时把类属性/模块函数替换为计时包装，耗时记入
+metrics.MetricsRegistry 的 span_<名称>_seconds 直方图，与诊断面板、
+Prometheus 导出共用一套输出。uninstall() 恢复原函数。
+
+采样剖析器定期抓取所有线程的调用栈，写出 <前缀>.collapsed（每行
+"线程;文件:函数;... 次数"，可直接交给 flamegraph.pl / speedscope）
+和按采样数排序的文本报告 <前缀>.txt。
+"""
+import functools
+import importlib
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+ENV_SPANS = 'APPENDIX_PROFILE'
+ENV_SAMPLE = 'APPENDIX_PROFILE_SAMPLE'
+ENV_OUT = 'APPENDIX_PROFILE_OUT'
+
+# (模块, 类名或 None, 属性, span 名称)
+HOT_PATHS = (
+    ('acquisition', 'AcquisitionEngine', 'read_sample', 'adc_read_sample'),
+    ('acquisition', 'AcquisitionEngine', 'read_burst', 'adc_read_burst'),
+    ('acquisition', 'AcquisitionEngine', 'store', 'adc_store'),
+    ('acquisition', 'AcquisitionEngine', 'store_block', 'adc_store_block'),
+    ('acquisition', 'LoopbackEngine', 'next_dac_block', 'dac_next_block'),
+    ('analysis', None, 'measure_frequency_fft', 'measure_frequency_fft'),
+    ('analysis', 'FrequencyEstimator', '_process_segment', 'fft_segment'),
+    ('analysis', 'FrequencyTracker', 'feed', 'frequency_tracker_feed'),
+    ('waveforms', 'DDSOscillator', 'next_block', 'dds_next_block'),
+    ('arbitrary', 'WaveformPlayer', 'next_block', 'arbitrary_next_block'),
+)
+
+_installed = []
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', action='store_true',
+                        help=f'给热点函数加计时 span（也可设置 {ENV_SPANS}=1）')
+    parser.add_argument('--profile-sample', type=float, metavar='SECONDS',
+                        help=f'运行采样剖析器若干秒（也可设置 {ENV_SAMPLE}）')
+    parser.add_argument('--profile-out', metavar='PREFIX',
+                        help=f'采样结果文件名前缀（也可设置 {ENV_OUT}）')
+
+
+def settings(args=None):
+    """返回 (是否启用 span, 采样秒数或 None, 输出前缀)"""
+    spans = bool(getattr(args, 'profile', False)) or os.environ.get(ENV_SPANS, '') not in (
+        '', '0')
+    sample = getattr(args, 'profile_sample', None)
+    if sample is None and os.environ.get(ENV_SAMPLE):
+        sample = float(os.environ[ENV_SAMPLE])
+    out = (getattr(args, 'profile_out', None) or os.environ.get(ENV_OUT)
+           or time.strftime('profile-%Y%m%d-%H%M%S'))
+    return spans, sample, out
+
+
+def timed(fn, hist):
+    perf_counter = time.perf_counter
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            hist.observe(perf_counter() - t0)
+    return wrapper
+
+
+def install(registry, extra=()):
+    """给 HOT_PATHS 和 extra 中的函数套上计时包装
+
+    extra 为 (类或模块对象, 属性, span 名称)，供界面脚本登记自己的方法
+    （如 refresh_plot）。同一属性只包装一次。模块函数只对经由模块属性
+    的调用生效，别处 from-import 进来的名字不受影响。多个线程调用同一个
+    被包装的函数时直方图计数是近似的。
+    """
+    targets = []
+    for module_name, class_name, attr, name in HOT_PATHS:
+        owner = importlib.import_module(module_name)
+        if class_name is not None:
+            owner = getattr(owner, class_name)
+        targets.append((owner, attr, name))
+    targets.extend(extra)
+
+    for owner, attr, name in targets:
+        if any(o is owner and a == attr for o, a, _ in _installed):
+            continue
+        # 只取 owner 自己的属性，子类不重复包装父类的方法
+        original = vars(owner).get(attr) if isinstance(owner, type) else getattr(owner, attr)
+        if original is None:
+            continue
+        hist = registry.histogram(f'span_{name}_seconds', f'time spent in {attr}')
+        setattr(owner, attr, timed(original, hist))
+        _installed.append((owner, attr, original))
+
+
+def uninstall():
+    while _installed:
+        owner, attr, original = _installed.pop()
+        setattr(owner, attr, original)
+
+
+class SamplingProfiler:
+    """每 interval 秒抓取一次所有线程的调用栈并计数"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='profiler')
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            self.sample(own)
+
+    def sample(self, skip=None):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)).replace(';', '_'))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def report(self, top=30):
+        """按自身（栈顶）和累计采样数排序的文本报告"""
+        own, total = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                own[frames[-1]] += n
+            for frame in set(frames):
+                total[frame] += n
+        lines = [f'{self.samples} samples every {self.interval * 1e3:.1f} ms', '',
+                 f"{'self':>8}{'total':>8}  function"]
+        for frame, n in own.most_common(top):
+            lines.append(f'{n:>8}{total[frame]:>8}  {frame}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, prefix):
+        with open(prefix + '.collapsed', 'w') as f:
+            for stack, n in sorted(self.stacks.items()):
+                f.write(f'{stack} {n}\n')
+        with open(prefix + '.txt', 'w') as f:
+            f.write(self.report())
+        return prefix + '.collapsed', prefix + '.txt'
+
+
+class TimedProfile:
+    """运行 SamplingProfiler 指定秒数后写出结果；finish() 可提前结束"""
+
+    def __init__(self, seconds, prefix, interval=0.005):
+        self.prefix = prefix
+        self.profiler = SamplingProfiler(interval).start()
+        self.done = False
+        self.lock = threading.Lock()
+        self.timer = threading.Timer(seconds, self.finish)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def finish(self):
+        with self.lock:
+            if self.done:
+                return
+            self.done = True
+        self.timer.cancel()
+        self.profiler.stop()
+        collapsed, report = self.profiler.write(self.prefix)
+        print(f'profile written to {collapsed} and {report}', file=sys.stderr)
+
+
+def setup(registry, args=None, extra=()):
+    """按命令行参数/环境变量启用 span 和采样；返回 TimedProfile 或 None"""
+    spans, sample, out = settings(args)
+    if spans:
+        install(registry, extra)
+    if sample:
+        return TimedProfile(sample, out)
+    return None
@@ -0,0 +1,207 @@
+"""采样数据流式落盘
+
+文件格式（replay.py 读取）：
+  <prefix>_NNNN.cap   64 字节文件头 + float64 行数据 (t, ch1, ..., chN)
+  <prefix>_NNNN.idx   每个数据块一条记录 (起始行号 int64, 起始时间 float64)
+  <prefix>.json       清单：列名、分块大小、文件列表
+"""
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b'APXCAP01'
+HEADER_FORMAT = '<8sIId'          # magic, version, n_columns, 创建时间
+HEADER_SIZE = 64
+INDEX_FORMAT = '<qd'              # 块起始行号, 块起始时间
+VERSION = 1
+
+
+def write_header(f, n_columns, created):
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, n_columns, created)
+    f.write(header.ljust(HEADER_SIZE, b'\0'))
+
+
+def read_header(f):
+    magic, version, n_columns, created = struct.unpack(
+        HEADER_FORMAT, f.read(HEADER_SIZE)[:struct.calcsize(HEADER_FORMAT)])
+    if magic != MAGIC:
+        raise ValueError('not a capture file')
+    if version != VERSION:
+        raise ValueError(f'unsupported capture version: {version}')
+    return n_columns, created
+
+
+class CaptureWriter:
+    """后台线程写盘的采集记录器
+
+    采集线程只把样本写进内存中的当前块；块满后整块放入有界队列，
+    由写盘线程写入文件。队列满时丢弃该块并计数，采集线程永不等待磁盘。
+    max_rows 限制总共接收的行数，超出的行（包括最后一块的多余部分）直接丢掉。
+    """
+
+    def __init__(self, prefix, columns, chunk_rows=4096, rotate_bytes=256 * 1024 * 1024,
+                 max_queue=64, max_rows=None):
+        self.prefix = prefix
+        self.columns = list(columns)
+        self.n_columns = len(self.columns)
+        self.chunk_rows = int(chunk_rows)
+        self.rotate_bytes = rotate_bytes
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.max_rows = max_rows
+        self.rows_accepted = 0
+
+        self.chunk = np.empty((self.chunk_rows, self.n_columns))
+        self.fill = 0
+        self.chunk_lock = threading.Lock()
+
+        self.files = []
+        self.file = None
+        self.index_file = None
+        self.file_rows = 0
+        self.file_bytes = 0
+
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.chunks_written = 0
+        self.dropped_chunks = 0
+        self.dropped_rows = 0
+        self.start_time = None
+        self.writer_thread = None
+        self.closed = False
+
+    def start(self):
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.start_time = time.perf_counter()
+        self.writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.writer_thread.start()
+        return self
+
+    # ---- 采集线程调用 ----
+
+    def append_row(self, *values):
+        with self.chunk_lock:
+            if self.closed or self.max_rows is not None and self.rows_accepted >= self.max_rows:
+                return
+            self.rows_accepted += 1
+            self.chunk[self.fill] = values
+            self.fill += 1
+            if self.fill == self.chunk_rows:
+                self._submit()
+
+    def append_block(self, rows):
+        rows = np.asarray(rows, dtype=float)
+        with self.chunk_lock:
+            if self.closed:
+                return
+            if self.max_rows is not None:
+                rows = rows[:max(0, self.max_rows - self.rows_accepted)]
+            self.rows_accepted += len(rows)
+            pos = 0
+            while pos < len(rows):
+                take = min(self.chunk_rows - self.fill, len(rows) - pos)
+                self.chunk[self.fill:self.fill + take] = rows[pos:pos + take]
+                self.fill += take
+                pos += take
+                if self.fill == self.chunk_rows:
+                    self._submit()
+
+    def _submit(self):
+        chunk = self.chunk[:self.fill]
+        try:
+            self.queue.put_nowait(chunk)
+        except queue.Full:
+            self.dropped_chunks += 1
+            self.dropped_rows += self.fill
+        else:
+            # 交出去的块归写盘线程所有，换一块新的
+            self.chunk = np.empty((self.chunk_rows, self.n_columns))
+        self.fill = 0
+
+    # ---- 写盘线程 ----
+
+    def _open_next_file(self):
+        self._close_file()
+        path = f'{self.prefix}_{len(self.files):04d}.cap'
+        self.file = open(path, 'wb')
+        self.index_file = open(path[:-4] + '.idx', 'wb')
+        write_header(self.file, self.n_columns, time.time())
+        self.files.append(os.path.basename(path))
+        self.file_rows = 0
+        self.file_bytes = HEADER_SIZE
+        self._write_manifest()
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.index_file.close()
+            self.file = None
+            self.index_file = None
+
+    def _write_manifest(self):
+        manifest = {
+            'version': VERSION,
+            'columns': self.columns,
+            'chunk_rows': self.chunk_rows,
+            'files': self.files,
+        }
+        with open(self.prefix + '.json', 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    def writer_loop(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.file is None or (self.file_rows and
+                                     self.file_bytes + chunk.nbytes > self.rotate_bytes):
+                self._open_next_file()
+            self.index_file.write(struct.pack(INDEX_FORMAT, self.file_rows, chunk[0, 0]))
+            self.file.write(chunk.tobytes())
+            self.file.flush()
+            self.index_file.flush()
+
+            self.file_rows += len(chunk)
+            self.file_bytes += chunk.nbytes
+            self.rows_written += len(chunk)
+            self.bytes_written += chunk.nbytes
+            self.chunks_written += 1
+        self._close_file()
+
+    def close(self, timeout=5.0):
+        """写出未满的块并等待写盘线程结束"""
+        with self.chunk_lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.fill:
+                # 收尾时可以阻塞等待队列空位，保证数据写完
+                self.queue.put(self.chunk[:self.fill])
+                self.fill = 0
+        self.queue.put(None)
+        if self.writer_thread is not None:
+            self.writer_thread.join(timeout)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+        return {
+            'rows_written': self.rows_written,
+            'bytes_written': self.bytes_written,
+            'chunks_written': self.chunks_written,
+            'dropped_chunks': self.dropped_chunks,
+            'dropped_rows': self.dropped_rows,
+            'queue_depth': self.queue.qsize(),
+            'files': len(self.files),
+            'throughput_bytes_per_s': self.bytes_written / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def capture_prefix(directory='captures', name='capture'):
+    """captures/capture_YYYYmmdd_HHMMSS"""
+    return os.path.join(directory, f'{name}_{time.strftime("%Y%m%d_%H%M%S")}')
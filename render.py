@@ -0,0 +1,59 @@
+"""界面绘图管线的共用部分
+
+CurveRenderer 按点数切换曲线样式：点少时保持原来的散点，点多时改画
+折线（散点的每个符号都要单独绘制，几千点以上代价远高于一条折线），
+并启用 pyqtgraph 的 clipToView 和峰值降采样。
+
+RefreshPacer 根据每次刷新的实际耗时调整定时器间隔：绘图占用界面线程
+的比例超过 budget 时拉长间隔，负载下降后回到目标间隔。
+
+本模块不导入 Qt，只调用传入的 pyqtgraph 对象的方法。
+"""
+
+SYMBOL_LIMIT = 500
+
+
+class CurveRenderer:
+    def __init__(self, curve, color, symbol_limit=SYMBOL_LIMIT, symbol_size=3):
+        self.curve = curve
+        self.color = color
+        self.symbol_limit = symbol_limit
+        self.symbol_size = symbol_size
+        self.lines = None
+        curve.setClipToView(True)
+        curve.setDownsampling(auto=True, method='peak')
+
+    def set_data(self, x, y):
+        lines = len(x) > self.symbol_limit
+        if lines != self.lines:
+            self.lines = lines
+            curve = self.curve
+            if lines:
+                curve.setSymbol(None)
+                curve.setPen(self.color)
+            else:
+                curve.setPen(None)
+                curve.setSymbol('o')
+                curve.setSymbolSize(self.symbol_size)
+                curve.setSymbolBrush(self.color)
+                curve.setSymbolPen(self.color)
+        self.curve.setData(x=x, y=y)
+
+
+class RefreshPacer:
+    """interval_ms 为目标刷新间隔；返回的间隔不小于它，也不超过 max_interval_ms"""
+
+    def __init__(self, interval_ms, budget=0.5, max_interval_ms=5000, smoothing=0.3):
+        self.target = interval_ms
+        self.budget = budget
+        self.max_interval = max_interval_ms
+        self.smoothing = smoothing
+        self.cost = 0.0
+        self.interval = interval_ms
+
+    def update(self, duration):
+        """duration 为本次刷新耗时（秒），返回下一次的定时器间隔（毫秒）"""
+        self.cost += self.smoothing * (duration * 1000.0 - self.cost)
+        needed = self.cost / self.budget
+        self.interval = int(round(min(max(self.target, needed), self.max_interval)))
+        return self.interval
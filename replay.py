@@ -0,0 +1,197 @@
+"""回放 recorder.py 写出的采集文件
+
+数据通过 np.memmap 按需映射，几 GB 的记录也不需要读入内存；
+时间定位先在块索引 (.idx) 上二分，再在单个块内二分。
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from acquisition import AcquisitionEngine, AcquisitionConfig
+from recorder import HEADER_SIZE, read_header
+
+INDEX_DTYPE = np.dtype([('row', '<i8'), ('t', '<f8')])
+
+
+class CaptureReader:
+    """path 为 <prefix>.json 清单或单个 .cap 文件"""
+
+    def __init__(self, path):
+        if path.endswith('.json'):
+            with open(path) as f:
+                manifest = json.load(f)
+            directory = os.path.dirname(path)
+            paths = [os.path.join(directory, name) for name in manifest['files']]
+            self.columns = manifest['columns']
+        else:
+            paths = [path]
+            self.columns = None
+
+        self.segments = []
+        index_rows, index_t = [], []
+        offset = 0
+        for cap_path in paths:
+            with open(cap_path, 'rb') as f:
+                n_columns, _ = read_header(f)
+            rows = (os.path.getsize(cap_path) - HEADER_SIZE) // (8 * n_columns)
+            if rows <= 0:
+                continue
+            data = np.memmap(cap_path, dtype='<f8', mode='r', offset=HEADER_SIZE,
+                             shape=(rows, n_columns))
+            self.segments.append((offset, data))
+
+            idx_path = cap_path[:-4] + '.idx'
+            if os.path.exists(idx_path):
+                index = np.fromfile(idx_path, dtype=INDEX_DTYPE)
+                index = index[index['row'] < rows]
+            else:
+                index = np.zeros(1, dtype=INDEX_DTYPE)
+                index['t'] = data[0, 0]
+            index_rows.append(index['row'] + offset)
+            index_t.append(index['t'])
+            offset += rows
+
+        if not self.segments:
+            raise ValueError(f'no samples in capture: {path}')
+        self.n_columns = self.segments[0][1].shape[1]
+        if self.columns is None:
+            self.columns = ['t'] + [f'ch{i}' for i in range(1, self.n_columns)]
+        self.total_rows = offset
+        self.segment_starts = np.array([start for start, _ in self.segments])
+        self.chunk_rows = np.concatenate(index_rows)
+        self.chunk_t = np.concatenate(index_t)
+
+    def __len__(self):
+        return self.total_rows
+
+    def time_range(self):
+        last = self.segments[-1][1]
+        return float(self.chunk_t[0]), float(last[-1, 0])
+
+    def row_at_time(self, t):
+        """第一个时间戳 >= t 的全局行号"""
+        k = int(np.searchsorted(self.chunk_t, t, side='right')) - 1
+        if k < 0:
+            return 0
+        start = int(self.chunk_rows[k])
+        stop = int(self.chunk_rows[k + 1]) if k + 1 < len(self.chunk_rows) else self.total_rows
+        block_t = self.read(start, stop)[:, 0]
+        return start + int(np.searchsorted(block_t, t))
+
+    def read(self, start, stop):
+        """读取全局行 [start, stop)，跨文件时拼接"""
+        start = max(0, start)
+        stop = min(self.total_rows, stop)
+        if stop <= start:
+            return np.empty((0, self.n_columns))
+        parts = []
+        k = int(np.searchsorted(self.segment_starts, start, side='right')) - 1
+        while start < stop:
+            seg_start, data = self.segments[k]
+            seg_stop = seg_start + len(data)
+            take = min(stop, seg_stop)
+            parts.append(data[start - seg_start:take - seg_start])
+            start = take
+            k += 1
+        if len(parts) == 1:
+            return np.array(parts[0])
+        return np.concatenate(parts)
+
+    def read_time(self, t0, t1):
+        return self.read(self.row_at_time(t0), self.row_at_time(t1))
+
+
+class ReplayEngine(AcquisitionEngine):
+    """以实时或加速速度把记录文件推入环形缓冲
+
+    对外接口与 AcquisitionEngine 相同，窗口的绘图、测频路径无需改动。
+    speed=None 表示不限速。
+    """
+
+    TICK_RATE = 100
+
+    def __init__(self, reader, maxlen=300, speed=1.0):
+        config = AcquisitionConfig(0, 0, reader.n_columns > 3, self.TICK_RATE)
+        super().__init__(None, config, maxlen=maxlen)
+        self.reader = reader
+        self.speed = speed
+        self.position = 0
+        # 界面线程的跳转/重新计时请求；position 只由回放线程修改
+        self.seek_target = None
+        self.clock_restart = False
+
+    def reconfigure(self, config=None, **changes):
+        # 回放的节拍与界面上的采样率无关
+        super().reconfigure(config, **changes)
+        self.config = self.config._replace(adc_rate=self.TICK_RATE)
+
+    def start(self):
+        if self.position >= len(self.reader) and self.seek_target is None:
+            self.position = 0
+        super().start()
+
+    def seek(self, t):
+        """跳到时间戳 t：清空缓冲，回放线程在下一个节拍开始时执行"""
+        row = self.reader.row_at_time(t)
+        with self.data_lock:
+            self.seek_target = row
+            self.buffer.clear()
+
+    def set_speed(self, speed):
+        """改变回放速度；回放线程在下一个节拍以当前位置为起点重新计时"""
+        with self.data_lock:
+            self.speed = speed
+            self.clock_restart = True
+
+    def acquisition_loop(self):
+        scheduler = self.scheduler
+        reader = self.reader
+        restart_clock = True
+        wall0 = 0.0
+        pushed = 0
+        width = self.buffer.n_channels + 1
+        while self.running:
+            with self.data_lock:
+                target, self.seek_target = self.seek_target, None
+                if target is not None:
+                    self.position = target
+                    restart_clock = True
+                if self.clock_restart:
+                    self.clock_restart = False
+                    restart_clock = True
+                speed = self.speed
+            if self.position >= len(reader):
+                break
+            if restart_clock:
+                restart_clock = False
+                wall0 = time.perf_counter()
+                pushed = 0
+                replay_t0 = reader.read(self.position, self.position + 1)[0, 0]
+            scheduler.wait()
+
+            elapsed = time.perf_counter() - wall0
+            if speed is None:
+                stop = min(self.position + self.maxlen, len(reader))
+            else:
+                stop = reader.row_at_time(replay_t0 + elapsed * speed)
+            if stop <= self.position:
+                continue
+            rows = reader.read(self.position, stop)
+            if rows.shape[1] < width:
+                rows = np.hstack((rows, np.zeros((len(rows), width - rows.shape[1]))))
+            with self.data_lock:
+                if self.seek_target is not None:
+                    # 读取期间界面发起了跳转：丢弃这一块，下一拍从新位置读
+                    continue
+                self.position = stop
+                self.buffer.extend(rows[:, :width])
+            pushed += len(rows)
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.append_block(rows)
+            self.sample_count += len(rows)
+            if elapsed > 0:
+                self.actual_rate = pushed / elapsed
+        self.running = False
@@ -0,0 +1,271 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _concat_into(parts, out):
+    start = 0
+    for part in parts:
+        out[start:start + len(part)] = part
+        start += len(part)
+    return out[:start]
+
+
+class RingBuffer:
+    """预分配的二维环形缓冲区
+
+    每行是一个样本 (t, ch1, ..., chN)，全部存放在一块 float 数组里。
+    append 为 O(1)，不分配 Python 对象；latest() 返回零拷贝视图
+    （回绕时为两段切片），snapshot() 返回给绘图用的连续副本。
+    """
+
+    def __init__(self, capacity, n_channels, dtype=np.float64):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.n_channels = int(n_channels)
+        self.data = np.zeros((self.capacity, self.n_channels + 1), dtype=dtype)
+        self.head = 0    # 下一次写入的行
+        self.total = 0   # 累计写入的行数（不随回绕清零）
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        self.head = 0
+        self.total = 0
+
+    def append(self, t, *values):
+        row = self.data[self.head]
+        row[0] = t
+        row[1:] = values
+        self.head += 1
+        if self.head == self.capacity:
+            self.head = 0
+        self.total += 1
+
+    def extend(self, rows):
+        """追加一个 (n, n_channels + 1) 的样本块"""
+        rows = np.asarray(rows, dtype=self.data.dtype)
+        n = len(rows)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            self.data[:] = rows[-self.capacity:]
+            self.head = 0
+            self.total += n
+            return
+        end = self.head + n
+        if end <= self.capacity:
+            self.data[self.head:end] = rows
+        else:
+            split = self.capacity - self.head
+            self.data[self.head:] = rows[:split]
+            self.data[:n - split] = rows[split:]
+        self.head = end % self.capacity
+        self.total += n
+
+    def latest(self, n=None):
+        """最近 n 行的零拷贝视图，按时间顺序返回一段或两段切片"""
+        size = len(self)
+        if n is None or n > size:
+            n = size
+        if n <= 0:
+            return (self.data[:0],)
+        start = self.head - n
+        if start >= 0:
+            return (self.data[start:self.head],)
+        if self.head == 0:
+            return (self.data[start:],)
+        return (self.data[start:], self.data[:self.head])
+
+    def snapshot(self, n=None, out=None):
+        """最近 n 行的连续副本；给出 out 时写入 out 的开头并返回其切片，不分配"""
+        parts = self.latest(n)
+        if out is not None:
+            return _concat_into(parts, out)
+        if len(parts) == 1:
+            return parts[0].copy()
+        return np.concatenate(parts)
+
+    def read_since(self, cursor):
+        """读取游标之后的新行
+
+        返回 (新行副本, 新游标, 因覆盖而丢失的行数)。游标即 total 的历史值。
+        """
+        if cursor > self.total:
+            cursor = 0
+        pending = self.total - cursor
+        available = min(pending, len(self))
+        return self.snapshot(available), self.total, pending - available
+
+
+class SharedRingBuffer:
+    """放在 multiprocessing.shared_memory 里的单写多读环形缓冲
+
+    内存布局：int64 头 (total, capacity, n_channels, 保留) + float64 数据行。
+    写入位置只由 total 推出（head = total % capacity），写端先写数据再更新
+    total，所以读端无需加锁：按 total 取索引复制，复制完再检查期间是否
+    被写端追上覆盖，被覆盖的行计入丢失。接口与 RingBuffer 相同。
+    """
+
+    HEADER_WORDS = 4
+
+    def __init__(self, capacity=None, n_channels=None, name=None):
+        create = name is None
+        if create:
+            if capacity is None or capacity <= 0:
+                raise ValueError("capacity must be positive")
+            size = 8 * (self.HEADER_WORDS + int(capacity) * (int(n_channels) + 1))
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = create
+        self.header = np.ndarray((self.HEADER_WORDS,), dtype=np.int64, buffer=self.shm.buf)
+        if create:
+            self.header[:] = (0, capacity, n_channels, 0)
+        self.capacity = int(self.header[1])
+        self.n_channels = int(self.header[2])
+        self.data = np.ndarray((self.capacity, self.n_channels + 1), dtype=np.float64,
+                               buffer=self.shm.buf, offset=8 * self.HEADER_WORDS)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def total(self):
+        return int(self.header[0])
+
+    @property
+    def head(self):
+        return self.total % self.capacity
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        self.header[0] = 0
+
+    def append(self, t, *values):
+        total = self.total
+        row = self.data[total % self.capacity]
+        row[0] = t
+        row[1:] = values
+        self.header[0] = total + 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=self.data.dtype)
+        n = len(rows)
+        if n == 0:
+            return
+        total = self.total
+        if n > self.capacity:
+            rows = rows[-self.capacity:]
+        m = len(rows)
+        start = (total + n - m) % self.capacity
+        end = start + m
+        if end <= self.capacity:
+            self.data[start:end] = rows
+        else:
+            split = self.capacity - start
+            self.data[start:] = rows[:split]
+            self.data[:m - split] = rows[split:]
+        self.header[0] = total + n
+
+    def _copy(self, total, n, out=None):
+        """复制以 total 结尾的 n 行"""
+        if n <= 0:
+            return self.data[:0].copy()
+        start = (total - n) % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            parts = (self.data[start:end],)
+        else:
+            parts = (self.data[start:], self.data[:end - self.capacity])
+        if out is not None:
+            return _concat_into(parts, out)
+        if len(parts) == 1:
+            return parts[0].copy()
+        return np.concatenate(parts)
+
+    def _overwritten(self, total, n):
+        """复制期间被写端覆盖的开头行数"""
+        return min(max(self.total - self.capacity - (total - n), 0), n)
+
+    def latest(self, n=None):
+        return (self.snapshot(n),)
+
+    def snapshot(self, n=None, out=None):
+        total = self.total
+        size = min(total, self.capacity)
+        if n is None or n > size:
+            n = size
+        rows = self._copy(total, n, out)
+        return rows[self._overwritten(total, n):]
+
+    def read_since(self, cursor):
+        total = self.total
+        if cursor > total:
+            cursor = 0
+        pending = total - cursor
+        available = min(pending, self.capacity)
+        rows = self._copy(total, available)
+        skipped = self._overwritten(total, available)
+        return rows[skipped:], total, pending - available + skipped
+
+    def close(self):
+        # 先释放 numpy 视图，否则 SharedMemory.close() 报 BufferError
+        self.header = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class ScrollBuffer:
+    """界面用的滚动显示缓冲
+
+    底层数组长 2 * capacity，新行追加在末尾；写满时把最近 capacity 行
+    整体搬回开头（摊还 O(1)）。view(n) 总是返回最近 n 行的连续视图，
+    每次刷新既不分配也不拼接。
+    """
+
+    def __init__(self, capacity, n_channels, dtype=np.float64):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.n_channels = int(n_channels)
+        self.data = np.zeros((2 * self.capacity, self.n_channels + 1), dtype=dtype)
+        self.end = 0
+
+    def __len__(self):
+        return min(self.end, self.capacity)
+
+    def clear(self):
+        self.end = 0
+
+    def extend(self, rows):
+        n = len(rows)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            self.data[:self.capacity] = rows[-self.capacity:]
+            self.end = self.capacity
+            return
+        if self.end + n > len(self.data):
+            keep = self.capacity - n
+            self.data[:keep] = self.data[self.end - keep:self.end]
+            self.end = keep
+        self.data[self.end:self.end + n] = rows
+        self.end += n
+
+    def view(self, n=None):
+        """最近 n 行的连续视图（下次 extend 前有效）"""
+        size = len(self)
+        if n is None or n > size:
+            n = size
+        return self.data[self.end - n:self.end]
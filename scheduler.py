@@ -0,0 +1,111 @@
+import time
+
+CATCH_UP = 'catch-up'
+SKIP = 'skip'
+
+
+class DeadlineScheduler:
+    """按绝对截止时间节拍的调度器
+
+    截止时间 = 起点 + k * period（time.perf_counter，单调时钟），
+    误差不会逐周期累积。剩余时间大于 spin_threshold 时先 sleep，
+    最后一段忙等，以达到 sleep 精度以下的周期。
+
+    错过截止时间（迟到超过一个周期）时：
+      - CATCH_UP: 不跳过，连续补发直到追上（最多 max_catch_up 个周期，
+        超过则重新对齐）
+      - SKIP: 跳过已错过的节拍，对齐到下一个未来的截止时间
+
+    同一进程里有多个调度线程时设置 spin_yield=True：忙等期间用 sleep(0)
+    让出 GIL，否则一个线程忙等会让另一个线程错过截止时间。
+
+    interval_hist / lateness_hist 可设为 metrics.Histogram，每拍记录相邻
+    两次唤醒的间隔和唤醒时刻相对截止时间的迟到量；为 None 时不计时。
+    """
+
+    def __init__(self, rate, policy=SKIP, spin_threshold=0.0005, max_catch_up=100,
+                 spin_yield=False):
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"unknown policy: {policy}")
+        self.policy = policy
+        self.spin_threshold = spin_threshold
+        self.max_catch_up = max_catch_up
+        self.spin_yield = spin_yield
+        self.interval_hist = None
+        self.lateness_hist = None
+        self.set_rate(rate)
+        self.reset()
+
+    def set_rate(self, rate):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.period = 1.0 / rate
+
+    def reset(self):
+        self.next_deadline = None
+        self.ticks = 0
+        self.missed = 0
+        self.skipped = 0
+        self.max_lateness = 0.0
+        self.last_wake = None
+
+    def start(self):
+        self.next_deadline = time.perf_counter()
+
+    def wait(self):
+        """等到下一个截止时间，返回该截止时间"""
+        if self.next_deadline is None:
+            self.start()
+        deadline = self.next_deadline
+        period = self.period
+
+        now = time.perf_counter()
+        remaining = deadline - now
+        if remaining > 0:
+            if remaining > self.spin_threshold:
+                time.sleep(remaining - self.spin_threshold)
+            if self.spin_yield:
+                while time.perf_counter() < deadline:
+                    time.sleep(0)
+            else:
+                while time.perf_counter() < deadline:
+                    pass
+            self.next_deadline = deadline + period
+        else:
+            lateness = -remaining
+            if lateness > self.max_lateness:
+                self.max_lateness = lateness
+            if lateness >= period:
+                self.missed += 1
+                behind = int(lateness / period)
+                if self.policy == SKIP or behind > self.max_catch_up:
+                    self.skipped += behind
+                    deadline += behind * period
+            self.next_deadline = deadline + period
+
+        self.ticks += 1
+        if self.interval_hist is not None:
+            self.observe(deadline)
+        return deadline
+
+    def observe(self, deadline):
+        # 直方图可能被其它线程随时摘掉，只用读到的局部引用
+        interval_hist, lateness_hist = self.interval_hist, self.lateness_hist
+        if interval_hist is None or lateness_hist is None:
+            return
+        wake = time.perf_counter()
+        lateness_hist.observe(max(0.0, wake - deadline))
+        last_wake = self.last_wake
+        if last_wake is not None:
+            interval_hist.observe(wake - last_wake)
+        self.last_wake = wake
+
+    def stats(self):
+        return {
+            'rate': self.rate,
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'skipped': self.skipped,
+            'max_lateness': self.max_lateness,
+        }
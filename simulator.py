@@ -0,0 +1,153 @@
+import math
+import os
+import random
+import time
+
+ADC_BITS = 12     # MCP3208
+DAC_BITS = 12     # MCP4822
+ADC_CHANNELS = 8
+DAC_CHANNELS = 2
+
+
+def sine_signal(freq, amplitude=1.0, offset=1.5):
+    """生成可注入 ADC 通道的测试信号 f(t) -> V"""
+    w = 2 * math.pi * freq
+    return lambda t: offset + amplitude * math.sin(w * t)
+
+
+def parse_loopback(text):
+    """'7:1,8:2' -> {7: 1, 8: 2}（ADC 通道 : DAC 通道）"""
+    mapping = {}
+    for item in text.split(','):
+        item = item.strip()
+        if item:
+            adc_ch, dac_ch = item.split(':')
+            mapping[int(adc_ch)] = int(dac_ch)
+    return mapping
+
+
+class SimBoard:
+    """仿真 ExpanderPi 的共享状态
+
+    - loopback: {ADC 通道: DAC 通道}，DAC 输出直接接到对应 ADC 输入
+    - signals: 注入到 ADC 通道的测试信号（常数或 f(t)）
+    - latency/jitter: 每次 SPI 调用的耗时模型（秒），用忙等实现以便
+      模拟亚毫秒级的传输时间
+    """
+
+    def __init__(self, loopback=None, latency=0.0, jitter=0.0, noise=0.0, seed=None):
+        self.dac_voltage = [0.0] * DAC_CHANNELS
+        self.loopback = dict(loopback or {})
+        self.signals = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.t0 = time.perf_counter()
+        self.spi_calls = 0
+
+    @classmethod
+    def from_env(cls):
+        """EXPANDERPI_SIM_LOOPBACK / _LATENCY_US / _JITTER_US / _NOISE"""
+        env = os.environ
+        return cls(
+            loopback=parse_loopback(env.get('EXPANDERPI_SIM_LOOPBACK', '7:1,8:2')),
+            latency=float(env.get('EXPANDERPI_SIM_LATENCY_US', 0)) * 1e-6,
+            jitter=float(env.get('EXPANDERPI_SIM_JITTER_US', 0)) * 1e-6,
+            noise=float(env.get('EXPANDERPI_SIM_NOISE', 0)),
+        )
+
+    def inject(self, channel, signal):
+        """signal 为常数电压或 f(t)；传 None 取消注入"""
+        if signal is None:
+            self.signals.pop(channel, None)
+        else:
+            self.signals[channel] = signal
+
+    def spi_transfer(self):
+        self.spi_calls += 1
+        delay = self.latency
+        if self.jitter:
+            delay += self.rng.gauss(0.0, self.jitter)
+        if delay > 0:
+            deadline = time.perf_counter() + delay
+            while time.perf_counter() < deadline:
+                pass
+
+    def input_voltage(self, channel):
+        if channel in self.signals:
+            signal = self.signals[channel]
+            v = signal(time.perf_counter() - self.t0) if callable(signal) else signal
+        elif channel in self.loopback:
+            v = self.dac_voltage[self.loopback[channel] - 1]
+        else:
+            v = 0.0
+        if self.noise:
+            v += self.rng.gauss(0.0, self.noise)
+        return v
+
+
+_default_board = None
+
+
+def default_board():
+    global _default_board
+    if _default_board is None:
+        _default_board = SimBoard.from_env()
+    return _default_board
+
+
+class ADC:
+    """与 ExpanderPi.ADC 接口一致的仿真 MCP3208"""
+
+    def __init__(self, board=None):
+        self.board = board if board is not None else default_board()
+        self.refvoltage = 4.096
+
+    def set_adc_refvoltage(self, voltage):
+        if not 0.0 <= voltage <= 5.5:
+            raise ValueError('set_adc_refvoltage: reference voltage out of range')
+        self.refvoltage = voltage
+
+    def read_adc_raw(self, channel, mode):
+        if not 1 <= channel <= ADC_CHANNELS:
+            raise ValueError('read_adc_raw: channel out of range')
+        if mode not in (0, 1):
+            raise ValueError('read_adc_raw: mode out of range')
+        self.board.spi_transfer()
+        v = self.board.input_voltage(channel)
+        if mode == 1:
+            # 差分对：1/2, 3/4, 5/6, 7/8，奇数通道为 IN+
+            pair = channel + 1 if channel % 2 else channel - 1
+            v -= self.board.input_voltage(pair)
+        full_scale = 1 << ADC_BITS
+        code = int(v / self.refvoltage * full_scale)
+        return min(max(code, 0), full_scale - 1)
+
+    def read_adc_voltage(self, channel, mode):
+        raw = self.read_adc_raw(channel, mode)
+        return (self.refvoltage / (1 << ADC_BITS)) * raw
+
+
+class DAC:
+    """与 ExpanderPi.DAC 接口一致的仿真 MCP4822"""
+
+    def __init__(self, gainFactor=1, board=None):
+        if gainFactor not in (1, 2):
+            raise ValueError('DAC __init__: Invalid gain factor. Must be 1 or 2')
+        self.gain = gainFactor
+        self.board = board if board is not None else default_board()
+        self.max_output = 2.048 * gainFactor
+
+    def set_dac_raw(self, channel, value):
+        if channel not in (1, 2):
+            raise ValueError('set_dac_raw: channel out of range')
+        if not 0 <= value <= (1 << DAC_BITS) - 1:
+            raise ValueError('set_dac_raw: value out of range')
+        self.board.spi_transfer()
+        self.board.dac_voltage[channel - 1] = value * self.max_output / (1 << DAC_BITS)
+
+    def set_dac_voltage(self, channel, voltage):
+        full_scale = 1 << DAC_BITS
+        raw = int(voltage / self.max_output * full_scale)
+        self.set_dac_raw(channel, min(max(raw, 0), full_scale - 1))
@@ -0,0 +1,326 @@
+"""把采集缓冲中的样本通过 TCP 推送给远程查看端
+
+服务端在独立线程里运行 asyncio 事件循环，按固定间隔用游标从引擎读取
+新样本（read_since），编码一次后分发给所有订阅者。每个订阅者有自己的
+有界发送队列：慢客户端的队列满了就丢弃最旧的帧，发布协程从不等待
+任何客户端，所以查看端再多也不会拖慢 acquisition_loop。
+
+帧格式（小端）：
+  头部 FRAME: magic 'ADCS', kind (u8), n_cols (u8), 保留 (u16),
+              first_row (u64), count (u32)
+  HELLO     服务端 -> 客户端，负载为 count 字节的 JSON（列名等）
+  DATA      服务端 -> 客户端，负载为 count 个 float64 时间戳，
+            接着 count * n_cols 个 float32 通道值（按行存放）
+  SUBSCRIBE 客户端 -> 服务端，负载为 n_cols 个 u8 列号（1 起，0 列
+            时间总是发送）；可随时重新订阅
+first_row 是该块第一行在服务端缓冲中的累计行号，客户端据此发现丢帧。
+"""
+import asyncio
+import json
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from acquisition import AcquisitionConfig, AcquisitionEngine
+
+DEFAULT_PORT = 5555
+MAGIC = b'ADCS'
+FRAME = struct.Struct('<4sBBHQI')
+HELLO, DATA, SUBSCRIBE = range(3)
+
+
+def encode_frame(kind, payload=b'', n_cols=0, first_row=0, count=None):
+    if count is None:
+        count = len(payload)
+    return FRAME.pack(MAGIC, kind, n_cols, 0, first_row, count) + payload
+
+
+def encode_data(rows, columns, first_row):
+    """rows 为 (n, 1 + n_channels) 的样本块，只发送 columns 指定的列"""
+    t = np.ascontiguousarray(rows[:, 0], dtype='<f8')
+    values = np.ascontiguousarray(rows[:, columns], dtype='<f4')
+    return (FRAME.pack(MAGIC, DATA, len(columns), 0, first_row, len(rows))
+            + t.tobytes() + values.tobytes())
+
+
+def decode_data(n_cols, count, payload):
+    """返回 (count, 1 + n_cols) 的 float64 样本块"""
+    rows = np.empty((count, 1 + n_cols))
+    rows[:, 0] = np.frombuffer(payload, dtype='<f8', count=count)
+    rows[:, 1:] = np.frombuffer(payload, dtype='<f4', offset=8 * count).reshape(count, n_cols)
+    return rows
+
+
+def payload_size(kind, n_cols, count):
+    if kind == DATA:
+        return count * (8 + 4 * n_cols)
+    if kind == SUBSCRIBE:
+        return n_cols
+    return count
+
+
+class Subscriber:
+    """一个客户端连接：有界帧队列，满了丢弃最旧的帧"""
+
+    def __init__(self, writer, columns, queue_frames):
+        self.writer = writer
+        self.columns = columns
+        self.frames = deque(maxlen=queue_frames)
+        self.ready = asyncio.Event()
+        self.sent_frames = 0
+        self.dropped_frames = 0
+
+    def push(self, frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped_frames += 1
+        self.frames.append(frame)
+        self.ready.set()
+
+    async def send_loop(self):
+        writer = self.writer
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.frames:
+                writer.write(self.frames.popleft())
+                self.sent_frames += 1
+                # 内核发送缓冲满时在这里等待，期间新帧在队列里按丢旧策略累积
+                await writer.drain()
+
+
+class StreamServer:
+    """从 engine（AcquisitionEngine / ProcessEngine 等）发布样本
+
+    port=0 时由系统分配端口，start() 返回后可从 self.port 读取。
+    """
+
+    def __init__(self, engine, host='127.0.0.1', port=DEFAULT_PORT, interval=0.05,
+                 queue_frames=64):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.queue_frames = queue_frames
+        self.subscribers = set()
+        self.loop = None
+        self.thread = None
+        self.started = threading.Event()
+        self.stopping = None
+        self.error = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.started.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.error is not None:
+            self.thread.join()
+            self.thread = None
+            raise self.error
+
+    def stop(self, timeout=2.0):
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.stopping.set)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except OSError as e:
+            self.error = e
+            self.started.set()
+
+    def stats(self):
+        return [{'peer': sub.writer.get_extra_info('peername'),
+                 'columns': sub.columns,
+                 'queued': len(sub.frames),
+                 'sent_frames': sub.sent_frames,
+                 'dropped_frames': sub.dropped_frames}
+                for sub in list(self.subscribers)]
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.started.set()
+        publisher = asyncio.create_task(self.publish())
+        async with server:
+            await self.stopping.wait()
+            publisher.cancel()
+            for sub in list(self.subscribers):
+                sub.writer.close()
+
+    async def publish(self):
+        engine = self.engine
+        _, cursor, _ = engine.read_since(0)
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.subscribers:
+                _, cursor, _ = engine.read_since(cursor)
+                continue
+            rows, cursor, _ = engine.read_since(cursor)
+            if not len(rows):
+                continue
+            first_row = cursor - len(rows)
+            # 订阅相同列的客户端共用一次编码结果
+            encoded = {}
+            for sub in list(self.subscribers):
+                frame = encoded.get(sub.columns)
+                if frame is None:
+                    frame = encoded[sub.columns] = encode_data(rows, list(sub.columns),
+                                                               first_row)
+                sub.push(frame)
+
+    async def handle_client(self, reader, writer):
+        n_channels = len(self.engine.COLUMNS) - 1
+        sub = Subscriber(writer, tuple(range(1, n_channels + 1)), self.queue_frames)
+        hello = json.dumps({'columns': list(self.engine.COLUMNS)}).encode()
+        writer.write(encode_frame(HELLO, hello))
+        self.subscribers.add(sub)
+        sender = asyncio.create_task(sub.send_loop())
+        try:
+            while True:
+                header = await reader.readexactly(FRAME.size)
+                magic, kind, n_cols, _, _, count = FRAME.unpack(header)
+                if magic != MAGIC:
+                    break
+                payload = await reader.readexactly(payload_size(kind, n_cols, count))
+                if kind == SUBSCRIBE:
+                    columns = tuple(c for c in payload if 1 <= c <= n_channels)
+                    if columns:
+                        sub.columns = columns
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subscribers.discard(sub)
+            sender.cancel()
+            writer.close()
+
+
+class StreamClient:
+    """阻塞式客户端：连接、订阅、逐帧接收样本块"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, columns=None, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        kind, _, _, _, payload = self.recv_frame()
+        if kind != HELLO:
+            raise ConnectionError('stream server did not send HELLO')
+        self.columns = json.loads(payload)['columns']
+        self.subscribed = tuple(range(1, len(self.columns)))
+        if columns is not None:
+            self.subscribe(columns)
+
+    def subscribe(self, columns):
+        self.subscribed = tuple(columns)
+        self.sock.sendall(encode_frame(SUBSCRIBE, bytes(self.subscribed),
+                                       n_cols=len(self.subscribed), count=0))
+
+    def recv_exactly(self, n, may_timeout=False):
+        """读满 n 字节；只有一个字节都还没读到时才把超时抛给调用方，
+        否则帧会被截断、后面的数据全部错位"""
+        buf = bytearray(n)
+        view = memoryview(buf)
+        got = 0
+        while got < n:
+            try:
+                k = self.sock.recv_into(view[got:])
+            except socket.timeout:
+                if may_timeout and got == 0:
+                    raise
+                continue
+            if k == 0:
+                raise ConnectionError('stream server closed the connection')
+            got += k
+        return bytes(buf)
+
+    def recv_frame(self):
+        header = self.recv_exactly(FRAME.size, may_timeout=True)
+        magic, kind, n_cols, _, first_row, count = FRAME.unpack(header)
+        if magic != MAGIC:
+            raise ConnectionError('bad frame magic')
+        payload = self.recv_exactly(payload_size(kind, n_cols, count))
+        return kind, n_cols, first_row, count, payload
+
+    def recv(self):
+        """返回下一个数据块 (first_row, n_cols, rows)
+
+        rows 的第 0 列为时间，其余为订阅的列；刚切换订阅时可能还会收到
+        按旧列集编码的帧，调用方用 n_cols 区分。
+        """
+        while True:
+            kind, n_cols, first_row, count, payload = self.recv_frame()
+            if kind == DATA:
+                return first_row, n_cols, decode_data(n_cols, count, payload)
+
+    def close(self):
+        self.sock.close()
+
+
+class RemoteEngine(AcquisitionEngine):
+    """把远程服务端的样本推入本地环形缓冲
+
+    对外接口与 AcquisitionEngine 相同，窗口的绘图、测频、记录路径无需
+    改动。未订阅的列填 0。dropped 统计服务端丢弃或覆盖的行数。
+    """
+
+    RECV_TIMEOUT = 0.2
+
+    def __init__(self, host, port=DEFAULT_PORT, maxlen=300, columns=None):
+        # 节拍由服务端决定，这里的 adc_rate 只是占位
+        config = AcquisitionConfig(0, 0, True, 500)
+        super().__init__(None, config, maxlen=maxlen)
+        self.host = host
+        self.port = port
+        self.columns = columns
+        self.dropped = 0
+        self.client = None
+
+    def stop(self, timeout=1.0):
+        super().stop(timeout)
+        client, self.client = self.client, None
+        if client is not None:
+            client.close()
+
+    def acquisition_loop(self):
+        try:
+            client = self.client = StreamClient(self.host, self.port, self.columns)
+        except OSError:
+            self.running = False
+            return
+        client.sock.settimeout(self.RECV_TIMEOUT)
+        width = self.buffer.n_channels + 1
+        expected = None
+        start = time.perf_counter()
+        while self.running:
+            try:
+                first_row, n_cols, rows = client.recv()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if expected is not None and first_row > expected:
+                self.dropped += first_row - expected
+            expected = first_row + len(rows)
+
+            block = np.zeros((len(rows), width))
+            block[:, 0] = rows[:, 0]
+            if n_cols == len(client.subscribed):
+                for k, column in enumerate(client.subscribed):
+                    if column < width:
+                        block[:, column] = rows[:, k + 1]
+            self.store_block(block)
+            self.sample_count += len(rows)
+            elapsed = time.perf_counter() - start
+            if elapsed > 0:
+                self.actual_rate = self.sample_count / elapsed
+        self.running = False
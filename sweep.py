@@ -0,0 +1,177 @@
+"""频率响应 (Bode) 扫描
+
+DAC 通道 1 输出激励，ADC 同时采样电路输入 (in_channel) 和输出
+(out_channel)。每个频率点用单频点 DFT 计算两路的复振幅，
+H = 输出 / 输入，给出增益和相位；以实测输入为参考，DAC 的时延和
+幅度误差都会抵消。
+
+两路 ADC 是先后读取的，同一行里输出通道实际晚一次 SPI 读取
+(engine.channel_skew，引擎启动时实测)，这个偏差不会抵消，会表现为
+360·f·Δt 度的相位超前；计算时按 exp(-j2πfΔt) 补偿。补偿假设每次
+读取耗时恒定，读取耗时的抖动在高频段仍会带来相位噪声。
+
+batch_size > 1 时一批频率叠加成多音激励同时测量（每个音的幅度为
+amplitude / batch_size），一次稳定、一次采集得到整批结果，DFT 对整批
+频率用一次矩阵乘法完成。测得的点按配置缓存，重新扫描时只测新的点。
+
+测量时长不超过引擎环形缓冲的容量；采集期间仍有样本被覆盖（丢行）
+的点记为 nan，不用截断的数据计算。
+"""
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from acquisition import LoopbackEngine, WaveConfig
+
+SweepConfig = namedtuple(
+    'SweepConfig',
+    ['freqs', 'amplitude', 'offset', 'in_channel', 'out_channel', 'adc_rate', 'dac_rate',
+     'settle_time', 'settle_cycles', 'measure_cycles', 'min_samples', 'batch_size'],
+    defaults=(1.0, 2.0, 7, 8, 5000, 20000, 0.05, 5, 10, 500, 1)
+)
+
+SweepPoint = namedtuple('SweepPoint', ['freq', 'gain', 'gain_db', 'phase'])
+
+# 一次测量最多占用引擎环形缓冲的比例，留出读取前的余量
+BUFFER_FILL = 0.8
+
+
+def log_frequencies(f_start, f_stop, n):
+    return tuple(np.geomspace(f_start, f_stop, int(n)).tolist())
+
+
+def single_bin_dft(t, y, freqs):
+    """按实际时间戳计算各频率的复振幅（Hann 窗，去直流）
+
+    t: (N,)；y: (N,) 或 (N, C)；返回 (len(freqs),) 或 (len(freqs), C)。
+    """
+    n = len(t)
+    w = np.hanning(n)
+    y = y - y.mean(axis=0)
+    basis = np.exp(-2j * np.pi * np.outer(freqs, t - t[0]))
+    weighted = y * (w[:, None] if y.ndim == 2 else w)
+    return 2.0 * (basis @ weighted) / w.sum()
+
+
+class MultiTone:
+    """多音激励：LoopbackEngine.stimulus 的实现，相位跨块连续"""
+
+    def __init__(self, freqs, amplitude, offset, sample_rate):
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.amplitude = amplitude
+        self.offset = offset
+        self.sample_rate = float(sample_rate)
+        # 错开初相，降低多音叠加的峰值因数
+        k = np.arange(len(self.freqs))
+        self.phase = (k * k / (2.0 * max(len(k), 1))) % 1.0
+
+    def __call__(self, n):
+        steps = self.freqs / self.sample_rate
+        cycles = self.phase[:, None] + steps[:, None] * np.arange(n)
+        self.phase = (self.phase + steps * n) % 1.0
+        return self.offset + self.amplitude * np.sin(2 * np.pi * cycles).sum(axis=0)
+
+
+class BodeSweep:
+    """在 LoopbackEngine 或 ProcessEngine('loopback') 上做扫描
+
+    run() 是阻塞的，界面在后台线程调用并轮询 results / progress。
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.cache = {}
+        self.results = []
+        self.progress = (0, 0)
+        self.cancelled = False
+        self.cursor = 0
+
+    @staticmethod
+    def cache_key(cfg, freq):
+        return cfg._replace(freqs=(), batch_size=1), round(freq, 9)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def clear_cache(self):
+        self.cache.clear()
+
+    def flush(self):
+        _, self.cursor, _ = self.engine.read_since(self.cursor)
+
+    def run(self, cfg):
+        """测量 cfg.freqs 中的全部点，返回按频率排序的 SweepPoint 列表"""
+        self.cancelled = False
+        self.results = []
+        if not isinstance(self.engine, LoopbackEngine):
+            # 多音激励要在 DAC 线程里直接调用，子进程引擎只能逐点扫描
+            cfg = cfg._replace(batch_size=1)
+        nyquist = cfg.adc_rate / 2.0
+        todo = []
+        for freq in cfg.freqs:
+            point = self.cache.get(self.cache_key(cfg, freq))
+            if point is not None:
+                self.results.append(point)
+            elif freq >= nyquist:
+                self.results.append(SweepPoint(freq, math.nan, math.nan, math.nan))
+            else:
+                todo.append(freq)
+        done = len(self.results)
+        self.progress = (done, len(cfg.freqs))
+
+        engine = self.engine
+        saved = engine.config
+        engine.reconfigure(saved._replace(channel1=cfg.in_channel, channel2=cfg.out_channel,
+                                          adc_rate=cfg.adc_rate, dac_rate=cfg.dac_rate,
+                                          dac_diff_mode=False))
+        if not engine.running:
+            engine.start()
+        try:
+            for i in range(0, len(todo), cfg.batch_size):
+                if self.cancelled:
+                    break
+                batch = todo[i:i + cfg.batch_size]
+                for point in self.measure_batch(cfg, batch):
+                    # 丢行或样本不足的点不缓存，下次扫描重测
+                    if math.isfinite(point.gain) and math.isfinite(point.phase):
+                        self.cache[self.cache_key(cfg, point.freq)] = point
+                    self.results.append(point)
+                done += len(batch)
+                self.progress = (done, len(cfg.freqs))
+        finally:
+            engine.stimulus = None
+            engine.reconfigure(saved)
+        self.results.sort(key=lambda p: p.freq)
+        return self.results
+
+    def measure_batch(self, cfg, freqs):
+        engine = self.engine
+        if len(freqs) == 1:
+            engine.stimulus = None
+            engine.reconfigure(wave1=WaveConfig('Sine Wave', freqs[0], cfg.amplitude,
+                                                cfg.offset))
+        else:
+            engine.stimulus = MultiTone(freqs, cfg.amplitude / len(freqs), cfg.offset,
+                                        cfg.dac_rate)
+
+        f_min = min(freqs)
+        time.sleep(max(cfg.settle_time, cfg.settle_cycles / f_min))
+        self.flush()
+        measure_time = max(cfg.measure_cycles / f_min, cfg.min_samples / cfg.adc_rate)
+        # 超过缓冲容量的部分会被覆盖，只能少测几个周期
+        time.sleep(min(measure_time, BUFFER_FILL * engine.maxlen / cfg.adc_rate))
+        rows, self.cursor, lost = engine.read_since(self.cursor)
+        if lost or len(rows) < 16:
+            return [SweepPoint(f, math.nan, math.nan, math.nan) for f in freqs]
+
+        spectra = single_bin_dft(rows[:, 0], rows[:, 1:3], freqs)
+        skew = getattr(engine, 'channel_skew', 0.0)
+        h = spectra[:, 1] / spectra[:, 0] * np.exp(-2j * np.pi * np.asarray(freqs) * skew)
+        gain = np.abs(h)
+        with np.errstate(divide='ignore'):
+            gain_db = 20 * np.log10(gain)
+        phase = np.degrees(np.angle(h))
+        return [SweepPoint(f, float(g), float(db), float(p))
+                for f, g, db, p in zip(freqs, gain, gain_db, phase)]
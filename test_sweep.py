@@ -0,0 +1,45 @@
+"""BodeSweep 的缓存行为（仿真板卡，无需 Qt）
+
+    python -m pytest -q test_sweep.py
+"""
+import math
+
+from acquisition import AcquisitionConfig, LoopbackEngine, WaveConfig
+from simulator import ADC, DAC, SimBoard
+from sweep import BodeSweep, SweepConfig
+
+SWEEP = SweepConfig(freqs=(50.0, 200.0), adc_rate=5000, dac_rate=20000, settle_time=0.01,
+                    settle_cycles=1, measure_cycles=5, min_samples=200)
+
+
+def make_engine():
+    # 电路输入、输出都直接接 DAC1：增益 1，相位 0
+    board = SimBoard(loopback={7: 1, 8: 1})
+    config = AcquisitionConfig(7, 8, False, 5000, 20000,
+                               WaveConfig('Sine', 10.0, 1.0, 2.0),
+                               WaveConfig('Sine', 10.0, 1.0, 2.0), False)
+    return LoopbackEngine(ADC(board=board), DAC(gainFactor=2, board=board), config,
+                          maxlen=1 << 16)
+
+
+def test_points_that_lost_rows_are_remeasured():
+    engine = make_engine()
+    sweep = BodeSweep(engine)
+    read_since = engine.read_since
+
+    def lossy_read_since(cursor):
+        rows, cursor, lost = read_since(cursor)
+        return rows, cursor, lost + 1
+
+    try:
+        engine.read_since = lossy_read_since
+        first = sweep.run(SWEEP)
+        assert all(math.isnan(p.gain) for p in first)
+        assert not sweep.cache
+
+        engine.read_since = read_since
+        second = sweep.run(SWEEP)
+        assert all(math.isfinite(p.gain) and math.isfinite(p.phase) for p in second)
+        assert len(sweep.cache) == len(SWEEP.freqs)
+    finally:
+        engine.stop()
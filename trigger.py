@@ -0,0 +1,175 @@
+"""边沿触发
+
+对采样块做向量化扫描，找出满足斜率、电平和迟滞的触发点，
+输出以触发点对齐、带预触发深度的一帧数据：
+  - auto:   超时未触发时输出最新一帧（不对齐），波形不会消失
+  - normal: 只在触发时更新，否则保留上一帧
+  - single: 触发一次后停止，arm() 重新布防
+"""
+from collections import namedtuple
+
+import numpy as np
+
+AUTO = 'auto'
+NORMAL = 'normal'
+SINGLE = 'single'
+
+RISING = 'rising'
+FALLING = 'falling'
+EITHER = 'either'
+
+TriggerConfig = namedtuple(
+    'TriggerConfig',
+    ['source', 'slope', 'level', 'hysteresis', 'holdoff', 'mode',
+     'pre_samples', 'post_samples', 'auto_timeout'],
+    defaults=(0, RISING, 0.0, 0.05, 0.0, AUTO, 150, 150, 0.1)
+)
+
+# rows: (n, 1 + n_channels) 的样本块；t_trigger: 插值后的触发时刻；
+# triggered=False 表示 auto 模式超时输出的未对齐帧
+TriggerFrame = namedtuple('TriggerFrame', ['rows', 't_trigger', 'triggered'])
+
+
+def crossings(y, level, hysteresis, state=0):
+    """上升沿位置：先低于 level - hysteresis，再到达 level
+
+    state 是上一块结束时的状态（-1 低、1 高、0 未知），返回 (索引数组, 新状态)。
+    """
+    events = np.zeros(len(y), dtype=np.int8)
+    events[y < level - hysteresis] = -1
+    events[y >= level] = 1
+    idx = np.flatnonzero(events)
+    if len(idx) == 0:
+        return idx, state
+    s = events[idx]
+    prev = np.empty_like(s)
+    prev[0] = state
+    prev[1:] = s[:-1]
+    return idx[(s == 1) & (prev == -1)], int(s[-1])
+
+
+class TriggerEngine:
+    def __init__(self, config=None):
+        self.config = config or TriggerConfig()
+        self.reset()
+
+    def configure(self, config=None, **changes):
+        if config is None:
+            config = self.config._replace(**changes)
+        if (config.pre_samples, config.post_samples, config.source) != (
+                self.config.pre_samples, self.config.post_samples, self.config.source):
+            self.config = config
+            self.reset()
+        else:
+            self.config = config
+
+    def reset(self):
+        self.tail = None
+        self.rising_state = 0
+        self.falling_state = 0
+        self.pending = None          # 等待后触发样本的触发点 (tail 内行号, 时刻)
+        self.last_trigger_t = None
+        self.last_frame_t = None
+        self.trigger_count = 0
+        self.stopped = False
+
+    def arm(self):
+        """single 模式下重新布防"""
+        self.pending = None
+        self.stopped = False
+
+    def find_triggers(self, t, y):
+        cfg = self.config
+        found = []
+        if cfg.slope in (RISING, EITHER):
+            idx, self.rising_state = crossings(y, cfg.level, cfg.hysteresis,
+                                               self.rising_state)
+            found.append(idx)
+        if cfg.slope in (FALLING, EITHER):
+            idx, self.falling_state = crossings(-y, -cfg.level, cfg.hysteresis,
+                                                self.falling_state)
+            found.append(idx)
+        if len(found) == 1:
+            return found[0]
+        return np.unique(np.concatenate(found))
+
+    def trigger_time(self, data, k):
+        """在第 k-1、k 个样本之间线性插值得到电平穿越时刻"""
+        col = 1 + self.config.source
+        if k == 0:
+            return data[0, 0]
+        t0, t1 = data[k - 1, 0], data[k, 0]
+        y0, y1 = data[k - 1, col], data[k, col]
+        if y1 == y0:
+            return t1
+        frac = min(max((self.config.level - y0) / (y1 - y0), 0.0), 1.0)
+        return t0 + frac * (t1 - t0)
+
+    def feed(self, rows):
+        """扫描新样本块，返回最新完成的一帧 TriggerFrame；没有新帧时返回 None"""
+        cfg = self.config
+        if len(rows) == 0:
+            return None
+        # 每一块都要过一遍穿越检测，让 rising_state / falling_state 跟上信号；
+        # 否则等待帧或停止期间状态过期，下一块开头会误触发
+        found = self.find_triggers(rows[:, 0], rows[:, 1 + cfg.source])
+        if self.stopped:
+            return None
+        old = 0 if self.tail is None else len(self.tail)
+        data = rows if self.tail is None else np.concatenate((self.tail, rows))
+        t = data[:, 0]
+        frame = self.complete_pending(data)
+
+        if self.pending is None and not self.stopped:
+            candidates = old + found
+        else:
+            candidates = np.empty(0, dtype=np.intp)
+
+        # 按 holdoff 依次筛选；一次刷新里只需要输出最后一个完整帧
+        pos = 0
+        while pos < len(candidates):
+            k = int(candidates[pos])
+            if self.last_trigger_t is not None and \
+                    t[k] < self.last_trigger_t + cfg.holdoff:
+                pos = int(np.searchsorted(t[candidates], self.last_trigger_t + cfg.holdoff))
+                continue
+            pos += 1
+            if k < cfg.pre_samples:
+                # 刚开始采集，预触发样本不够
+                continue
+            self.last_trigger_t = t[k]
+            self.trigger_count += 1
+            self.pending = (k, self.trigger_time(data, k))
+            frame = self.complete_pending(data) or frame
+            if self.pending is not None or self.stopped:
+                break
+
+        if frame is None and cfg.mode == AUTO and self.pending is None:
+            since = self.last_frame_t if self.last_frame_t is not None else t[0]
+            if t[-1] - since >= cfg.auto_timeout:
+                frame_rows = data[-(cfg.pre_samples + cfg.post_samples):].copy()
+                t_center = frame_rows[min(cfg.pre_samples, len(frame_rows) - 1), 0]
+                frame = TriggerFrame(frame_rows, t_center, False)
+                self.last_frame_t = t[-1]
+
+        # 保留足够的尾部：下一块的预触发样本以及尚未完成的触发帧
+        start = max(len(data) - cfg.pre_samples - cfg.post_samples, 0)
+        if self.pending is not None:
+            self.pending = (self.pending[0] - start, self.pending[1])
+        self.tail = data[start:].copy()
+        return frame
+
+    def complete_pending(self, data):
+        """触发点之后的样本够了就输出该帧"""
+        if self.pending is None:
+            return None
+        k, t_trigger = self.pending
+        cfg = self.config
+        if k + cfg.post_samples > len(data):
+            return None
+        self.pending = None
+        if cfg.mode == SINGLE:
+            self.stopped = True
+        self.last_frame_t = data[k, 0]
+        rows = data[k - cfg.pre_samples:k + cfg.post_samples].copy()
+        return TriggerFrame(rows, t_trigger, True)
@@ -0,0 +1,101 @@
+import numpy as np
+
+WAVEFORMS = ('Sine', 'Square', 'Triangle', 'Sawtooth')
+
+# MCP4822 (gainFactor=2) 输出范围
+DAC_MIN = 0.0
+DAC_MAX = 4.096
+
+TABLE_BITS = 12
+TABLE_SIZE = 1 << TABLE_BITS
+PHASE_BITS = 32
+PHASE_MASK = (1 << PHASE_BITS) - 1
+
+_tables = {}
+
+
+def wave_name(label):
+    """'Sine Wave' / 'Sine' -> 'Sine'"""
+    return label.split(' ')[0]
+
+
+def wavetable(wave_type):
+    """一个周期的归一化波形表（幅度 ±1），按波形缓存"""
+    name = wave_name(wave_type)
+    table = _tables.get(name)
+    if table is None:
+        p = np.arange(TABLE_SIZE) / TABLE_SIZE
+        if name == 'Square':
+            table = np.where(p < 0.5, 1.0, -1.0)
+        elif name == 'Triangle':
+            table = np.where(p < 0.5, 4 * p - 1, 3 - 4 * p)
+        elif name == 'Sawtooth':
+            table = 2 * p - 1
+        else:
+            table = np.sin(2 * np.pi * p)
+        _tables[name] = table
+    return table
+
+
+def dac_pair(values1, values2, offset1, diff_mode=False, clamped=(False, False)):
+    """差分模式下通道 2 为通道 1 关于 offset1 的镜像，然后整块限幅
+
+    clamped 标记载入时已经限幅过的通道（任意波形），这些通道不再重复限幅。
+    """
+    if diff_mode:
+        values2 = 2 * offset1 - values1
+        clamped = (clamped[0], False)
+    return (values1 if clamped[0] else np.clip(values1, DAC_MIN, DAC_MAX),
+            values2 if clamped[1] else np.clip(values2, DAC_MIN, DAC_MAX))
+
+
+class DDSOscillator:
+    """直接数字合成：相位累加器 + 查表
+
+    32 位相位累加器的高 TABLE_BITS 位作为表索引，每次输出只做一次
+    查表和一次整数加法。改变频率只改步进值，相位保持连续。
+    """
+
+    def __init__(self, wave_type, freq, amplitude, offset, sample_rate):
+        self.phase = 0
+        self.sample_rate = float(sample_rate)
+        self.set_waveform(wave_type)
+        self.set_frequency(freq)
+        self.amplitude = amplitude
+        self.offset = offset
+
+    def set_waveform(self, wave_type):
+        self.wave_type = wave_name(wave_type)
+        # Python list 的下标访问比 ndarray 标量访问快得多
+        self.table_array = wavetable(self.wave_type)
+        self.table = self.table_array.tolist()
+
+    def set_frequency(self, freq, sample_rate=None):
+        if sample_rate is not None:
+            self.sample_rate = float(sample_rate)
+        self.freq = freq
+        self.step = int(round(freq / self.sample_rate * (1 << PHASE_BITS))) & PHASE_MASK
+
+    def configure(self, wave_type, freq, amplitude, offset, sample_rate=None):
+        if wave_name(wave_type) != self.wave_type:
+            self.set_waveform(wave_type)
+        self.set_frequency(freq, sample_rate)
+        self.amplitude = amplitude
+        self.offset = offset
+
+    def reset(self, phase=0.0):
+        """phase 以周期为单位 (0~1)"""
+        self.phase = int(phase * (1 << PHASE_BITS)) & PHASE_MASK
+
+    def next_value(self):
+        phase = self.phase
+        self.phase = (phase + self.step) & PHASE_MASK
+        return self.amplitude * self.table[phase >> (PHASE_BITS - TABLE_BITS)] + self.offset
+
+    def next_block(self, n):
+        """与 next_value() 共用相位累加器，一次生成 n 个样本"""
+        step = self.step
+        phases = (self.phase + step * np.arange(n, dtype=np.uint64)) & PHASE_MASK
+        self.phase = (self.phase + step * n) & PHASE_MASK
+        idx = (phases >> (PHASE_BITS - TABLE_BITS)).astype(np.intp)
+        return self.amplitude * self.table_array[idx] + self.offset